@@ -0,0 +1,144 @@
+import asyncio
+import math
+import time
+from typing import Any, Dict
+
+from fastapi import HTTPException
+
+from .config import (
+    AGENT_MAX_CONCURRENT_RUNS,
+    AGENT_MAX_QUEUED_RUNS,
+    AGENT_QUEUE_TIMEOUT_SECONDS,
+)
+
+class AdmissionRejected(Exception):
+    """Raised when an agent run cannot be admitted."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionSlot:
+    """A granted agent run slot; releasing it more than once is a no-op."""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self.started_at = time.monotonic()
+        self._released = False
+
+    async def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        await self._controller._release(self)
+
+    async def __aenter__(self) -> "AdmissionSlot":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.release()
+
+class AdmissionController:
+    """A global concurrency cap with a bounded, timed wait queue."""
+
+    def __init__(self, max_concurrent: int, max_queued: int, queue_timeout: float):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max(0, max_queued)
+        self.queue_timeout = queue_timeout
+        self._condition = asyncio.Condition()
+        self._active = 0
+        self._queued = 0
+        self._admitted_total = 0
+        self._rejected: Dict[str, int] = {}
+        self._wait_count = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._avg_run_seconds = 0.0
+
+    def _has_capacity(self) -> bool:
+        return self._active < self.max_concurrent
+
+    def _retry_after(self) -> int:
+        """Estimate seconds until a slot frees up, based on recent run durations."""
+        average = self._avg_run_seconds or 5.0
+        backlog = (self._queued + 1) / self.max_concurrent
+        return max(1, int(math.ceil(average * backlog)))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self._rejected[reason] = self._rejected.get(reason, 0) + 1
+        return AdmissionRejected(reason, self._retry_after())
+
+    async def acquire(self) -> AdmissionSlot:
+        """Wait for a run slot or raise `AdmissionRejected` when overloaded."""
+        enqueued_at = time.monotonic()
+        async with self._condition:
+            if self._queued or not self._has_capacity():
+                if self._queued >= self.max_queued:
+                    raise self._reject("queue_full")
+                self._queued += 1
+                try:
+                    await asyncio.wait_for(
+                        self._condition.wait_for(self._has_capacity),
+                        timeout=self.queue_timeout,
+                    )
+                except asyncio.TimeoutError:
+                    raise self._reject("queue_timeout")
+                finally:
+                    self._queued -= 1
+
+            self._active += 1
+            self._admitted_total += 1
+            waited = time.monotonic() - enqueued_at
+            self._wait_count += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        return AdmissionSlot(self)
+
+    async def _release(self, slot: AdmissionSlot) -> None:
+        duration = time.monotonic() - slot.started_at
+        async with self._condition:
+            self._active = max(0, self._active - 1)
+            # Exponential moving average keeps Retry-After tracking recent load
+            if self._avg_run_seconds:
+                self._avg_run_seconds = 0.8 * self._avg_run_seconds + 0.2 * duration
+            else:
+                self._avg_run_seconds = duration
+            self._condition.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return current queue depth, concurrency and wait-time statistics."""
+        average_wait = self._wait_total / self._wait_count if self._wait_count else 0.0
+        return {
+            "active_runs": self._active,
+            "queued_runs": self._queued,
+            "max_concurrent_runs": self.max_concurrent,
+            "max_queued_runs": self.max_queued,
+            "queue_timeout_seconds": self.queue_timeout,
+            "admitted_total": self._admitted_total,
+            "rejected_total": sum(self._rejected.values()),
+            "rejected_by_reason": dict(self._rejected),
+            "average_wait_ms": round(average_wait * 1000, 2),
+            "max_wait_ms": round(self._wait_max * 1000, 2),
+            "average_run_seconds": round(self._avg_run_seconds, 3),
+        }
+
+# Global admission controller shared by every agent run in this worker
+admission_controller = AdmissionController(
+    max_concurrent=AGENT_MAX_CONCURRENT_RUNS,
+    max_queued=AGENT_MAX_QUEUED_RUNS,
+    queue_timeout=AGENT_QUEUE_TIMEOUT_SECONDS,
+)
+
+async def admit_agent_run() -> AdmissionSlot:
+    """Acquire an agent run slot, translating overload into a 429 response."""
+    try:
+        return await admission_controller.acquire()
+    except AdmissionRejected as exc:
+        print(f"[admission] Rejected agent run: {exc.reason}")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Agent is busy ({exc.reason}); please retry shortly",
+            headers={"Retry-After": str(exc.retry_after)},
+        )
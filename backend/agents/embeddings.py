@@ -1,29 +1,262 @@
 import os
+import argparse
 import base64
-import binascii
+import concurrent.futures
+import datetime
+import hashlib
+import json
+import re
+import resource
+import shutil
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterable, Iterator, Protocol
 import fitz  # PyMuPDF
+from google.api_core.exceptions import NotFound
 from google.cloud import bigquery
 from dotenv import load_dotenv
+import numpy as np
 
 # Optional: load environment variables if needed
 load_dotenv()
 
+# Imported after load_dotenv so the index name can come from .env; the module
+# is a sibling when this file runs as a script
+if __package__:
+    from .vector_index_config import (
+        BQ_VECTOR_INDEX_NAME,
+        VECTOR_INDEX_DISTANCE,
+        VECTOR_INDEX_STORED_COLUMNS,
+        ddl_json_option,
+        ddl_option,
+        ddl_stored_columns,
+    )
+else:
+    from vector_index_config import (
+        BQ_VECTOR_INDEX_NAME,
+        VECTOR_INDEX_DISTANCE,
+        VECTOR_INDEX_STORED_COLUMNS,
+        ddl_json_option,
+        ddl_option,
+        ddl_stored_columns,
+    )
+
+SERVICE_ACCOUNT_PATH = os.path.join(os.path.dirname(__file__), "docusign-arpit.json")
+
 # --- Helper Functions ---
 
+# Extraction worker processes (one PDF at a time each)
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(os.cpu_count() or 1)))
+# Per-document limits: wall time, and address space of a worker process
+EXTRACTION_TIMEOUT_SECONDS = float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", "120"))
+EXTRACTION_MAX_MEMORY_MB = int(os.getenv("EXTRACTION_MAX_MEMORY_MB", "2048"))
+# Extra time before a worker stuck inside MuPDF is killed from the parent
+EXTRACTION_KILL_GRACE_SECONDS = 30.0
+# Progress line every this many documents
+EXTRACTION_REPORT_EVERY = 100
+
+class ExtractionTimeout(Exception):
+    pass
+
+def iter_pdf_page_text(pdf_binary_data: bytes) -> Iterator[str]:
+    """Yields the text of each page in turn, so only one page is held at a time."""
+    with fitz.open(stream=pdf_binary_data, filetype="pdf") as doc:
+        for page_number in range(doc.page_count):
+            page = doc.load_page(page_number)
+            # Use explicit 'text' mode and guard against non-string results per type stubs
+            raw = page.get_text("text")
+            page_text = raw if isinstance(raw, str) else ""
+            del page
+            yield page_text.replace('\n', ' ')
+
 def extract_text_from_binary(pdf_binary_data: bytes) -> str:
     """Extracts all text content from a PDF opened from in-memory bytes."""
     try:
-        with fitz.open(stream=pdf_binary_data, filetype="pdf") as doc:
-            text_parts: list[str] = []
-            for page in doc:
-                # Use explicit 'text' mode and guard against non-string results per type stubs
-                raw = page.get_text("text")
-                page_text = raw if isinstance(raw, str) else ""
-                text_parts.append(page_text.replace('\n', ' '))
-            return "".join(text_parts)
+        return "".join(iter_pdf_page_text(pdf_binary_data))
     except Exception as e:
         return f"Error processing PDF data: {e}"
 
+def _raise_extraction_timeout(signum, frame):
+    raise ExtractionTimeout(f"extraction exceeded {EXTRACTION_TIMEOUT_SECONDS:.0f}s")
+
+def _init_extraction_worker(max_memory_mb: int) -> None:
+    """Caps the worker's address space so one huge PDF fails alone instead of
+    exhausting the machine; Ctrl-C is handled by the parent."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGALRM, _raise_extraction_timeout)
+    if max_memory_mb > 0:
+        limit = max_memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def extract_document_to_file(key: str, encoded_field, spool_dir: str, timeout: float) -> dict:
+    """
+    Worker: decodes one document and streams its page text to a spool file.
+    Returns the file path and page count, or the error that stopped extraction.
+    """
+    started = time.monotonic()
+    result = {"key": key, "pages": 0, "path": None}
+    handle, path = tempfile.mkstemp(dir=spool_dir, suffix=".txt")
+    # Wrap the descriptor first so it is closed however extraction ends
+    spool = os.fdopen(handle, "w", encoding="utf-8")
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        with spool:
+            pdf_bytes = decode_pdf_field(encoded_field)
+            del encoded_field
+            for page_text in iter_pdf_page_text(pdf_bytes):
+                spool.write(page_text)
+                result["pages"] += 1
+                # Drop MuPDF's cached objects as pages are consumed
+                if result["pages"] % 50 == 0:
+                    fitz.TOOLS.store_shrink(100)
+        result["path"] = path
+    except MemoryError:
+        result["error"] = f"exceeded the {EXTRACTION_MAX_MEMORY_MB} MB memory limit"
+    except Exception as e:
+        result["error"] = str(e) or e.__class__.__name__
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        if result["path"] is None and os.path.exists(path):
+            os.remove(path)
+    result["seconds"] = time.monotonic() - started
+    return result
+
+class PdfExtractionPool:
+    """
+    Fans documents out to worker processes and yields results as they finish.
+
+    At most one document per worker is in flight, so the parent only holds
+    the encoded bytes of documents being extracted. A worker that stays stuck
+    past the timeout (e.g. inside MuPDF, where the alarm cannot interrupt it)
+    is killed and its document reported as timed out. When a worker dies, the
+    documents that were in flight are retried one at a time on a fresh pool,
+    so only the document that actually kills a worker is reported as failed.
+    """
+
+    def __init__(
+        self,
+        workers: int = EXTRACTION_WORKERS,
+        timeout: float = EXTRACTION_TIMEOUT_SECONDS,
+        max_memory_mb: int = EXTRACTION_MAX_MEMORY_MB,
+    ):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_memory_mb = max_memory_mb
+        self.spool_dir = tempfile.mkdtemp(prefix="pdf-extraction-")
+        self.stats = {"documents": 0, "failed": 0, "pages": 0, "timed_out": 0, "pool_restarts": 0}
+        self.started = time.monotonic()
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_extraction_worker,
+            initargs=(self.max_memory_mb,),
+        )
+
+    def _submit(self, task: tuple) -> concurrent.futures.Future:
+        key, encoded_field = task
+        return self._executor.submit(extract_document_to_file, key, encoded_field, self.spool_dir, self.timeout)
+
+    def _restart(self) -> None:
+        for process in list((getattr(self._executor, "_processes", None) or {}).values()):
+            process.kill()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._new_executor()
+
+    def _finish(self, result: dict) -> dict:
+        self.stats["documents"] += 1
+        self.stats["pages"] += result.get("pages", 0)
+        if result.get("error"):
+            self.stats["failed"] += 1
+        if self.stats["documents"] % EXTRACTION_REPORT_EVERY == 0:
+            print(f"   .. {self.report()}")
+        return result
+
+    def _failure(self, task: tuple, error: str, seconds: float) -> dict:
+        return self._finish({"key": task[0], "pages": 0, "path": None, "error": error, "seconds": seconds})
+
+    def extract(self, tasks: Iterable[tuple]) -> Iterator[dict]:
+        """Yields one result dict per (key, encoded) task."""
+        tasks = iter(tasks)
+        suspects: deque = deque()
+        # future -> (task, submitted, isolated)
+        in_flight: dict = {}
+        exhausted = False
+        while True:
+            if suspects:
+                # Retry documents that were in flight when a worker died, alone
+                if not in_flight:
+                    task = suspects.popleft()
+                    in_flight[self._submit(task)] = (task, time.monotonic(), True)
+            else:
+                while not exhausted and len(in_flight) < self.workers:
+                    task = next(tasks, None)
+                    if task is None:
+                        exhausted = True
+                        break
+                    in_flight[self._submit(task)] = (task, time.monotonic(), False)
+            if not in_flight:
+                return
+            done, _ = concurrent.futures.wait(
+                in_flight, timeout=1.0, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            crashed = set()
+            for future in done:
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    crashed.add(future)
+                    continue
+                in_flight.pop(future)
+                yield self._finish(result)
+            now = time.monotonic()
+            hung = {
+                future
+                for future, (_, submitted, _) in in_flight.items()
+                if future not in crashed and now - submitted > self.timeout + EXTRACTION_KILL_GRACE_SECONDS
+            }
+            if not (crashed or hung):
+                continue
+
+            # Replace the pool; everything still in flight is lost with it
+            self.stats["pool_restarts"] += 1
+            self.stats["timed_out"] += len(hung)
+            self._restart()
+            for future, (task, submitted, isolated) in in_flight.items():
+                if future in hung:
+                    yield self._failure(task, "timed out", now - submitted)
+                elif isolated:
+                    yield self._failure(task, "crashed the extraction worker", now - submitted)
+                else:
+                    suspects.append(task)
+            in_flight = {}
+
+    def report(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return (
+            f"{self.stats['documents']} documents, {self.stats['pages']} pages "
+            f"({self.stats['pages'] / elapsed:.1f} pages/s, {self.workers} workers), "
+            f"{self.stats['failed']} failed"
+        )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+def read_spooled_text(result: dict) -> str:
+    """Reads and removes a worker's spooled text."""
+    with open(result["path"], "r", encoding="utf-8") as handle:
+        text = handle.read()
+    os.remove(result["path"])
+    return text
+
 def ensure_content_text_column(client: bigquery.Client, table_id: str) -> None:
     """Adds content_text STRING column if it does not exist."""
     ddl = f"""
@@ -47,58 +280,489 @@ def get_base64_column_name(client: bigquery.Client, table_id: str) -> str | None
         print(f"\n⚠️ Could not fetch schema for {table_id}: {e}")
         return None
 
-def is_document_processed(
-    client: bigquery.Client,
-    table_id: str,
-    envelope_id: str,
-    document_id: str,
-) -> bool:
-    """Returns True if content_text for the (envelope_id, document_id) is already populated and non-empty."""
-    sql = f"""
-        SELECT content_text
-        FROM `{table_id}`
-        WHERE envelope_id = @envelope_id AND document_id = @document_id
-        LIMIT 1
-    """
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("envelope_id", "STRING", envelope_id),
-            bigquery.ScalarQueryParameter("document_id", "STRING", document_id),
-        ]
-    )
+# --- Content-Addressed Store ---
+
+# Envelopes sent from the same template carry identical files. PDF bytes
+# (written by the connector) are stored once per file in document_blobs, and
+# each unique file is extracted once and each unique text embedded once, into
+# document_texts and chunk_embeddings. document_contents rows only point at
+# their text through content_sha256 (hash of the file) and text_sha256 (hash
+# of the normalized text); the envelope_document_texts view joins the text
+# back per document for the SQL agent. Chunk embeddings are still copied onto
+# per-envelope rows of document_embeddings: VECTOR_SEARCH can only filter by
+# envelope_id/document_id through the index on the table it searches.
+DOCUMENT_BLOBS_TABLE = "document_blobs"
+DOCUMENT_TEXTS_TABLE = "document_texts"
+CHUNK_EMBEDDINGS_TABLE = "chunk_embeddings"
+ENVELOPE_TEXTS_VIEW = "envelope_document_texts"
+
+DOCUMENT_TEXTS_SCHEMA = [
+    bigquery.SchemaField("content_sha256", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("text_sha256", "STRING"),
+    bigquery.SchemaField("content_text", "STRING"),
+    bigquery.SchemaField("extracted_at", "TIMESTAMP"),
+]
+
+def dataset_table_id(table_id: str, name: str) -> str:
+    """A sibling table in the same dataset as `table_id`."""
+    return f"{table_id.rsplit('.', 1)[0]}.{name}"
+
+def text_hash_sql(column: str) -> str:
+    """SQL for the hash of whitespace-normalized text, so trivially different
+    extractions of the same words share one set of embeddings."""
+    return f"TO_HEX(SHA256(REGEXP_REPLACE(TRIM({column}), r'\\s+', ' ')))"
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """Parses "i/n", e.g. "2/4" -> (2, 4): the third of four shards."""
+    index, _, count = value.partition("/")
+    shard = (int(index), int(count))
+    if not 0 <= shard[0] < shard[1]:
+        raise ValueError(f"Shard must be i/n with 0 <= i < n, got {value!r}")
+    return shard
+
+def shard_filter_sql(column: str, shard: tuple[int, int] | None) -> str:
+    """SQL condition selecting this shard's keys (stable across runs), or "" for no sharding."""
+    if not shard or shard[1] == 1:
+        return ""
+    index, count = shard
+    return f"\n            AND MOD(ABS(FARM_FINGERPRINT({column})), {count}) = {index}"
+
+def table_exists(client: bigquery.Client, table_id: str) -> bool:
     try:
-        rows = list(client.query(sql, job_config=job_config).result())
-        if not rows:
-            return False
-        val = rows[0].get("content_text") if hasattr(rows[0], "get") else rows[0]["content_text"]
-        return bool(val and str(val).strip())
-    except Exception as e:
-        print(f"   ⚠️ Warning: could not check processed state: {e}")
+        client.get_table(table_id)
+        return True
+    except NotFound:
         return False
 
-def update_document_text_and_clear_base64(
-    client: bigquery.Client,
+def ensure_content_addressing(client: bigquery.Client, table_id: str, base64_col: str | None) -> None:
+    """
+    Adds the hash columns to document_contents, creates the text store and
+    the per-document text view, and backfills hashes for rows synced before
+    content addressing (inline base64, or text extracted per envelope) in one
+    UPDATE.
+    """
+    client.query(f"""
+        ALTER TABLE `{table_id}`
+        ADD COLUMN IF NOT EXISTS content_sha256 STRING,
+        ADD COLUMN IF NOT EXISTS text_sha256 STRING
+    """).result()
+    texts = dataset_table_id(table_id, DOCUMENT_TEXTS_TABLE)
+    client.create_table(bigquery.Table(texts, schema=DOCUMENT_TEXTS_SCHEMA), exists_ok=True)
+    # Rows extracted before content addressing keep their own copy of the text
+    excluded = f"content_text, {base64_col}" if base64_col else "content_text"
+    client.query(f"""
+        CREATE OR REPLACE VIEW `{dataset_table_id(table_id, ENVELOPE_TEXTS_VIEW)}` AS
+        SELECT D.* EXCEPT ({excluded}),
+               COALESCE(NULLIF(D.content_text, ''), T.content_text) AS content_text
+        FROM `{table_id}` AS D
+        LEFT JOIN `{texts}` AS T USING (content_sha256)
+    """).result()
+    needs_content_hash = "FALSE"
+    if base64_col:
+        needs_content_hash = f"(content_sha256 IS NULL AND {base64_col} IS NOT NULL AND {base64_col} != '')"
+    needs_text_hash = "(text_sha256 IS NULL AND content_text IS NOT NULL AND content_text != '')"
+    content_hash = f"TO_HEX(SHA256(SAFE.FROM_BASE64({base64_col})))" if base64_col else "NULL"
+    client.query(f"""
+        UPDATE `{table_id}`
+        SET content_sha256 = IF({needs_content_hash}, {content_hash}, content_sha256),
+            text_sha256 = IF({needs_text_hash}, {text_hash_sql("content_text")}, text_sha256)
+        WHERE {needs_content_hash} OR {needs_text_hash}
+    """).result()
+
+# Extracted text is appended to this table with load jobs and merged into
+# the text store at the end of the run
+TEXT_STAGING_TABLE_SUFFIX = "_text_staging"
+# Documents buffered in memory before each staging load job
+EXTRACTION_FLUSH_DOCS = int(os.getenv("EXTRACTION_FLUSH_DOCS", "1000"))
+
+TEXT_STAGING_SCHEMA = [
+    bigquery.SchemaField("content_sha256", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("content_text", "STRING"),
+    bigquery.SchemaField("extracted_at", "TIMESTAMP"),
+]
+
+def staging_table_id(table_id: str, shard: tuple[int, int] | None = None) -> str:
+    """Each shard stages into its own table, so concurrent runs never merge
+    or drop each other's staged text."""
+    if not shard or shard[1] == 1:
+        return f"{table_id}{TEXT_STAGING_TABLE_SUFFIX}"
+    return f"{table_id}{TEXT_STAGING_TABLE_SUFFIX}_{shard[0]}_of_{shard[1]}"
+
+def content_needing_text_sql(
     table_id: str,
-    envelope_id: str,
-    document_id: str,
-    content_text: str,
-    base64_col: str,
+    base64_col: str | None,
+    blobs_exist: bool,
+    staging_exists: bool,
+    shard: tuple[int, int] | None = None,
+) -> str:
+    """
+    Work set in one query: each unique file (content_sha256) referenced by a
+    row without text, whose text is not in the store yet, with its bytes from
+    document_blobs or an inline base64 copy; minus files already staged by an
+    earlier (interrupted) run.
+    """
+    inline = f"NULLIF(D.{base64_col}, '')" if base64_col else "CAST(NULL AS STRING)"
+    source = "P.inline_base64"
+    joins = ""
+    if blobs_exist:
+        source = "COALESCE(NULLIF(B.content_base64, ''), P.inline_base64)"
+        joins += f"""
+        LEFT JOIN `{dataset_table_id(table_id, DOCUMENT_BLOBS_TABLE)}` AS B USING (content_sha256)"""
+    staged_filter = ""
+    if staging_exists:
+        joins += f"""
+        LEFT JOIN `{staging_table_id(table_id, shard)}` AS S USING (content_sha256)"""
+        staged_filter = "\n          AND S.content_sha256 IS NULL"
+    return f"""
+        WITH pending AS (
+          SELECT D.content_sha256, ANY_VALUE({inline}) AS inline_base64
+          FROM `{table_id}` AS D
+          WHERE D.text_sha256 IS NULL
+            AND (D.content_text IS NULL OR D.content_text = '')
+            AND D.content_sha256 IS NOT NULL{shard_filter_sql("D.content_sha256", shard)}
+          GROUP BY D.content_sha256
+        )
+        SELECT P.content_sha256, {source} AS content_base64
+        FROM pending AS P
+        LEFT JOIN `{dataset_table_id(table_id, DOCUMENT_TEXTS_TABLE)}` AS T USING (content_sha256){joins}
+        WHERE T.content_sha256 IS NULL
+          AND {source} IS NOT NULL{staged_filter}
+    """
+
+def stage_extracted_text(
+    client: bigquery.Client, table_id: str, rows: list[dict], shard: tuple[int, int] | None = None
 ) -> None:
-    """Update row with extracted text and clear the base64 column in a single DML statement."""
+    """Append extracted text to the staging table with a load job (no DML quota)."""
+    if not rows:
+        return
+    job_config = bigquery.LoadJobConfig(
+        schema=TEXT_STAGING_SCHEMA,
+        source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+        create_disposition=bigquery.CreateDisposition.CREATE_IF_NEEDED,
+    )
+    client.load_table_from_json(rows, staging_table_id(table_id, shard), job_config=job_config).result()
+
+def apply_extracted_text(
+    client: bigquery.Client, table_id: str, base64_col: str | None, shard: tuple[int, int] | None = None
+) -> int:
+    """
+    Merges staged text into the text store (one row per file), then points
+    every document_contents row of that file at it by setting text_sha256,
+    including copies synced after it was first extracted, and clears PDF
+    bytes that are no longer needed. The text itself is not copied; readers
+    join document_texts (or use the envelope_document_texts view). Returns
+    document_contents rows updated. Both UPDATEs only touch this shard's
+    files, so parallel shards never write the same rows.
+    """
+    texts = dataset_table_id(table_id, DOCUMENT_TEXTS_TABLE)
+    staging = staging_table_id(table_id, shard)
+    if table_exists(client, staging):
+        client.query(f"""
+            MERGE `{texts}` AS T
+            USING (
+              SELECT content_sha256, ANY_VALUE(content_text) AS content_text, MAX(extracted_at) AS extracted_at
+              FROM `{staging}`
+              GROUP BY content_sha256
+            ) AS S
+            ON T.content_sha256 = S.content_sha256
+            WHEN NOT MATCHED THEN INSERT (content_sha256, text_sha256, content_text, extracted_at)
+              VALUES (S.content_sha256, {text_hash_sql("S.content_text")}, S.content_text, S.extracted_at)
+        """).result()
+        client.delete_table(staging, not_found_ok=True)
+
+    clear_inline = f",\n              {base64_col} = ''" if base64_col else ""
+    job = client.query(f"""
+        UPDATE `{table_id}` AS D
+        SET text_sha256 = T.text_sha256{clear_inline}
+        FROM `{texts}` AS T
+        WHERE D.content_sha256 = T.content_sha256
+          AND D.text_sha256 IS NULL
+          AND (D.content_text IS NULL OR D.content_text = ''){shard_filter_sql("D.content_sha256", shard)}
+    """)
+    job.result()
+
+    blobs = dataset_table_id(table_id, DOCUMENT_BLOBS_TABLE)
+    if table_exists(client, blobs):
+        client.query(f"""
+            UPDATE `{blobs}`
+            SET content_base64 = ''
+            WHERE content_base64 != ''
+              AND content_sha256 IN (SELECT content_sha256 FROM `{texts}`){shard_filter_sql("content_sha256", shard)}
+        """).result()
+    return int(job.num_dml_affected_rows or 0)
+
+def decode_pdf_field(encoded_field) -> bytes:
+    """Raw PDF bytes from a BYTES column value or a base64 string."""
+    if isinstance(encoded_field, (bytes, bytearray)):
+        return bytes(encoded_field)
+    return base64.b64decode(encoded_field, validate=False)
+
+def select_texts_without_embeddings(
+    client: bigquery.Client,
+    source_table_id: str,
+    embeddings_table_id: str,
+    shard: tuple[int, int] | None = None,
+) -> Iterator[dict]:
+    """
+    Unique texts (text_sha256, content_text) of documents that have no rows in
+    the embeddings table and whose chunks are not in the chunk store yet,
+    computed with one anti-join instead of a query per document. The text
+    comes from the text store, or from the row itself for documents
+    extracted before content addressing.
+    """
+    chunks_table_id = dataset_table_id(source_table_id, CHUNK_EMBEDDINGS_TABLE)
+    texts_table_id = dataset_table_id(source_table_id, DOCUMENT_TEXTS_TABLE)
+    text = "COALESCE(NULLIF(D.content_text, ''), T.content_text)"
     sql = f"""
-        UPDATE `{table_id}`
-        SET content_text = @content_text,
-            {base64_col} = ''
-        WHERE envelope_id = @envelope_id AND document_id = @document_id
+        WITH missing AS (
+          SELECT D.text_sha256, ANY_VALUE({text}) AS content_text
+          FROM `{source_table_id}` AS D
+          LEFT JOIN `{texts_table_id}` AS T USING (content_sha256)
+          LEFT JOIN (
+            SELECT DISTINCT envelope_id, document_id FROM `{embeddings_table_id}`
+          ) AS E
+            ON E.envelope_id = D.envelope_id AND E.document_id = D.document_id
+          WHERE D.text_sha256 IS NOT NULL
+            AND TRIM({text}) != ''
+            AND E.envelope_id IS NULL{shard_filter_sql("D.text_sha256", shard)}
+          GROUP BY D.text_sha256
+        )
+        SELECT M.text_sha256, M.content_text
+        FROM missing AS M
+        LEFT JOIN (SELECT DISTINCT text_sha256 FROM `{chunks_table_id}`) AS C USING (text_sha256)
+        WHERE C.text_sha256 IS NULL
+    """
+    for row in client.query(sql).result():
+        yield dict(row.items())
+
+def materialize_document_embeddings(
+    client: bigquery.Client,
+    source_table_id: str,
+    embeddings_table_id: str,
+    shard: tuple[int, int] | None = None,
+) -> int:
+    """
+    Copies stored chunk embeddings to every (envelope_id, document_id) whose
+    text they belong to and that has no rows yet, in one INSERT inside
+    BigQuery. Retrieval filters and VECTOR_SEARCH need per-envelope rows; the
+    embedding model is only called once per unique text. A shard only copies
+    the texts it embeds, so parallel shards never insert the same rows twice.
+    """
+    chunks_table_id = dataset_table_id(source_table_id, CHUNK_EMBEDDINGS_TABLE)
+    job = client.query(f"""
+        INSERT INTO `{embeddings_table_id}` (envelope_id, document_id, chunk_id, content, embedding)
+        SELECT D.envelope_id, D.document_id, C.chunk_id, C.content, C.embedding
+        FROM (
+          SELECT envelope_id, document_id, ANY_VALUE(text_sha256) AS text_sha256
+          FROM `{source_table_id}`
+          WHERE text_sha256 IS NOT NULL{shard_filter_sql("text_sha256", shard)}
+          GROUP BY envelope_id, document_id
+        ) AS D
+        JOIN `{chunks_table_id}` AS C ON C.text_sha256 = D.text_sha256
+        LEFT JOIN (
+          SELECT DISTINCT envelope_id, document_id FROM `{embeddings_table_id}`
+        ) AS E
+          ON E.envelope_id = D.envelope_id AND E.document_id = D.document_id
+        WHERE E.envelope_id IS NULL
+    """)
+    job.result()
+    return int(job.num_dml_affected_rows or 0)
+
+# --- Chunking ---
+
+# Chunk size and overlap in tokens (words and punctuation marks)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+
+def count_tokens(text: str) -> int:
+    return len(_TOKEN_PATTERN.findall(text))
+
+def split_sentences(text: str) -> list[str]:
+    text = " ".join(text.split())
+    return [sentence for sentence in _SENTENCE_BOUNDARY.split(text) if sentence]
+
+def _split_long_sentence(sentence: str, max_tokens: int) -> list[str]:
+    """Cuts a sentence longer than a chunk at token boundaries."""
+    spans = [match.span() for match in _TOKEN_PATTERN.finditer(sentence)]
+    return [
+        sentence[spans[start][0]:spans[min(start + max_tokens, len(spans)) - 1][1]]
+        for start in range(0, len(spans), max_tokens)
+    ]
+
+def _token_tail(text: str, tokens: int) -> str:
+    """The last `tokens` tokens of `text`."""
+    spans = [match.span() for match in _TOKEN_PATTERN.finditer(text)]
+    return text[spans[-tokens][0]:] if 0 < tokens <= len(spans) else text
+
+def chunk_text(
+    text: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+) -> list[str]:
+    """
+    Packs whole sentences into chunks of at most `max_tokens` tokens. Each
+    chunk starts with the trailing sentences (up to `overlap_tokens`) of the
+    previous one, so context that spans a boundary appears in both. A
+    sentence longer than a chunk is cut into pieces of `max_tokens -
+    overlap_tokens` tokens, and when the previous chunk ends in a unit longer
+    than the overlap, its last `overlap_tokens` tokens are carried instead.
     """
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("content_text", "STRING", content_text),
-            bigquery.ScalarQueryParameter("envelope_id", "STRING", envelope_id),
-            bigquery.ScalarQueryParameter("document_id", "STRING", document_id),
-        ]
+    piece_tokens = max(1, max_tokens - overlap_tokens)
+    units: list[tuple[str, int]] = []
+    for sentence in split_sentences(text):
+        tokens = count_tokens(sentence)
+        if tokens > max_tokens:
+            units.extend(
+                (piece, count_tokens(piece)) for piece in _split_long_sentence(sentence, piece_tokens)
+            )
+        elif tokens:
+            units.append((sentence, tokens))
+
+    chunks: list[str] = []
+    current: list[tuple[str, int]] = []
+    current_tokens = 0
+    for unit in units:
+        if current and current_tokens + unit[1] > max_tokens:
+            chunks.append(" ".join(sentence for sentence, _ in current))
+            carried: list[tuple[str, int]] = []
+            carried_tokens = 0
+            for previous in reversed(current):
+                if carried_tokens + previous[1] > overlap_tokens:
+                    if not carried and overlap_tokens > 0:
+                        carried = [(_token_tail(previous[0], overlap_tokens), overlap_tokens)]
+                        carried_tokens = overlap_tokens
+                    break
+                carried.insert(0, previous)
+                carried_tokens += previous[1]
+            if carried_tokens + unit[1] > max_tokens:
+                carried, carried_tokens = [], 0
+            current, current_tokens = carried, carried_tokens
+        current.append(unit)
+        current_tokens += unit[1]
+    if current:
+        chunks.append(" ".join(sentence for sentence, _ in current))
+    return chunks
+
+# --- Embedders ---
+
+# "bigquery" embeds with the same remote model retrieval uses for queries;
+# "local" is a deterministic hashing embedder for tests and offline runs
+EMBEDDER = os.getenv("EMBEDDER", "bigquery")
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "document_embedding_model")
+# Chunks per embedding call
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "1000"))
+EMBEDDING_LOCAL_DIMENSION = int(os.getenv("EMBEDDING_LOCAL_DIMENSION", "256"))
+
+class Embedder(Protocol):
+    name: str
+    batch_size: int
+
+    def embed(self, texts: list[str]) -> list[list[float] | None]:
+        """One vector per text, or None for texts the model could not embed."""
+        ...
+
+class BigQueryEmbedder:
+    """ML.GENERATE_EMBEDDING over a whole batch of chunks in one query job."""
+
+    name = "bigquery"
+
+    def __init__(self, client: bigquery.Client, model_path: str, batch_size: int = EMBEDDING_BATCH_SIZE):
+        self.client = client
+        self.model_path = model_path
+        self.batch_size = batch_size
+
+    def embed(self, texts: list[str]) -> list[list[float] | None]:
+        sql = f"""
+            SELECT position, ml_generate_embedding_result AS embedding,
+                   ml_generate_embedding_status AS status
+            FROM ML.GENERATE_EMBEDDING(
+              MODEL `{self.model_path}`,
+              (SELECT content, position FROM UNNEST(@texts) AS content WITH OFFSET position)
+            )
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ArrayQueryParameter("texts", "STRING", texts)]
+        )
+        vectors: list[list[float] | None] = [None] * len(texts)
+        for row in self.client.query(sql, job_config=job_config).result():
+            if not row["status"] and row["embedding"]:
+                vectors[row["position"]] = list(row["embedding"])
+        return vectors
+
+class LocalHashEmbedder:
+    """
+    Deterministic feature-hashing embedder: signed token counts hashed into
+    `dimension` buckets, L2-normalized. Stable across runs and machines, but
+    not comparable with the BigQuery model's vectors.
+    """
+
+    name = "local"
+
+    def __init__(self, dimension: int = EMBEDDING_LOCAL_DIMENSION, batch_size: int = EMBEDDING_BATCH_SIZE):
+        self.dimension = dimension
+        self.batch_size = batch_size
+
+    def embed(self, texts: list[str]) -> list[list[float] | None]:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float64)
+        for row, text in enumerate(texts):
+            for token in _TOKEN_PATTERN.findall(text.lower()):
+                digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+                vectors[row, digest % self.dimension] += 1.0 if (digest >> 63) else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).tolist()
+
+def get_embedder(name: str, client: bigquery.Client, project_id: str, dataset_id: str) -> Embedder:
+    if name == "local":
+        return LocalHashEmbedder()
+    if name == "bigquery":
+        return BigQueryEmbedder(client, f"{project_id}.{dataset_id}.{EMBEDDING_MODEL_NAME}")
+    raise ValueError(f"Unknown embedder '{name}' (expected 'bigquery' or 'local')")
+
+# --- Writing Embeddings ---
+
+# Embedding rows written per load job; loads only happen between documents,
+# so a document's chunks always land together
+EMBEDDING_LOAD_ROWS = int(os.getenv("EMBEDDING_LOAD_ROWS", "50000"))
+
+EMBEDDINGS_SCHEMA = [
+    bigquery.SchemaField("envelope_id", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("document_id", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("chunk_id", "INTEGER", mode="REQUIRED"),
+    bigquery.SchemaField("content", "STRING"),
+    bigquery.SchemaField("embedding", "FLOAT64", mode="REPEATED"),
+]
+
+CHUNK_EMBEDDINGS_SCHEMA = [
+    bigquery.SchemaField("text_sha256", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("chunk_id", "INTEGER", mode="REQUIRED"),
+    bigquery.SchemaField("content", "STRING"),
+    bigquery.SchemaField("embedding", "FLOAT64", mode="REPEATED"),
+]
+
+def ensure_embeddings_table(
+    client: bigquery.Client, table_id: str, schema: list[bigquery.SchemaField] = EMBEDDINGS_SCHEMA
+) -> None:
+    table = bigquery.Table(table_id, schema=schema)
+    # Use exists_ok=True to avoid an error if the table already exists
+    client.create_table(table, exists_ok=True)
+
+def load_embedding_rows(client: bigquery.Client, table_id: str, source) -> None:
+    """Appends newline-delimited JSON rows (a file object or a list of dicts)
+    to the embeddings table with one load job."""
+    job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
     )
-    client.query(sql, job_config=job_config).result()
+    if isinstance(source, list):
+        job = client.load_table_from_json(source, table_id, job_config=job_config)
+    else:
+        job = client.load_table_from_file(source, table_id, rewind=True, job_config=job_config)
+    job.result()
 
 def push_embeddings_to_bigquery(client, project_id, dataset_id, table_name, data_to_insert):
     """Pushes a list of row data (as dicts) to the specified BigQuery table."""
@@ -109,160 +773,653 @@ def push_embeddings_to_bigquery(client, project_id, dataset_id, table_name, data
     table_id = f"{project_id}.{dataset_id}.{table_name}"
     print(f"\n--- Pushing Embeddings to BigQuery Table: {table_id} ---")
     
-    # Define the schema for the destination table
-    schema = [
-        bigquery.SchemaField("envelope_id", "STRING", mode="REQUIRED"),
-        bigquery.SchemaField("document_id", "STRING", mode="REQUIRED"),
-        bigquery.SchemaField("chunk_id", "INTEGER", mode="REQUIRED"),
-        bigquery.SchemaField("text_chunk", "STRING"),
-        bigquery.SchemaField("embedding", "FLOAT64", mode="REPEATED"),
-    ]
-    
-    table = bigquery.Table(table_id, schema=schema)
-    # Use exists_ok=True to avoid an error if the table already exists
-    client.create_table(table, exists_ok=True) 
+    ensure_embeddings_table(client, table_id)
     print(f"Ensured table '{table_id}' exists.")
     
-    # Insert the rows
-    errors = client.insert_rows_json(table_id, data_to_insert)
-    if not errors:
+    # A load job instead of streaming inserts: no streaming buffer, no per-row cost
+    try:
+        load_embedding_rows(client, table_id, data_to_insert)
         print(f"✅ Successfully pushed {len(data_to_insert)} embedding chunks to BigQuery.")
-    else:
-        print("❌ Encountered errors while inserting rows:")
-        for error in errors:
-            print(error)
+    except Exception as e:
+        print(f"❌ Encountered errors while loading rows: {e}")
 
-def check_if_doc_exists_in_embeddings(
+def embed_documents(
     client: bigquery.Client,
-    dest_table_id: str,
-    envelope_id: str,
-    document_id: str
-) -> bool:
-    """
-    Uses the BigQuery client to run a simple SQL query to check if a document ID exists.
+    documents: Iterable[dict],
+    embedder: Embedder,
+    table_id: str,
+    on_loaded: Callable[[list[dict]], None] | None = None,
+    on_failed: Callable[[dict, str], None] | None = None,
+) -> dict:
     """
-    sql_to_check = f"""
-        SELECT COUNT(*) as count
-        FROM `{dest_table_id}`
-        WHERE envelope_id = @envelope_id AND document_id = @document_id
+    Chunks every document, embeds the chunks in batches across documents and
+    appends the rows to `table_id` through a spooled NDJSON file and load jobs.
+    Each row carries the document's fields other than content_text (its ids
+    or text hash) plus chunk_id, content and embedding. Documents with any
+    chunk the model could not embed are skipped whole, so the next run picks
+    them up again. `on_loaded` receives the identities of documents after
+    their load job succeeds, `on_failed` each skipped identity and reason.
     """
-    
-    # Use query parameters for safety and correctness
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("envelope_id", "STRING", envelope_id),
-            bigquery.ScalarQueryParameter("document_id", "STRING", document_id),
-        ]
-    )
-    
+    stats = {"documents": 0, "chunks": 0, "failed": 0, "embed_calls": 0, "load_jobs": 0}
+    started = time.monotonic()
+    spool = tempfile.TemporaryFile(mode="w+b")
+    spooled_rows = 0
+    spooled_documents: list[dict] = []
+    batch: list[tuple[dict, list[str]]] = []
+    batch_chunks = 0
+
+    def embed_batch() -> None:
+        nonlocal spooled_rows
+        texts = [chunk for _, chunks in batch for chunk in chunks]
+        vectors: list[list[float] | None] = []
+        for start in range(0, len(texts), embedder.batch_size):
+            vectors.extend(embedder.embed(texts[start:start + embedder.batch_size]))
+            stats["embed_calls"] += 1
+        offset = 0
+        for document, chunks in batch:
+            document_vectors = vectors[offset:offset + len(chunks)]
+            offset += len(chunks)
+            identity = {key: value for key, value in document.items() if key != "content_text"}
+            if any(vector is None for vector in document_vectors):
+                stats["failed"] += 1
+                print(f"   -> Skipping {' / '.join(map(str, identity.values()))}: embedding failed")
+                if on_failed:
+                    on_failed(identity, "embedding failed")
+                continue
+            for chunk_id, (chunk, vector) in enumerate(zip(chunks, document_vectors)):
+                row = {
+                    **identity,
+                    "chunk_id": chunk_id,
+                    "content": chunk,
+                    "embedding": vector,
+                }
+                spool.write(json.dumps(row).encode("utf-8") + b"\n")
+            spooled_rows += len(chunks)
+            spooled_documents.append(identity)
+            stats["documents"] += 1
+            stats["chunks"] += len(chunks)
+
+    def flush() -> None:
+        nonlocal spooled_rows
+        if not spooled_rows:
+            return
+        spool.flush()
+        load_embedding_rows(client, table_id, spool)
+        stats["load_jobs"] += 1
+        spool.seek(0)
+        spool.truncate()
+        spooled_rows = 0
+        if on_loaded:
+            on_loaded(spooled_documents)
+        spooled_documents.clear()
+        elapsed = max(time.monotonic() - started, 1e-9)
+        print(
+            f"   -> Loaded embeddings for {stats['documents']} documents "
+            f"({stats['chunks']} chunks, {stats['chunks'] / elapsed:.1f} chunks/s)"
+        )
+
     try:
-        query_job = client.query(sql_to_check, job_config=job_config)
-        results = query_job.result()
-        for row in results:
-            if row.count > 0:
-                return True
-        return False
-    except Exception as e:
-        print(f"   ⚠️ Warning: Could not execute check query: {e}")
-        # Default to False to be safe, though this may cause reprocessing
+        for document in documents:
+            chunks = chunk_text(document["content_text"] or "")
+            if not chunks:
+                # Nothing to embed; report it so the claim is not left running
+                identity = {key: value for key, value in document.items() if key != "content_text"}
+                stats["failed"] += 1
+                if on_failed:
+                    on_failed(identity, "no text to embed (whitespace only)")
+                continue
+            batch.append((document, chunks))
+            batch_chunks += len(chunks)
+            if batch_chunks >= embedder.batch_size:
+                embed_batch()
+                batch, batch_chunks = [], 0
+                if spooled_rows >= EMBEDDING_LOAD_ROWS:
+                    flush()
+        if batch:
+            embed_batch()
+        flush()
+    finally:
+        spool.close()
+    stats["seconds"] = round(time.monotonic() - started, 1)
+    return stats
+
+# --- Managed Vector Index ---
+
+# The pipeline owns the VECTOR_SEARCH index on document_embeddings: it creates
+# the index once rows exist and recreates it when the configuration changes.
+# The API only reads its status from INFORMATION_SCHEMA.VECTOR_INDEXES. The
+# name, distance and stored columns live in vector_index_config.py.
+BQ_VECTOR_INDEX_TYPE = os.getenv("BQ_VECTOR_INDEX_TYPE", "IVF").upper()
+# IVF lists / TreeAH leaf size; 0 lets BigQuery pick from the table size
+BQ_VECTOR_INDEX_NUM_LISTS = int(os.getenv("BQ_VECTOR_INDEX_NUM_LISTS", "0"))
+BQ_VECTOR_INDEX_LEAF_SIZE = int(os.getenv("BQ_VECTOR_INDEX_LEAF_SIZE", "0"))
+VECTOR_INDEX_TYPES = ("IVF", "TREE_AH")
+
+def vector_index_options(index_type: str, num_lists: int = 0, leaf_size: int = 0) -> str:
+    index_type = index_type.upper()
+    if index_type not in VECTOR_INDEX_TYPES:
+        raise ValueError(f"Unsupported vector index type {index_type}")
+    options = [f"index_type = '{index_type}'", f"distance_type = '{VECTOR_INDEX_DISTANCE}'"]
+    if index_type == "IVF" and num_lists > 0:
+        options.append(f"ivf_options = '{json.dumps({'num_lists': int(num_lists)})}'")
+    if index_type == "TREE_AH" and leaf_size > 0:
+        options.append(
+            f"tree_ah_options = '{json.dumps({'leaf_node_embedding_count': int(leaf_size)})}'"
+        )
+    return ", ".join(options)
+
+def create_vector_index_sql(
+    table_id: str,
+    index_name: str = BQ_VECTOR_INDEX_NAME,
+    index_type: str = BQ_VECTOR_INDEX_TYPE,
+    num_lists: int = BQ_VECTOR_INDEX_NUM_LISTS,
+    leaf_size: int = BQ_VECTOR_INDEX_LEAF_SIZE,
+    stored_columns: Iterable[str] = (),
+) -> str:
+    stored_columns = list(stored_columns)
+    storing = f"\nSTORING({', '.join(stored_columns)})" if stored_columns else ""
+    return (
+        f"CREATE VECTOR INDEX IF NOT EXISTS {index_name}\n"
+        f"ON `{table_id}`(embedding){storing}\n"
+        f"OPTIONS({vector_index_options(index_type, num_lists, leaf_size)})"
+    )
+
+def drop_vector_index_sql(table_id: str, index_name: str = BQ_VECTOR_INDEX_NAME) -> str:
+    return f"DROP VECTOR INDEX IF EXISTS {index_name} ON `{table_id}`"
+
+def vector_index_needs_rebuild(
+    status: dict | None,
+    index_type: str = BQ_VECTOR_INDEX_TYPE,
+    num_lists: int = BQ_VECTOR_INDEX_NUM_LISTS,
+    leaf_size: int = BQ_VECTOR_INDEX_LEAF_SIZE,
+    stored_columns: Iterable[str] | None = None,
+) -> bool:
+    """True when an existing index no longer matches the configuration or was
+    permanently disabled, so it has to be dropped and created again.
+
+    `stored_columns` is what the index should store; None skips that check.
+    """
+    if not status:
         return False
+    if str(status.get("index_status") or "").upper() == "PERMANENTLY DISABLED":
+        return True
+    ddl = status.get("ddl", "")
+    index_type = index_type.upper()
+    existing_type = ddl_option(ddl, "index_type")
+    if existing_type not in (None, index_type):
+        return True
+    if ddl_option(ddl, "distance_type") not in (None, VECTOR_INDEX_DISTANCE):
+        return True
+    # A size of 0 leaves the choice to BigQuery, which the DDL records as no option
+    if index_type == "IVF" and ddl_json_option(ddl, "ivf_options", "num_lists") != (num_lists or None):
+        return True
+    if index_type == "TREE_AH" and ddl_json_option(
+        ddl, "tree_ah_options", "leaf_node_embedding_count"
+    ) != (leaf_size or None):
+        return True
+    return stored_columns is not None and set(ddl_stored_columns(ddl)) != set(stored_columns)
+
+def maintain_vector_index(client: bigquery.Client, table_id: str, index_name: str = BQ_VECTOR_INDEX_NAME) -> str:
+    """Creates the index on `table_id` if missing, rebuilding it when stale; returns what was done."""
+    dataset, table_name = table_id.rsplit(".", 1)
+    rows = list(client.query(f"""
+        SELECT index_status, ddl
+        FROM `{dataset}.INFORMATION_SCHEMA.VECTOR_INDEXES`
+        WHERE table_name = '{table_name}' AND index_name = '{index_name}'
+    """).result())
+    status = dict(rows[0].items()) if rows else None
+    columns = {field.name for field in client.get_table(table_id).schema}
+    stored = [name for name in VECTOR_INDEX_STORED_COLUMNS if name in columns]
+    action = "unchanged"
+    if vector_index_needs_rebuild(status, stored_columns=stored):
+        client.query(drop_vector_index_sql(table_id, index_name)).result()
+        status, action = None, "rebuilt"
+    if status is None:
+        client.query(create_vector_index_sql(table_id, index_name, stored_columns=stored)).result()
+        action = "created" if action == "unchanged" else action
+    return action
+
+# --- Run Checkpoint ---
+
+# Local SQLite ledger of pipeline runs and per-item attempts. BigQuery stays
+# the source of truth for what still needs work (the anti-join work sets);
+# the checkpoint adds what BigQuery cannot see: attempts, errors, items that
+# keep failing (dead letters) and which shard is being worked on.
+PIPELINE_CHECKPOINT_PATH = os.getenv(
+    "PIPELINE_CHECKPOINT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "pipeline_checkpoint.sqlite3"),
+)
+# Attempts before an item is moved to the dead-letter list and skipped
+PIPELINE_MAX_ATTEMPTS = int(os.getenv("PIPELINE_MAX_ATTEMPTS", "3"))
+# A shard whose run has not written to the checkpoint for this long is
+# considered abandoned and may be taken over
+PIPELINE_LEASE_SECONDS = float(os.getenv("PIPELINE_LEASE_SECONDS", "900"))
+
+def _utc_now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+def shard_label(shard: tuple[int, int] | None) -> str:
+    return f"{shard[0]}/{shard[1]}" if shard else "0/1"
+
+class PipelineCheckpoint:
+    """
+    Per-item status (running, done, failed, dead), attempts and last error
+    for each stage, plus one row per run. Items are claimed right before they
+    are processed, so an item that takes the whole run down (a PDF that hangs
+    or exhausts memory in the parent) is counted as an attempt and ends up
+    dead-lettered instead of stopping every later run. Safe to share between
+    the processes of a sharded run (WAL, busy timeout, one shard lease each).
+    The file is local, so the leases only coordinate runs on one host.
+    """
+
+    def __init__(self, path: str = PIPELINE_CHECKPOINT_PATH, max_attempts: int = PIPELINE_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max(1, max_attempts)
+        self.run_id: str | None = None
+        self._connection = sqlite3.connect(path, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                shard TEXT NOT NULL,
+                status TEXT NOT NULL,
+                started_at TEXT NOT NULL,
+                heartbeat_at TEXT NOT NULL,
+                finished_at TEXT,
+                stats TEXT
+            );
+            CREATE TABLE IF NOT EXISTS items (
+                stage TEXT NOT NULL,
+                item_key TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                run_id TEXT,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (stage, item_key)
+            );
+            CREATE INDEX IF NOT EXISTS items_by_status ON items (stage, status);
+            """
+        )
+        self._connection.commit()
+
+    def start_run(self, shard: tuple[int, int] | None = None) -> str:
+        """
+        Registers a run for `shard`, refusing to start while another run has
+        written within the lease and either holds the same shard or splits
+        the work into a different number of shards (0/1 covers every row of
+        0/2, and 0/2 overlaps 0/4). Runs past their lease are marked
+        abandoned; items they left "running" keep their attempt count.
+        Leases live in the local checkpoint file, so runs on other hosts are
+        not seen.
+        """
+        label = shard_label(shard)
+        count = shard[1] if shard else 1
+        now = datetime.datetime.now(datetime.timezone.utc)
+        cutoff = (now - datetime.timedelta(seconds=PIPELINE_LEASE_SECONDS)).isoformat()
+        with self._connection:
+            self._connection.execute("BEGIN IMMEDIATE")
+            active = self._connection.execute(
+                "SELECT run_id, shard FROM runs WHERE status = 'running' AND heartbeat_at > ?", (cutoff,)
+            ).fetchall()
+            for run_id, other in active:
+                if other == label:
+                    raise RuntimeError(f"Shard {label} is already being processed by run {run_id}")
+                if int(other.split("/")[1]) != count:
+                    raise RuntimeError(
+                        f"Run {run_id} is processing shard {other}, which overlaps shard {label}; "
+                        "wait for it to finish or use the same shard count"
+                    )
+            self._connection.execute(
+                "UPDATE runs SET status = 'abandoned' WHERE status = 'running' AND heartbeat_at <= ?", (cutoff,)
+            )
+            self.run_id = f"{now.strftime('%Y%m%dT%H%M%S')}-{label.replace('/', 'of')}-{os.getpid()}"
+            self._connection.execute(
+                "INSERT INTO runs (run_id, shard, status, started_at, heartbeat_at) VALUES (?, ?, 'running', ?, ?)",
+                (self.run_id, label, now.isoformat(), now.isoformat()),
+            )
+        return self.run_id
+
+    def finish_run(self, status: str, stats: dict) -> None:
+        with self._connection:
+            self._connection.execute(
+                "UPDATE runs SET status = ?, finished_at = ?, stats = ? WHERE run_id = ?",
+                (status, _utc_now(), json.dumps(stats, default=str), self.run_id),
+            )
+
+    def _heartbeat(self, now: str) -> None:
+        self._connection.execute("UPDATE runs SET heartbeat_at = ? WHERE run_id = ?", (now, self.run_id))
+
+    def claim(self, stage: str, key: str) -> bool:
+        """
+        Records an attempt at `key` and returns True if it should be
+        processed; False for dead letters and for items that have used up
+        their attempts (which are dead-lettered here).
+        """
+        now = _utc_now()
+        with self._connection:
+            row = self._connection.execute(
+                "SELECT status, attempts, last_error FROM items WHERE stage = ? AND item_key = ?", (stage, key)
+            ).fetchone()
+            status, attempts, last_error = row or (None, 0, None)
+            if status == "dead":
+                return False
+            if status == "done":
+                # BigQuery says it needs work again (e.g. the text was cleared)
+                attempts = 0
+            if attempts >= self.max_attempts:
+                if status == "running":
+                    last_error = "did not finish (run interrupted)"
+                self._connection.execute(
+                    "UPDATE items SET status = 'dead', last_error = ?, updated_at = ? WHERE stage = ? AND item_key = ?",
+                    (last_error, now, stage, key),
+                )
+                return False
+            self._connection.execute(
+                """
+                INSERT INTO items (stage, item_key, status, attempts, run_id, updated_at)
+                VALUES (?, ?, 'running', ?, ?, ?)
+                ON CONFLICT (stage, item_key) DO UPDATE SET
+                  status = 'running', attempts = excluded.attempts,
+                  run_id = excluded.run_id, updated_at = excluded.updated_at
+                """,
+                (stage, key, attempts + 1, self.run_id, now),
+            )
+            self._heartbeat(now)
+        return True
+
+    def mark_done(self, stage: str, keys: Iterable[str]) -> None:
+        now = _utc_now()
+        with self._connection:
+            self._connection.executemany(
+                "UPDATE items SET status = 'done', last_error = NULL, updated_at = ? WHERE stage = ? AND item_key = ?",
+                [(now, stage, key) for key in keys],
+            )
+            self._heartbeat(now)
+
+    def mark_failed(self, stage: str, key: str, error: str) -> None:
+        """Records the error; the item is retried by later runs until it runs out of attempts."""
+        now = _utc_now()
+        with self._connection:
+            self._connection.execute(
+                """
+                UPDATE items
+                SET status = CASE WHEN attempts >= ? THEN 'dead' ELSE 'failed' END,
+                    last_error = ?, updated_at = ?
+                WHERE stage = ? AND item_key = ?
+                """,
+                (self.max_attempts, error[:2000], now, stage, key),
+            )
+            self._heartbeat(now)
+
+    def dead_letters(self, stage: str | None = None) -> list[dict]:
+        sql = "SELECT stage, item_key, attempts, last_error, updated_at FROM items WHERE status = 'dead'"
+        params: tuple = ()
+        if stage:
+            sql += " AND stage = ?"
+            params = (stage,)
+        columns = ("stage", "item_key", "attempts", "last_error", "updated_at")
+        return [dict(zip(columns, row)) for row in self._connection.execute(sql + " ORDER BY updated_at", params)]
+
+    def retry_dead_letters(self, stage: str | None = None) -> int:
+        """Gives dead-lettered items a fresh set of attempts."""
+        sql = "UPDATE items SET status = 'failed', attempts = 0 WHERE status = 'dead'"
+        params: tuple = ()
+        if stage:
+            sql += " AND stage = ?"
+            params = (stage,)
+        with self._connection:
+            return self._connection.execute(sql, params).rowcount
+
+    def summary(self) -> dict:
+        counts: dict = {}
+        for stage, status, count in self._connection.execute(
+            "SELECT stage, status, COUNT(*) FROM items GROUP BY stage, status"
+        ):
+            counts.setdefault(stage, {})[status] = count
+        return counts
+
+    def close(self) -> None:
+        self._connection.close()
+
+def launch_shards(count: int, argv: list[str]) -> int:
+    """
+    Runs this script once per shard in parallel child processes, splitting
+    the extraction workers between them. Returns the number of shards that
+    exited with an error. Table setup and the hash backfill (before) and the
+    vector index DDL (after) are run once by the caller, not by every shard.
+    """
+    workers = max(1, EXTRACTION_WORKERS // count)
+    env = {**os.environ, "EXTRACTION_WORKERS": str(workers)}
+    children = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), *argv, "--shard", f"{index}/{count}"], env=env)
+        for index in range(count)
+    ]
+    return sum(1 for child in children if child.wait() != 0)
 
 # --- Main Script Logic ---
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract, chunk and embed document text into BigQuery")
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        help="Process only shard i of n, e.g. 0/4 (tables are prepared by an unsharded or --shards run)",
+    )
+    parser.add_argument("--shards", type=int, default=1, help="Run this many shards in parallel processes")
+    parser.add_argument("--checkpoint", default=PIPELINE_CHECKPOINT_PATH, help="SQLite checkpoint file")
+    parser.add_argument("--dead-letters", action="store_true", help="List dead-lettered items and exit")
+    parser.add_argument(
+        "--retry-dead-letters", action="store_true", help="Give dead-lettered items new attempts, then run"
+    )
+    args = parser.parse_args()
+
+    checkpoint = PipelineCheckpoint(args.checkpoint)
+    if args.dead_letters:
+        print(json.dumps(checkpoint.dead_letters(), indent=2))
+        raise SystemExit(0)
+    if args.retry_dead_letters:
+        print(f"Retrying {checkpoint.retry_dead_letters()} dead-lettered items.")
+
+    project_id = "docusign-475113"
+    dataset_id = "customdocusignconnector"
+    table_id = f"{project_id}.{dataset_id}.document_contents"
+    embeddings_table_id = f"{project_id}.{dataset_id}.{os.getenv('EMBEDDINGS_TABLE_NAME', 'document_embeddings')}"
+
+    if args.shards > 1 and not args.shard:
+        checkpoint.close()
+        try:
+            client = bigquery.Client.from_service_account_json(SERVICE_ACCOUNT_PATH)
+            # Schema changes and the hash backfill rewrite document_contents, so
+            # they run here once instead of concurrently in every shard
+            ensure_content_text_column(client, table_id)
+            ensure_content_addressing(client, table_id, get_base64_column_name(client, table_id))
+        except Exception as e:
+            print(f"❌ Could not prepare {table_id}: {e}")
+            raise SystemExit(1)
+        failed_shards = launch_shards(args.shards, ["--checkpoint", args.checkpoint])
+        print(f"\n{args.shards - failed_shards}/{args.shards} shards finished.")
+        try:
+            print(f"✅ Vector index {BQ_VECTOR_INDEX_NAME}: {maintain_vector_index(client, embeddings_table_id)}")
+        except Exception as e:
+            print(f"⚠️ Could not maintain vector index {BQ_VECTOR_INDEX_NAME}: {e}")
+        raise SystemExit(1 if failed_shards else 0)
+    shard = args.shard
+    sharded = bool(shard and shard[1] > 1)
+    try:
+        run_id = checkpoint.start_run(shard)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    print(f"Run {run_id} (shard {shard_label(shard)}), checkpoint {args.checkpoint}")
+    run_stats: dict = {}
+    run_status = "completed"
+
     # 1) Construct a BigQuery client object
     try:
-        client = bigquery.Client.from_service_account_json(
-            os.path.join(os.path.dirname(__file__), "docusign-arpit.json")
-        )
+        client = bigquery.Client.from_service_account_json(SERVICE_ACCOUNT_PATH)
     except FileNotFoundError:
         print("Error: Service account key file 'docusign-arpit.json' not found. Please check the file path.")
+        checkpoint.finish_run("failed", {"error": "service account key file not found"})
         raise SystemExit(1)
     except Exception as e:
         print(f"Error initializing BigQuery client: {e}")
+        checkpoint.finish_run("failed", {"error": str(e)})
         raise SystemExit(1)
 
-    # 2) Define table IDs
-    project_id = "docusign-475113"
-    dataset_id = "customdocusignconnector"
-    table_name = "document_contents"
-    table_id = f"{project_id}.{dataset_id}.{table_name}"
-
-    # 3) Ensure schema has content_text column
-    ensure_content_text_column(client, table_id)
+    # 2) Ensure schema has content_text column (a --shards parent already did)
+    if not sharded:
+        ensure_content_text_column(client, table_id)
 
-    # 4) Determine the correct base64 column name (content_base64 vs content_base_64)
+    # 3) Determine the base64 column name (content_base64 vs content_base_64). Rows
+    #    synced since the connector writes document_blobs carry no inline bytes.
     base64_col = get_base64_column_name(client, table_id)
-    if not base64_col:
-        print(f"❌ Neither 'content_base64' nor 'content_base_64' column found on {table_id}. Exiting.")
+    blobs_exist = table_exists(client, dataset_table_id(table_id, DOCUMENT_BLOBS_TABLE))
+    if not base64_col and not blobs_exist:
+        print(f"❌ Neither a base64 column on {table_id} nor a {DOCUMENT_BLOBS_TABLE} table found. Exiting.")
+        checkpoint.finish_run("failed", {"error": "no document bytes found"})
         raise SystemExit(1)
 
-    # 5) Fetch only rows that still need processing
-    query = f"""
-        SELECT envelope_id, document_id, {base64_col} AS content_base64
-        FROM `{table_id}`
-        WHERE (content_text IS NULL OR content_text = '')
-          AND {base64_col} IS NOT NULL
-          AND {base64_col} != ''
-    """
+    # 4) Hash columns and the text store; backfill hashes for older rows
+    if not sharded:
+        ensure_content_addressing(client, table_id, base64_col)
 
-    print(f"Running query to fetch documents needing text extraction from: {table_id} (base64 column: {base64_col})")
+    # 5) Resume: apply text this shard staged before it was interrupted, and
+    #    text already stored for duplicates
+    leftover = apply_extracted_text(client, table_id, base64_col, shard)
+    if leftover:
+        print(f"Linked {leftover} documents to already extracted text.")
 
-    try:
-        query_job = client.query(query)
-
-        # Loop through documents that need processing
-        for row in query_job:
-            env_id = row["envelope_id"]
-            doc_id = row["document_id"]
-            encoded_field = row["content_base64"]
-
-            print(f"\nProcessing document: {env_id} / {doc_id}")
+    # 6) Compute the work set with one query: this shard's unique files that still need text
+    query = content_needing_text_sql(
+        table_id,
+        base64_col,
+        blobs_exist,
+        staging_exists=table_exists(client, staging_table_id(table_id, shard)),
+        shard=shard,
+    )
 
-            # Extra safety: skip if already processed
-            if is_document_processed(client, table_id, env_id, doc_id):
-                print("   -> Already processed. Skipping.")
-                continue
+    print(f"Running query to fetch unique documents needing text extraction from: {table_id}")
 
-            if not encoded_field:
-                print("   -> Skipping: No content_base64 data found.")
-                continue
+    staged = 0
+    pending: list[dict] = []
+    pool = PdfExtractionPool()
+    print(f"Extracting with {pool.workers} worker processes")
+    try:
+        query_job = client.query(query)
 
-            # Decode to raw PDF bytes; handle BYTES column as already-bytes
-            try:
-                if isinstance(encoded_field, (bytes, bytearray)):
-                    pdf_bytes = bytes(encoded_field)
-                else:
-                    pdf_bytes = base64.b64decode(encoded_field, validate=False)
-            except (binascii.Error, Exception) as e:
-                print(f"   -> Skipping: base64 decode failed: {e}")
-                continue
+        # Documents are claimed in the checkpoint (skipping dead letters), then
+        # decoded and extracted in the worker processes
+        tasks = (
+            (row["content_sha256"], row["content_base64"])
+            for row in query_job
+            if checkpoint.claim("extract", row["content_sha256"])
+        )
+        for result in pool.extract(tasks):
+            content_sha256 = result["key"]
 
-            # Extract text
-            text = extract_text_from_binary(pdf_bytes)
-            if text.startswith("Error processing PDF data:"):
-                print(f"   -> Skipping: {text}")
+            if result.get("error"):
+                print(f"   -> Skipping content {content_sha256}: {result['error']}")
+                checkpoint.mark_failed("extract", content_sha256, result["error"])
                 continue
 
+            text = read_spooled_text(result)
             if not text.strip():
-                print("   -> Skipping: No text extracted from document.")
+                print(f"   -> Skipping content {content_sha256}: No text extracted from document.")
+                checkpoint.mark_failed("extract", content_sha256, "No text extracted from document.")
                 continue
 
-            # Update row: set content_text and clear base64
-            try:
-                update_document_text_and_clear_base64(
-                    client,
-                    table_id,
-                    env_id,
-                    doc_id,
-                    text,
-                    base64_col,
-                )
-                print("   -> Updated content_text and cleared base64 bytes.")
-            except Exception as e:
-                print(f"   -> Failed to update row: {e}")
+            pending.append(
+                {
+                    "content_sha256": content_sha256,
+                    "content_text": text,
+                    "extracted_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                }
+            )
+            # 7) Stage extracted text in batches with load jobs
+            if len(pending) >= EXTRACTION_FLUSH_DOCS:
+                stage_extracted_text(client, table_id, pending, shard)
+                checkpoint.mark_done("extract", [row["content_sha256"] for row in pending])
+                staged += len(pending)
+                print(f"   -> Staged {staged} documents so far.")
+                pending = []
 
+        stage_extracted_text(client, table_id, pending, shard)
+        checkpoint.mark_done("extract", [row["content_sha256"] for row in pending])
+        staged += len(pending)
+        pending = []
     except Exception as e:
         print(f"An error occurred while querying BigQuery: {e}")
+        for row in pending:
+            checkpoint.mark_failed("extract", row["content_sha256"], f"staging failed: {e}")
+        run_status = "failed"
+    finally:
+        pool.close()
+        print(
+            f"Extraction: {pool.report()}, {pool.stats['timed_out']} timed out, "
+            f"{pool.stats['pool_restarts']} pool restarts"
+        )
+        run_stats["extraction"] = {**pool.stats, "staged": staged}
 
-    print("\n--- Text extraction pipeline execution complete. ---")
+    # 8) One MERGE stores the staged text; every document row of each file points at it
+    try:
+        updated = apply_extracted_text(client, table_id, base64_col, shard)
+        run_stats["extraction"]["updated"] = updated
+        print(f"✅ Linked text for {updated} documents ({staged} unique files extracted this run).")
+    except Exception as e:
+        print(f"❌ Failed to merge staged text (it stays staged for the next run): {e}")
+        run_status = "failed"
+
+    # 9) Embed each unique text once, then fan the chunks out to every document
+    chunks_table_id = dataset_table_id(table_id, CHUNK_EMBEDDINGS_TABLE)
+    try:
+        embedder = get_embedder(EMBEDDER, client, project_id, dataset_id)
+        ensure_embeddings_table(client, embeddings_table_id)
+        ensure_embeddings_table(client, chunks_table_id, CHUNK_EMBEDDINGS_SCHEMA)
+        print(f"\nEmbedding unique texts into {chunks_table_id} with the {embedder.name} embedder")
+        texts = (
+            text
+            for text in select_texts_without_embeddings(client, table_id, embeddings_table_id, shard)
+            if checkpoint.claim("embed", text["text_sha256"])
+        )
+        embedding_stats = embed_documents(
+            client,
+            texts,
+            embedder,
+            chunks_table_id,
+            on_loaded=lambda loaded: checkpoint.mark_done("embed", [text["text_sha256"] for text in loaded]),
+            on_failed=lambda text, error: checkpoint.mark_failed("embed", text["text_sha256"], error),
+        )
+        print(f"✅ Embedding stage: {embedding_stats}")
+        copied = materialize_document_embeddings(client, table_id, embeddings_table_id, shard)
+        run_stats["embedding"] = {**embedding_stats, "copied_rows": copied}
+        print(f"✅ Wrote {copied} chunk rows to {embeddings_table_id}")
+    except Exception as e:
+        print(f"❌ Embedding stage failed: {e}")
+        run_stats["embedding_error"] = str(e)
+        run_status = "failed"
+
+    # 10) Keep the VECTOR_SEARCH index on the embeddings table as configured;
+    #     BigQuery indexes new rows on its own once the index exists. Shards
+    #     leave this DDL to the --shards parent.
+    if not sharded:
+        try:
+            action = maintain_vector_index(client, embeddings_table_id)
+            run_stats["vector_index"] = action
+            print(f"✅ Vector index {BQ_VECTOR_INDEX_NAME}: {action}")
+        except Exception as e:
+            print(f"⚠️ Could not maintain vector index {BQ_VECTOR_INDEX_NAME}: {e}")
+            run_stats["vector_index_error"] = str(e)
+
+    checkpoint.finish_run(run_status, run_stats)
+    dead = checkpoint.dead_letters()
+    print(f"\nCheckpoint: {checkpoint.summary()}")
+    if dead:
+        print(f"⚠️ {len(dead)} items are dead-lettered; list them with --dead-letters.")
+    checkpoint.close()
+
+    print("\n--- Text extraction and embedding pipeline execution complete. ---")
+    if run_status != "completed":
+        raise SystemExit(1)
@@ -1,7 +1,9 @@
 from dotenv import load_dotenv
 from google.adk.agents.llm_agent import Agent
 from google.adk.tools.agent_tool import AgentTool
-from .sub_agents.bigquery_agent import bigquery_agent
+from .fan_out import make_parallel_agents_tool
+from .sub_agents.docusign_sql import docusign_data_tools, docusign_sql_instruction
+from .sub_agents.sql_examples import with_sql_examples
 from .sub_agents.chart_agent import chart_agent
 from .sub_agents.legal_agent import contract_risk_agent
 from .sub_agents.reminder_agent import rem_agent
@@ -9,11 +11,15 @@ from .sub_agents.sales_agent import sales_agent, document_retrieval_tool
 import os
 
 load_dotenv()
+
+# Independent sub-agent requests from one question run side by side
+parallel_agents_tool = make_parallel_agents_tool([chart_agent, sales_agent, contract_risk_agent, rem_agent])
+
 root_agent = Agent(
     model=os.getenv("GOOGLE_MODEL_NAME", "gemini-2.5-flash"),
     name='root_agent',
     description='A helpful assistant for user questions about docusign, including analytics, contract analysis, and sending reminders.',
-    instruction='''You orchestrate responses that may include narrative text and one or more charts derived from BigQuery data. Do not include charts unless specified by user. ALWAYS query the `docusign-475113.customdocusignconnector` dataset when you need data.
+    instruction=with_sql_examples('''You orchestrate responses that may include narrative text and one or more charts derived from BigQuery data. Do not include charts unless specified by user. ALWAYS query the `docusign-475113.customdocusignconnector` dataset when you need data.
 
 💡 **Response contract**
 
@@ -42,14 +48,15 @@ You MUST return your final answer as a single JSON object wrapped in a Markdown
 
 🛠️ **Tool usage**
 
+0. First plan which agents the question needs. When it has independent parts (e.g. a chart plus a sales or contract analysis), call `run_parallel_agents` **once** with one entry per part instead of calling those agents one after another; it returns merged `text` and `charts`. Only chain calls when one part needs another's result.
 1. When the user needs quantitative data or charts, call `chart_agent`. Request every required chart in a **single** `chart_agent` call, then copy its JSON `charts` array directly into your response.
-2. Only call `bigquery_agent` directly when charts are not required or when you need table-level detail that cannot be inferred from the chart data you already have. Prefer basing your narrative on the chart data instead of launching another query.
+2. Only call `run_docusign_sql` directly when charts are not required or when you need table-level detail that cannot be inferred from the chart data you already have. Prefer basing your narrative on the chart data instead of launching another query.
 3. For sending reminders to expiring DocuSign envelopes, call `reminder_agent` with the number of days until expiration.
 4. For sales analysis, contract insights, or document retrieval, call `sales_agent` to analyze customer data and retrieve relevant document information.
 5. For direct document search and retrieval from embedded documents, use the `document_retrieval_tool` to search through document embeddings for relevant information.
 6. For general questions that do not need data, respond with only the `text` field.
 7. If both textual explanation and charts are useful, include both—but derive the explanation from the chart data whenever possible rather than issuing extra queries.
-8. While looking for content inside the document try to use the `document_retrieval_tool` to find relevant sections based on the query instead of querying the entire document content using content_text inside document_contents table.
+8. While looking for content inside the document try to use the `document_retrieval_tool` to find relevant sections based on the query instead of querying the entire document content using content_text of the envelope_document_texts view. It matches exact words as well as meaning, accepts envelope_id, document_type, envelope_status and created date filters, and returns the envelope, document and chunk ids of each match.
 
 ⚙️ **Efficiency pledge**
 
@@ -59,7 +66,7 @@ You MUST return your final answer as a single JSON object wrapped in a Markdown
 - Return comprehensive answers and why did you come to that conclusion that fully address the user's needs in one response whenever possible.
 
 ❗ **Never** return plain text outside the fenced JSON block, and never return multiple JSON objects.
-''',
-    tools=[AgentTool(agent=bigquery_agent), AgentTool(agent=chart_agent), AgentTool(agent=contract_risk_agent), AgentTool(agent=rem_agent), AgentTool(agent=sales_agent), document_retrieval_tool]
+''', docusign_sql_instruction),
+    tools=[*docusign_data_tools(), parallel_agents_tool, AgentTool(agent=chart_agent), AgentTool(agent=contract_risk_agent), AgentTool(agent=rem_agent), AgentTool(agent=sales_agent), document_retrieval_tool]
 )
 
@@ -0,0 +1,157 @@
+import asyncio
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple, cast
+
+import google.api_core.client_info
+import google.auth
+from google.auth.credentials import Credentials
+from google.auth.transport.requests import AuthorizedSession, Request
+from google.cloud import bigquery
+from google.oauth2 import service_account
+from requests.adapters import HTTPAdapter
+
+SERVICE_ACCOUNT_FILE = os.getenv(
+    "GOOGLE_SERVICE_ACCOUNT_FILE",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "../docusign-arpit.json")),
+)
+# Offline runs (e.g. replaying recorded benchmarks) never build clients or
+# look up credentials, so importing the agents touches no network
+AGENTS_OFFLINE = os.getenv("AGENTS_OFFLINE") == "1"
+# Connections kept open per credential; requests' default of 10 is below the
+# number of BigQuery calls agents and the API run at once.
+BIGQUERY_HTTP_POOL_SIZE = int(os.getenv("BIGQUERY_HTTP_POOL_SIZE", "32"))
+
+_SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+
+class BigQueryClientRegistry:
+    """Process-wide BigQuery clients sharing credentials and HTTP connections.
+
+    Credentials are loaded once (service-account file, then application default
+    credentials). Each credential gets one pooled `AuthorizedSession`, so its
+    access token is refreshed once for every client built on it, and clients
+    are cached per (credential, project, location, user agent).
+    """
+
+    def __init__(self, service_account_file: str, pool_size: int):
+        self.service_account_file = service_account_file
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self._default: Optional[Tuple[Optional[Credentials], Optional[str]]] = None
+        self._sessions: List[Tuple[Credentials, AuthorizedSession]] = []
+        self._clients: Dict[Tuple[int, Optional[str], Optional[str], Optional[str]], bigquery.Client] = {}
+
+    def _load_default(self) -> Tuple[Optional[Credentials], Optional[str]]:
+        project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
+        if AGENTS_OFFLINE:
+            return None, project_id
+        if self.service_account_file and os.path.exists(self.service_account_file):
+            try:
+                svc_credentials = service_account.Credentials.from_service_account_file(
+                    self.service_account_file, scopes=_SCOPES
+                )
+                return cast(Credentials, svc_credentials), svc_credentials.project_id or project_id
+            except Exception as exc:  # pragma: no cover - logging path
+                print(f"[bigquery] Failed to load service account credentials: {exc}")
+        try:
+            default_credentials, default_project = google.auth.default(scopes=_SCOPES)
+            return cast(Credentials, default_credentials), default_project or project_id
+        except Exception as exc:  # pragma: no cover - logging path
+            print(f"[bigquery] Default credentials not available: {exc}")
+            return None, project_id
+
+    def _defaults(self) -> Tuple[Optional[Credentials], Optional[str]]:
+        with self._lock:
+            if self._default is None:
+                self._default = self._load_default()
+            return self._default
+
+    def credentials(self) -> Optional[Credentials]:
+        return self._defaults()[0]
+
+    def default_project(self) -> Optional[str]:
+        return self._defaults()[1]
+
+    def session(self, credentials: Credentials) -> AuthorizedSession:
+        with self._lock:
+            for known, session in self._sessions:
+                if known is credentials:
+                    return session
+            session = AuthorizedSession(credentials)
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount("https://", adapter)
+            self._sessions.append((credentials, session))
+            return session
+
+    def client(
+        self,
+        project: Optional[str] = None,
+        credentials: Optional[Credentials] = None,
+        location: Optional[str] = None,
+        user_agent: Optional[str] = None,
+    ) -> Optional[bigquery.Client]:
+        """Return the shared client for these settings, building it on first use."""
+        if AGENTS_OFFLINE:
+            return None
+        if credentials is None:
+            credentials = self.credentials()
+            if credentials is None:
+                return None
+        project = project or self.default_project()
+        key = (id(credentials), project, location, user_agent)
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        session = self.session(credentials)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = bigquery.Client(
+                    project=project,
+                    credentials=credentials,
+                    location=location,
+                    client_info=google.api_core.client_info.ClientInfo(user_agent=user_agent),
+                    _http=session,
+                )
+                self._clients[key] = client
+        return client
+
+    def warm_up(self, dataset_ids: List[str]) -> Dict[str, Any]:
+        """Fetch a token and open pooled connections before the first request."""
+        credentials = self.credentials()
+        if credentials is None:
+            return {"status": "unavailable"}
+        session = self.session(credentials)
+        if not credentials.valid:
+            credentials.refresh(Request(session))
+        client = self.client()
+        for dataset_id in dataset_ids:
+            client.get_dataset(dataset_id)
+        return self.snapshot()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "credentials": len(self._sessions),
+                "clients": len(self._clients),
+                "pool_size": self.pool_size,
+            }
+
+# Shared by config.bigquery_client, the agents' SQL tools and document retrieval
+bigquery_clients = BigQueryClientRegistry(SERVICE_ACCOUNT_FILE, BIGQUERY_HTTP_POOL_SIZE)
+
+def get_bigquery_client(
+    *,
+    project: Optional[str] = None,
+    credentials: Optional[Credentials] = None,
+    location: Optional[str] = None,
+    user_agent: Optional[str] = None,
+) -> Optional[bigquery.Client]:
+    """Shared client lookup; same signature as ADK's BigQuery client factory."""
+    return bigquery_clients.client(
+        project=project, credentials=credentials, location=location, user_agent=user_agent
+    )
+
+async def warm_up_bigquery_clients(dataset_ids: List[str]) -> Dict[str, Any]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, bigquery_clients.warm_up, dataset_ids)
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from google.adk.agents.base_agent import BaseAgent
+from google.adk.tools import FunctionTool
+from google.adk.tools.agent_tool import AgentTool
+from google.adk.tools.tool_context import ToolContext
+
+from .telemetry import tracer
+
+# Upper bound on sub-agents running at once for a single fan-out call
+FAN_OUT_MAX_CONCURRENCY = int(os.getenv("FAN_OUT_MAX_CONCURRENCY", "3"))
+
+_JSON_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+
+def _parse_branch_output(output: Any) -> Optional[Dict[str, Any]]:
+    """Return the JSON object a sub-agent answered with, if it answered with one."""
+    if isinstance(output, dict):
+        return output
+    if not isinstance(output, str):
+        return None
+    match = _JSON_FENCE.search(output)
+    candidate = match.group(1) if match else output
+    try:
+        parsed = json.loads(candidate.strip())
+    except (TypeError, ValueError):
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+def merge_branch_results(branches: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fold sub-agent answers into the `{"text", "charts"}` response contract.
+
+    Charts are concatenated with fresh ids; text from each branch is kept in
+    call order under the agent's name.
+    """
+    texts: List[str] = []
+    charts: List[Dict[str, Any]] = []
+    for branch in branches:
+        if branch["status"] != "SUCCESS":
+            texts.append(f"[{branch['agent']}] failed: {branch['error']}")
+            continue
+        parsed = _parse_branch_output(branch["output"])
+        if parsed is None:
+            if str(branch["output"]).strip():
+                texts.append(f"[{branch['agent']}] {str(branch['output']).strip()}")
+            continue
+        for chart in parsed.get("charts") or ([parsed["chart"]] if parsed.get("chart") else []):
+            if isinstance(chart, dict):
+                charts.append({**chart, "id": f"chart-{len(charts) + 1}"})
+        if parsed.get("text"):
+            texts.append(f"[{branch['agent']}] {parsed['text']}")
+        elif not parsed.get("charts") and not parsed.get("chart"):
+            texts.append(f"[{branch['agent']}] {json.dumps(parsed)}")
+
+    merged: Dict[str, Any] = {}
+    if texts:
+        merged["text"] = "\n\n".join(texts)
+    if charts:
+        merged["charts"] = charts
+    return merged
+
+class ParallelAgentsTool(FunctionTool):
+    """A function tool whose work happens in nested sub-agent runs."""
+
+    # Read by the benchmark harness, which replays the nested runs instead of this call
+    delegates_to_agents = True
+
+def make_parallel_agents_tool(
+    agents: List[BaseAgent], max_concurrency: int = FAN_OUT_MAX_CONCURRENCY
+) -> ParallelAgentsTool:
+    """Build a tool that runs independent sub-agent requests concurrently."""
+    agent_tools = {agent.name: AgentTool(agent=agent) for agent in agents}
+
+    async def run_parallel_agents(calls: list[dict], tool_context: ToolContext) -> dict:
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run_branch(call: Dict[str, Any]) -> Dict[str, Any]:
+            agent_name = str(call.get("agent", ""))
+            request = str(call.get("request", "")).strip()
+            if agent_name not in agent_tools or not request:
+                return {
+                    "agent": agent_name,
+                    "status": "ERROR",
+                    "error": f"Unknown agent or empty request. Agents: {', '.join(agent_tools)}",
+                }
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    output = await agent_tools[agent_name].run_async(
+                        args={"request": request}, tool_context=tool_context
+                    )
+                    return {
+                        "agent": agent_name,
+                        "status": "SUCCESS",
+                        "output": output,
+                        "elapsed_ms": round((time.perf_counter() - started) * 1000),
+                    }
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:  # pylint: disable=broad-except
+                    return {
+                        "agent": agent_name,
+                        "status": "ERROR",
+                        "error": str(exc),
+                        "elapsed_ms": round((time.perf_counter() - started) * 1000),
+                    }
+
+        with tracer.start_as_current_span("fan_out") as span:
+            span.set_attribute("fan_out.branches", len(calls))
+            branches = await asyncio.gather(*(run_branch(call) for call in calls))
+
+        return {
+            **merge_branch_results(branches),
+            "branches": [
+                {key: branch[key] for key in ("agent", "status", "elapsed_ms", "error") if key in branch}
+                for branch in branches
+            ],
+        }
+
+    run_parallel_agents.__doc__ = f"""Run several independent sub-agent requests at the same time.
+
+    Use this when a question has parts that do not depend on each other's
+    results, e.g. a chart and a sales analysis. Up to {max_concurrency} agents run at once.
+
+    Args:
+        calls: One entry per independent part, in the order the answer should
+            present them: {{"agent": one of {", ".join(agent_tools)}, "request": "what that agent should do"}}.
+
+    Returns:
+        dict: {{"text": merged narrative, "charts": merged chart list, "branches": per-call status}}.
+        Copy the charts into your response as-is.
+    """
+    return ParallelAgentsTool(func=run_parallel_agents)
@@ -0,0 +1,83 @@
+import contextvars
+import threading
+import uuid
+from typing import Any, Dict, List, Optional
+
+class AgentRun:
+    """Book-keeping for one agent run: its id, the BigQuery jobs it started and
+    the queries that succeeded during it."""
+
+    def __init__(self, run_id: Optional[str] = None, question: Optional[str] = None):
+        self.run_id = run_id or uuid.uuid4().hex
+        self.question = question
+        self.cancelled = False
+        self.verified_queries: List[Dict[str, Any]] = []
+        self._jobs: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register_job(self, job: Any) -> None:
+        """Remember a BigQuery job so it can be cancelled with the run."""
+        job_id = getattr(job, "job_id", None)
+        if not job_id:
+            return
+        with self._lock:
+            self._jobs[job_id] = job
+        if self.cancelled:
+            _cancel_job(job)
+
+    def forget_job(self, job: Any) -> None:
+        job_id = getattr(job, "job_id", None)
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def cancel(self) -> int:
+        """Mark the run cancelled and cancel every BigQuery job still running."""
+        self.cancelled = True
+        with self._lock:
+            jobs = list(self._jobs.values())
+            self._jobs.clear()
+        cancelled_jobs = sum(1 for job in jobs if _cancel_job(job))
+        with _metrics_lock:
+            _metrics["bigquery_jobs_cancelled"] += cancelled_jobs
+        return cancelled_jobs
+
+def _cancel_job(job: Any) -> bool:
+    try:
+        if job.done():
+            return False
+        job.cancel()
+        print(f"[run-tracking] Cancelled BigQuery job {job.job_id}")
+        return True
+    except Exception as exc:  # pragma: no cover - logging path
+        print(f"[run-tracking] Failed to cancel BigQuery job: {exc}")
+        return False
+
+_current_run: contextvars.ContextVar[Optional[AgentRun]] = contextvars.ContextVar(
+    "current_agent_run", default=None
+)
+
+_metrics_lock = threading.Lock()
+_metrics: Dict[str, int] = {
+    "started": 0,
+    "completed": 0,
+    "failed": 0,
+    "cancelled": 0,
+    "bigquery_jobs_cancelled": 0,
+}
+
+def bind_run(run: AgentRun) -> None:
+    """Make `run` the current run for this task and everything it awaits."""
+    _current_run.set(run)
+
+def current_run() -> Optional[AgentRun]:
+    """Return the agent run bound to the current task, if any."""
+    return _current_run.get()
+
+def record_run_outcome(outcome: str) -> None:
+    """Count a run lifecycle event (started, completed, failed, cancelled)."""
+    with _metrics_lock:
+        _metrics[outcome] = _metrics.get(outcome, 0) + 1
+
+def run_metrics() -> Dict[str, int]:
+    with _metrics_lock:
+        return dict(_metrics)
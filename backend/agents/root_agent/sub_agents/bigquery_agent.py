@@ -1,14 +1,29 @@
 # sub_agents/bigquery_agent.py
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
 from google.adk.agents.llm_agent import Agent
-from google.adk.tools.bigquery import (
-        BigQueryToolset,
-        BigQueryCredentialsConfig,
-)
+from google.adk.tools.bigquery import BigQueryCredentialsConfig
 from google.adk.tools.bigquery.config import BigQueryToolConfig, WriteMode
-import google.oauth2.service_account
+from google.adk.tools.google_tool import GoogleTool
+from google.genai import types
+import google.auth.credentials
+import asyncio
+import json
 import os
 import sys
 
+from ..bigquery_clients import AGENTS_OFFLINE, SERVICE_ACCOUNT_FILE, bigquery_clients
+from .bigquery_tools import (
+    execute_sql,
+    get_dataset_info,
+    get_table_info,
+    list_dataset_ids,
+    list_table_ids,
+)
+from .schema_catalog import schema_catalog_prompt
+from .sql_examples import request_text, sql_example_store, with_sql_examples
+
 DOCUSIGN_SCHEMA_REFERENCE = """
 SCHEMA REFERENCE — DocuSign Analytics
 Dataset: `docusign-475113.customdocusignconnector`
@@ -21,7 +36,7 @@ Columns:
 - `completed_timestamp` (TIMESTAMP): Date/time the envelope reached a completed state.
 - `created_timestamp` (TIMESTAMP): Date/time the envelope was created.
 - `last_modified_timestamp` (TIMESTAMP): Most recent status change timestamp.
-- `expire_after` (INTEGER): No of Days after which the envelope expires. Use this + created_timestamp to calculate expiration date.
+- `expire_after` (STRING holding a day count): No of Days after which the envelope expires. CAST it to INT64 and add it to created_timestamp to calculate expiration date.
 - `subject` (STRING): Email subject line associated with the envelope.
 - `contract_cycle_time_hours` (FLOAT): Hours between sent and completed timestamps.
 - `conversion_status` (STRING): Mirrors DocuSign status for downstream analytics.
@@ -65,10 +80,19 @@ Columns:
 - `type` (STRING): DocuSign document classification (content, certificate, etc.).
 - `pages` (INTEGER): Page count reported by DocuSign.
 
-Table `document_contents` — Base64-encoded document payloads.
+Table `document_contents` — Source file of each envelope document.
+Columns:
+- `envelope_id` (STRING, FK): Parent envelope identifier.
+- `document_id` (STRING, PK segment): Document identifier.
+- `content_sha256` (STRING): Hash of the source file; equal across envelopes sent with the same file.
+- `text_sha256` (STRING): Hash of the extracted text; equal across documents with the same text.
+
+View `envelope_document_texts` — Extracted text of each envelope document (text is stored once per unique file and joined in here).
 Columns:
 - `envelope_id` (STRING, FK): Parent envelope identifier.
 - `document_id` (STRING, PK segment): Document identifier.
+- `content_sha256` (STRING): Hash of the source file.
+- `text_sha256` (STRING): Hash of the extracted text.
 - `content_text` (STRING): Contains plain-text content of entire document for search and analysis.
 
 Table `templates` — Reusable DocuSign template registry.
@@ -89,19 +113,17 @@ Columns:
 """
 
 # --- SERVICE ACCOUNT CONFIGURATION ---
-SERVICE_ACCOUNT_FILE = os.path.abspath(
-    os.path.join(os.path.dirname(__file__), "./../../docusign-arpit.json")
-)
-
-if not os.path.exists(SERVICE_ACCOUNT_FILE):
+if not os.path.exists(SERVICE_ACCOUNT_FILE) and not AGENTS_OFFLINE:
     print(f"❌ Error: Service account key file not found at {SERVICE_ACCOUNT_FILE}")
     print("Please download the JSON key from your Google Cloud project and update the SERVICE_ACCOUNT_FILE path.")
     sys.exit(1)
 
-# Load credentials
-credentials = google.oauth2.service_account.Credentials.from_service_account_file(
-    SERVICE_ACCOUNT_FILE
-)
+# Load credentials (shared with every other BigQuery client in the process)
+credentials = None
+if os.path.exists(SERVICE_ACCOUNT_FILE) and not AGENTS_OFFLINE:
+    credentials = bigquery_clients.credentials()
+if credentials is None:
+    credentials = google.auth.credentials.AnonymousCredentials()
 
 # Create BigQuery credentials config
 credentials_config = BigQueryCredentialsConfig(credentials=credentials)
@@ -109,12 +131,19 @@ credentials_config = BigQueryCredentialsConfig(credentials=credentials)
 # Disallow write operations
 tool_config = BigQueryToolConfig(write_mode=WriteMode.BLOCKED)
 
-# Create BigQuery toolset
-# Instantiate a BigQuery toolset
-bigquery_toolset = BigQueryToolset(
-    
-    credentials_config=credentials_config, 
-    bigquery_tool_config=tool_config
+# Metadata tools, in place of ADK's BigQueryToolset: same tools, but on the
+# shared clients instead of a new client per call
+bigquery_metadata_tools = [
+    GoogleTool(func=func, credentials_config=credentials_config, tool_settings=tool_config)
+    for func in (get_dataset_info, get_table_info, list_dataset_ids, list_table_ids)
+]
+
+# Query execution runs off the event loop and registers its job with the
+# current agent run so an abandoned chat can cancel it.
+execute_sql_tool = GoogleTool(
+    func=execute_sql,
+    credentials_config=credentials_config,
+    tool_settings=tool_config,
 )
 
 print(os.getenv("GOOGLE_MODEL_NAME", "gemini-2.5-flash"))
@@ -124,7 +153,7 @@ BASE_INSTRUCTION = (
       "You are an expert GoogleSQL query-writer for a DocuSign database. "
         "A user will ask a question in natural language. You must: \n"
         "1.  Understand the user's intent and identify which tables to query. \n"
-        "2.  Use the provided BigQuery tool to get the schema for those tables. \n"
+        "2.  Use the generated schema catalog below for exact column names and types; only call the metadata tools for tables it does not list. \n"
         "3.  Write a single, accurate GoogleSQL query to answer the question. \n"
         "4.  Run the query using the provided tools. \n"
         "5.  Return the final answer to the user in a clear, friendly way. \n"
@@ -137,11 +166,32 @@ BASE_INSTRUCTION = (
 )
 
 
+async def reuse_verified_sql(callback_context: CallbackContext) -> Optional[types.Content]:
+    """Answer a request that exactly matches a verified example without calling
+    the model: run the stored SQL and return its rows."""
+    example = await asyncio.to_thread(sql_example_store.exact, request_text(callback_context))
+    if example is None:
+        return None
+    # Imported here because docusign_sql builds on this module's credentials
+    from .docusign_sql import run_docusign_sql
+
+    result = await run_docusign_sql(example["sql"])
+    if result["status"] != "SUCCESS":
+        return None
+    return types.Content(
+        role="model",
+        parts=[types.Part(text=json.dumps({"sql": example["sql"], **result}, default=str))],
+    )
+
+
 # Define the BigQuery agent
 bigquery_agent = Agent(
     model=os.getenv("GOOGLE_MODEL_NAME", "gemini-2.5-flash"),
     name="bigquery_agent",
     description="An agent that can query the DocuSign BigQuery dataset.",
-    instruction=BASE_INSTRUCTION + "\n\n" + DOCUSIGN_SCHEMA_REFERENCE,
-    tools=[bigquery_toolset],
+    instruction=with_sql_examples(
+        BASE_INSTRUCTION + "\n\n" + DOCUSIGN_SCHEMA_REFERENCE, schema_catalog_prompt
+    ),
+    tools=[*bigquery_metadata_tools, execute_sql_tool],
+    before_agent_callback=reuse_verified_sql,
 )
@@ -0,0 +1,293 @@
+# sub_agents/bigquery_tools.py
+import asyncio
+import json
+import time
+from typing import Optional
+
+from google.adk.tools.bigquery.config import BigQueryToolConfig
+from google.adk.tools.tool_context import ToolContext
+from google.auth.credentials import Credentials
+from google.cloud import bigquery
+
+from ..bigquery_clients import get_bigquery_client
+from ..run_tracking import current_run
+from ..telemetry import annotate_bigquery_job, tracer
+from .sql_examples import note_verified_query
+from .sql_guard import prepare_query, referenced_table_ids, shape_rows
+from .sql_cache import is_deterministic, normalize_sql, sql_result_cache, table_watermarks
+
+
+def _serialize_row(row) -> dict:
+    row_values = {}
+    for key, val in row.items():
+        try:
+            json.dumps(val)
+        except (TypeError, ValueError):
+            val = str(val)
+        row_values[key] = val
+    return row_values
+
+
+async def run_read_only_query(
+    bq_client: bigquery.Client,
+    project_id: str,
+    query: str,
+    max_rows: Optional[int],
+) -> dict:
+    """Dry-run, execute and serialize a SELECT query, reusing cached results.
+
+    Returns {"status": "SUCCESS", "columns": [...], "rows": [...]} where
+    `columns` lists {"name", "type"} pairs, or {"status": "ERROR", ...}.
+    """
+    loop = asyncio.get_running_loop()
+    run = current_run()
+
+    def table_watermark(table_id: str):
+        modified = bq_client.get_table(table_id).modified
+        return modified.isoformat() if modified else None
+
+    # Identical queries from any agent, this turn or an earlier one, share results
+    # until one of the tables they read changes. Queries whose tables or
+    # watermarks cannot be resolved are never cached: nothing would invalidate
+    # them. Neither are queries reading the clock or a random source.
+    cache_key = f"{project_id}:{max_rows}:{normalize_sql(query)}"
+    table_ids = referenced_table_ids(query)
+    cacheable = bool(table_ids) and is_deterministic(query)
+    watermarks = {}
+    cached = None
+    if cacheable:
+        watermarks = await loop.run_in_executor(
+            None, lambda: table_watermarks.get(table_ids, table_watermark)
+        )
+        cacheable = all(watermark is not None for watermark in watermarks.values())
+    if cacheable:
+        cached = sql_result_cache.get(cache_key, watermarks)
+    if cached is not None:
+        with tracer.start_as_current_span("sql_cache.hit") as span:
+            span.set_attribute("bigquery.row_count", len(cached["result"]["rows"]))
+        return {
+            **cached["result"],
+            "cache": {
+                "hit": True,
+                "age_seconds": round(time.time() - cached["stored_at"], 1),
+            },
+        }
+
+    try:
+        # Dry run first so write statements never start a real job
+        dry_run_job = await loop.run_in_executor(
+            None,
+            lambda: bq_client.query(
+                query,
+                project=project_id,
+                job_config=bigquery.QueryJobConfig(dry_run=True),
+            ),
+        )
+        if dry_run_job.statement_type != "SELECT":
+            return {
+                "status": "ERROR",
+                "error_details": "Read-only mode only supports SELECT statements.",
+            }
+    except Exception as ex:  # pylint: disable=broad-except
+        return {"status": "ERROR", "error_details": str(ex)}
+
+    with tracer.start_as_current_span("bigquery.query") as span:
+        try:
+            job = await loop.run_in_executor(
+                None, lambda: bq_client.query(query, project=project_id)
+            )
+        except Exception as ex:  # pylint: disable=broad-except
+            return {"status": "ERROR", "error_details": str(ex)}
+
+        if run is not None:
+            run.register_job(job)
+        try:
+            row_iterator = await loop.run_in_executor(
+                None, lambda: job.result(max_results=max_rows)
+            )
+            rows = [_serialize_row(row) for row in row_iterator]
+            columns = [
+                {"name": field.name, "type": field.field_type}
+                for field in (row_iterator.schema or [])
+            ]
+            annotate_bigquery_job(span, job, len(rows))
+        except asyncio.CancelledError:
+            # The agent run was abandoned; stop paying for the query as well
+            job.cancel()
+            raise
+        except Exception as ex:  # pylint: disable=broad-except
+            return {"status": "ERROR", "error_details": str(ex)}
+        finally:
+            if run is not None:
+                run.forget_job(job)
+
+    result = {"status": "SUCCESS", "columns": columns, "rows": rows}
+    if max_rows is not None and len(rows) == max_rows:
+        result["result_is_likely_truncated"] = True
+    if cacheable:
+        sql_result_cache.put(cache_key, result, watermarks)
+    return result
+
+
+async def execute_sql(
+    project_id: str,
+    query: str,
+    credentials: Credentials,
+    settings: BigQueryToolConfig,
+    include_large_text: bool = False,
+    tool_context: Optional[ToolContext] = None,
+) -> dict:
+    """Run a read-only BigQuery SQL query in the project and return the result.
+
+    The query is checked against the DocuSign schema before it is sent, and a
+    LIMIT is added when it has none.
+
+    Args:
+        project_id (str): The GCP project id in which the query should be executed.
+        query (str): The GoogleSQL SELECT query to be executed.
+        include_large_text (bool): Set only when the user explicitly asked for
+            full document text; otherwise large text columns are refused.
+
+    Returns:
+        dict: {"status": "SUCCESS", "rows": [...]} on success. If the result
+        contains "result_is_likely_truncated": True there may be more matching
+        rows than were returned. Long results keep only the first rows plus
+        "rows_omitted" and a per-column "column_summary". If "cache" is present
+        the rows were reused from an identical earlier query over unchanged
+        tables. On failure {"status": "ERROR", "error_details": ...}.
+    """
+    prepared, error = prepare_query(
+        query, settings.max_query_result_rows, include_large_text=include_large_text
+    )
+    if error:
+        return {"status": "ERROR", "error_details": error}
+
+    bq_client = get_bigquery_client(
+        project=project_id,
+        credentials=credentials,
+        location=settings.location,
+        user_agent=settings.application_name,
+    )
+    result = await run_read_only_query(
+        bq_client, project_id, prepared, settings.max_query_result_rows
+    )
+    if result["status"] != "SUCCESS":
+        return result
+    names = [column["name"] for column in result["columns"]]
+    note_verified_query(tool_context, query, names, len(result["rows"]))
+
+    response = {"status": "SUCCESS", **shape_rows(names, result["rows"])}
+    for key in ("result_is_likely_truncated", "cache"):
+        if key in result:
+            response[key] = result[key]
+    return response
+
+
+# Metadata tools. ADK's BigQueryToolset versions build a new client per call;
+# these take the same arguments but go through the shared, pooled clients and
+# run the API call off the event loop.
+
+async def _metadata_call(
+    project_id: str, credentials: Credentials, settings: BigQueryToolConfig, call
+):
+    bq_client = get_bigquery_client(
+        project=project_id,
+        credentials=credentials,
+        location=settings.location,
+        user_agent=settings.application_name,
+    )
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, call, bq_client)
+    except Exception as exc:
+        return {"status": "ERROR", "error_details": str(exc)}
+
+
+async def list_dataset_ids(
+    project_id: str, credentials: Credentials, settings: BigQueryToolConfig
+) -> list:
+    """List BigQuery dataset ids in a Google Cloud project.
+
+    Args:
+        project_id (str): The Google Cloud project id.
+
+    Returns:
+        list[str]: The dataset ids present in the project.
+    """
+    return await _metadata_call(
+        project_id,
+        credentials,
+        settings,
+        lambda bq_client: [dataset.dataset_id for dataset in bq_client.list_datasets(project_id)],
+    )
+
+
+async def get_dataset_info(
+    project_id: str, dataset_id: str, credentials: Credentials, settings: BigQueryToolConfig
+) -> dict:
+    """Get metadata information about a BigQuery dataset.
+
+    Args:
+        project_id (str): The Google Cloud project id containing the dataset.
+        dataset_id (str): The BigQuery dataset id.
+
+    Returns:
+        dict: The properties of the dataset.
+    """
+    return await _metadata_call(
+        project_id,
+        credentials,
+        settings,
+        lambda bq_client: bq_client.get_dataset(
+            bigquery.DatasetReference(project_id, dataset_id)
+        ).to_api_repr(),
+    )
+
+
+async def list_table_ids(
+    project_id: str, dataset_id: str, credentials: Credentials, settings: BigQueryToolConfig
+) -> list:
+    """List table ids in a BigQuery dataset.
+
+    Args:
+        project_id (str): The Google Cloud project id containing the dataset.
+        dataset_id (str): The BigQuery dataset id.
+
+    Returns:
+        list[str]: The table ids present in the dataset.
+    """
+    return await _metadata_call(
+        project_id,
+        credentials,
+        settings,
+        lambda bq_client: [
+            table.table_id
+            for table in bq_client.list_tables(bigquery.DatasetReference(project_id, dataset_id))
+        ],
+    )
+
+
+async def get_table_info(
+    project_id: str,
+    dataset_id: str,
+    table_id: str,
+    credentials: Credentials,
+    settings: BigQueryToolConfig,
+) -> dict:
+    """Get metadata information about a BigQuery table, including its schema.
+
+    Args:
+        project_id (str): The Google Cloud project id containing the dataset.
+        dataset_id (str): The BigQuery dataset id containing the table.
+        table_id (str): The BigQuery table id.
+
+    Returns:
+        dict: The properties of the table.
+    """
+    return await _metadata_call(
+        project_id,
+        credentials,
+        settings,
+        lambda bq_client: bq_client.get_table(
+            bigquery.TableReference(bigquery.DatasetReference(project_id, dataset_id), table_id)
+        ).to_api_repr(),
+    )
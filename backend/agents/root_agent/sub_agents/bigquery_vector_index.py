@@ -0,0 +1,252 @@
+# sub_agents/bigquery_vector_index.py
+import asyncio
+import datetime
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from google.cloud import bigquery
+
+from ...vector_index_config import (
+    BQ_VECTOR_INDEX_NAME,
+    VECTOR_INDEX_DISTANCE,
+    VECTOR_INDEX_STORED_COLUMNS,
+    ddl_option,
+)
+from .schema_catalog import DATASET_ID, PROJECT_ID
+
+EMBEDDINGS_TABLE_NAME = "document_embeddings"
+EMBEDDINGS_TABLE = f"{PROJECT_ID}.{DATASET_ID}.{EMBEDDINGS_TABLE_NAME}"
+EMBEDDING_COLUMN = "embedding"
+
+# Managed index on document_embeddings.embedding. The embedding pipeline
+# (agents/embeddings.py) creates and rebuilds it; the API only reads its status.
+# Its name, distance and stored columns live in agents/vector_index_config.py.
+
+# Share of lists VECTOR_SEARCH probes; higher trades latency and bytes for recall
+BQ_VECTOR_SEARCH_FRACTION = float(os.getenv("BQ_VECTOR_SEARCH_FRACTION", "0.05"))
+# VECTOR_SEARCH is used once this much of the table is indexed; it scans the
+# few unindexed rows exactly, so results stay complete
+BQ_VECTOR_INDEX_MIN_COVERAGE = float(os.getenv("BQ_VECTOR_INDEX_MIN_COVERAGE", "90"))
+BQ_VECTOR_INDEX_CHECK_SECONDS = float(os.getenv("BQ_VECTOR_INDEX_CHECK_SECONDS", "300"))
+
+# Columns returned from the base table when present
+RESULT_COLUMNS = ("content", "envelope_id", "document_id", "chunk_id")
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+def _identifier(name: str) -> str:
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid identifier {name!r}")
+    return name
+
+def _table_path(table: str) -> str:
+    return f"`{table}`"
+
+def vector_index_status_sql(
+    table_name: str = EMBEDDINGS_TABLE_NAME,
+    index_name: str = BQ_VECTOR_INDEX_NAME,
+    project_id: str = PROJECT_ID,
+    dataset_id: str = DATASET_ID,
+) -> str:
+    return f"""
+    SELECT
+      index_name, index_status, coverage_percentage, indexed_row_count,
+      unindexed_row_count, last_refresh_time, disable_reason, ddl
+    FROM `{project_id}.{dataset_id}.INFORMATION_SCHEMA.VECTOR_INDEXES`
+    WHERE table_name = '{_identifier(table_name)}' AND index_name = '{_identifier(index_name)}'
+    """
+
+def index_filters(filters: Optional[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """The active filters, as string lists keyed by column."""
+    active: Dict[str, List[str]] = {}
+    for name, wanted in (filters or {}).items():
+        if wanted in (None, "", []):
+            continue
+        values = wanted if isinstance(wanted, list) else [wanted]
+        active[name] = [str(value) for value in values]
+    return active
+
+def choose_search_mode(
+    status: Optional[Dict[str, Any]],
+    filters: Optional[Dict[str, Any]] = None,
+    stored_columns: Iterable[str] = VECTOR_INDEX_STORED_COLUMNS,
+    min_coverage: float = BQ_VECTOR_INDEX_MIN_COVERAGE,
+) -> str:
+    """Return "vector_search" when the index can answer the query, else "brute_force".
+
+    Brute force covers a missing, disabled or still-building index, and filters
+    on columns the index does not store (those need joins to envelopes or
+    documents, which VECTOR_SEARCH would run unindexed anyway).
+    """
+    if not status or str(status.get("index_status") or "").upper() != "ACTIVE":
+        return "brute_force"
+    if float(status.get("coverage_percentage") or 0) < min_coverage:
+        return "brute_force"
+    if set(index_filters(filters)) - set(stored_columns):
+        return "brute_force"
+    return "vector_search"
+
+def vector_search_sql(
+    top_k: int,
+    fraction_lists_to_search: Optional[float] = BQ_VECTOR_SEARCH_FRACTION,
+    filters: Optional[Dict[str, Any]] = None,
+    columns: Iterable[str] = RESULT_COLUMNS,
+    table: str = EMBEDDINGS_TABLE,
+    column: str = EMBEDDING_COLUMN,
+) -> str:
+    """VECTOR_SEARCH for a batch of queries passed as @flat / @dimension.
+
+    Filters become a pre-filter on the base table, one `IN UNNEST(@<column>)`
+    per filtered column, so they must be columns of the table itself.
+    """
+    top_k = int(top_k)
+    if top_k <= 0:
+        raise ValueError("top_k must be positive")
+    options: Dict[str, Any] = {}
+    if fraction_lists_to_search is not None:
+        fraction = float(fraction_lists_to_search)
+        if not 0 < fraction <= 1:
+            raise ValueError("fraction_lists_to_search must be in (0, 1]")
+        options["fraction_lists_to_search"] = fraction
+    predicates = [
+        f"{_identifier(name)} IN UNNEST(@{_identifier(name)})" for name in index_filters(filters)
+    ]
+    base = f"TABLE {_table_path(table)}"
+    if predicates:
+        base = f"(SELECT * FROM {_table_path(table)} WHERE {' AND '.join(predicates)})"
+    selected = "".join(f"      base.{_identifier(name)},\n" for name in columns)
+    option_argument = f",\n      options => '{json.dumps(options)}'" if options else ""
+    return f"""
+    -- 1. Rebuild one embedding per query from the flattened parameter
+    WITH queries AS (
+      SELECT DIV(position, @dimension) AS query_id, ARRAY_AGG(value ORDER BY position) AS {column}
+      FROM UNNEST(@flat) AS value WITH OFFSET position
+      GROUP BY query_id
+    )
+
+    -- 2. Nearest chunks per query through the vector index
+    SELECT
+      query.query_id,
+{selected}      distance
+    FROM VECTOR_SEARCH(
+      {base}, '{_identifier(column)}',
+      (SELECT query_id, {column} FROM queries), '{_identifier(column)}',
+      top_k => {top_k},
+      distance_type => '{VECTOR_INDEX_DISTANCE}'{option_argument}
+    )
+    ORDER BY query_id, distance
+    """
+
+def vector_search_parameters(
+    flat: List[float], dimension: int, filters: Optional[Dict[str, Any]] = None
+) -> List[Any]:
+    return [
+        bigquery.ArrayQueryParameter("flat", "FLOAT64", flat),
+        bigquery.ScalarQueryParameter("dimension", "INT64", dimension),
+        *(
+            bigquery.ArrayQueryParameter(name, "STRING", values)
+            for name, values in index_filters(filters).items()
+        ),
+    ]
+
+class BigQueryVectorIndex:
+    """Status and coverage of the managed vector index on document_embeddings.
+
+    The index itself is created by the embedding pipeline and kept current by
+    BigQuery as rows are added. `status` is cached so retrieval can choose
+    VECTOR_SEARCH or brute force without an extra job per query.
+    """
+
+    def __init__(self, table: str = EMBEDDINGS_TABLE, index_name: str = BQ_VECTOR_INDEX_NAME):
+        self.table = table
+        self.index_name = index_name
+        self._lock = threading.Lock()
+        self._state: Dict[str, Any] = {
+            "status": None,
+            "columns": [],
+            "checked_at": None,
+            "checked_monotonic": None,
+            "error": None,
+        }
+
+    @property
+    def status(self) -> Optional[Dict[str, Any]]:
+        return self._state["status"]
+
+    @property
+    def columns(self) -> List[str]:
+        return self._state["columns"]
+
+    def stale(self) -> bool:
+        checked = self._state["checked_monotonic"]
+        return checked is None or time.monotonic() - checked > BQ_VECTOR_INDEX_CHECK_SECONDS
+
+    def _fetch_status(self, client: bigquery.Client) -> Optional[Dict[str, Any]]:
+        table_name = self.table.split(".")[-1]
+        rows = list(client.query(vector_index_status_sql(table_name, self.index_name)).result())
+        return dict(rows[0].items()) if rows else None
+
+    def check(self, client: bigquery.Client) -> Dict[str, Any]:
+        """Refresh the cached index status and table columns (no DDL)."""
+        with self._lock:
+            try:
+                table = client.get_table(self.table)
+                self._state["columns"] = [field.name for field in table.schema]
+                self._state["status"] = self._fetch_status(client)
+                self._state["error"] = None
+            except Exception as exc:  # pragma: no cover - logging path
+                print(f"[bq-vector-index] Status check failed: {exc}")
+                self._state["error"] = str(exc)
+            self._state["checked_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+            self._state["checked_monotonic"] = time.monotonic()
+        return self.snapshot()
+
+    def search_mode(self, filters: Optional[Dict[str, Any]] = None) -> str:
+        stored = [name for name in VECTOR_INDEX_STORED_COLUMNS if name in self.columns]
+        return choose_search_mode(self.status, filters, stored_columns=stored)
+
+    def result_columns(self) -> List[str]:
+        return [name for name in RESULT_COLUMNS if name in self.columns]
+
+    def snapshot(self) -> Dict[str, Any]:
+        status = self.status or {}
+        last_refresh = status.get("last_refresh_time")
+        return {
+            "table": self.table,
+            "index_name": self.index_name,
+            "index_type": ddl_option(status.get("ddl", ""), "index_type"),
+            "exists": bool(status),
+            "index_status": status.get("index_status"),
+            "coverage_percentage": status.get("coverage_percentage"),
+            "indexed_row_count": status.get("indexed_row_count"),
+            "unindexed_row_count": status.get("unindexed_row_count"),
+            "last_refresh_time": last_refresh.isoformat() if hasattr(last_refresh, "isoformat") else last_refresh,
+            "disable_reason": status.get("disable_reason"),
+            "search_mode": self.search_mode(),
+            "fraction_lists_to_search": BQ_VECTOR_SEARCH_FRACTION,
+            "min_coverage": BQ_VECTOR_INDEX_MIN_COVERAGE,
+            "checked_at": self._state["checked_at"],
+            "error": self._state["error"],
+        }
+
+# Shared by document retrieval and the API's status loop
+bigquery_vector_index = BigQueryVectorIndex()
+
+async def check_bigquery_vector_index(client: Optional[bigquery.Client]) -> Dict[str, Any]:
+    if client is None:
+        return bigquery_vector_index.snapshot()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, bigquery_vector_index.check, client)
+
+async def keep_bigquery_vector_index_fresh(client: Optional[bigquery.Client]) -> None:
+    """Background loop: track the index's status and coverage (read-only)."""
+    while True:
+        try:
+            await check_bigquery_vector_index(client)
+        except Exception as exc:  # pragma: no cover - logging path
+            print(f"[bq-vector-index] Status check failed: {exc}")
+        await asyncio.sleep(BQ_VECTOR_INDEX_CHECK_SECONDS)
@@ -0,0 +1,94 @@
+# sub_agents/bm25_index.py
+import json
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+def write_bm25(path: str, contents: List[str]) -> None:
+    """Write a CSR inverted index (term -> rows, term frequencies) for `contents`,
+    whose order is the row order of the vector index."""
+    vocabulary: Dict[str, int] = {}
+    term_rows: List[List[int]] = []
+    term_frequencies: List[List[int]] = []
+    lengths = np.zeros(len(contents), dtype=np.int32)
+    for row, content in enumerate(contents):
+        tokens = tokenize(content)
+        lengths[row] = len(tokens)
+        for term, count in Counter(tokens).items():
+            term_id = vocabulary.setdefault(term, len(vocabulary))
+            if term_id == len(term_rows):
+                term_rows.append([])
+                term_frequencies.append([])
+            term_rows[term_id].append(row)
+            term_frequencies[term_id].append(count)
+
+    offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(rows) for rows in term_rows])
+    np.save(os.path.join(path, "bm25_offsets.npy"), offsets)
+    postings = int(offsets[-1])
+    np.save(
+        os.path.join(path, "bm25_rows.npy"),
+        np.fromiter((row for rows in term_rows for row in rows), dtype=np.int32, count=postings),
+    )
+    np.save(
+        os.path.join(path, "bm25_tf.npy"),
+        np.fromiter(
+            (count for counts in term_frequencies for count in counts), dtype=np.float32, count=postings
+        ),
+    )
+    np.save(os.path.join(path, "bm25_lengths.npy"), lengths)
+    with open(os.path.join(path, "bm25_terms.json"), "w", encoding="utf-8") as handle:
+        json.dump(vocabulary, handle)
+
+class Bm25Index:
+    """Okapi BM25 over the chunks of one vector index version (memory-mapped)."""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "bm25_terms.json"), "r", encoding="utf-8") as handle:
+            self.terms: Dict[str, int] = json.load(handle)
+        self.offsets = np.load(os.path.join(path, "bm25_offsets.npy"), mmap_mode="r")
+        self.rows = np.load(os.path.join(path, "bm25_rows.npy"), mmap_mode="r")
+        self.tf = np.load(os.path.join(path, "bm25_tf.npy"), mmap_mode="r")
+        self.lengths = np.load(os.path.join(path, "bm25_lengths.npy"), mmap_mode="r")
+        self.average_length = float(self.lengths.mean()) if len(self.lengths) else 0.0
+
+    def scores(self, query: str, mask: Optional[np.ndarray] = None) -> Dict[int, float]:
+        """BM25 score for every row containing a query term (and passing `mask`)."""
+        total = len(self.lengths)
+        if not total:
+            return {}
+        row_scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            term_id = self.terms.get(term)
+            if term_id is None:
+                continue
+            start, end = int(self.offsets[term_id]), int(self.offsets[term_id + 1])
+            rows = np.asarray(self.rows[start:end])
+            tf = np.asarray(self.tf[start:end])
+            if mask is not None:
+                keep = mask[rows]
+                rows, tf = rows[keep], tf[keep]
+            if not len(rows):
+                continue
+            idf = np.log(1 + (total - (end - start) + 0.5) / ((end - start) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[rows] / (self.average_length or 1.0))
+            term_scores = idf * tf * (BM25_K1 + 1) / (tf + norm)
+            for row, score in zip(rows.tolist(), term_scores.tolist()):
+                row_scores[row] = row_scores.get(row, 0.0) + score
+        return row_scores
+
+    def search(self, query: str, k: int, mask: Optional[np.ndarray] = None) -> List[tuple]:
+        """Top-k (row, score) pairs."""
+        row_scores = self.scores(query, mask)
+        return sorted(row_scores.items(), key=lambda item: item[1], reverse=True)[:k]
@@ -1,14 +1,14 @@
 import os
 from google.adk.agents.llm_agent import Agent
-from google.adk.tools.agent_tool import AgentTool
-from .bigquery_agent import bigquery_agent
+from .docusign_sql import docusign_data_tools, docusign_sql_instruction
+from .sql_examples import with_sql_examples
 
 chart_agent = Agent(
     model=os.getenv("GOOGLE_MODEL_NAME", "gemini-2.5-flash"),
     name='chart_agent',
     description='An agent that can generate data for charts by querying the database.',
-    tools=[AgentTool(agent=bigquery_agent)],
-    instruction="""You produce chart specifications for the root agent. ALWAYS use `bigquery_agent` to retrieve the underlying data before building charts, while keeping tool usage to a minimum.
+    tools=docusign_data_tools(),
+    instruction=with_sql_examples("""You produce chart specifications for the root agent. ALWAYS use `run_docusign_sql` to retrieve the underlying data before building charts, while keeping tool usage to a minimum.
 
 🎯 **Output contract**
 
@@ -44,7 +44,8 @@ If the user asks for multiple charts, include one entry per chart in the `charts
 ⚙️ **Efficiency pledge**
 
 - Plan the data requirements for **all** requested charts before touching BigQuery.
-- Use a single call to `bigquery_agent`—with CTEs or multiple columns if needed—so one result set powers every chart.
+- Use a single `run_docusign_sql` query—with CTEs or multiple columns if needed—so one result set powers every chart.
 - Reuse the retrieved data to populate every chart and craft concise descriptions; avoid repeated tool calls unless the user introduces new requirements mid-dialogue.
-""",
+
+""", docusign_sql_instruction),
 )
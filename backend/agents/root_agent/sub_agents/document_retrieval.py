@@ -0,0 +1,470 @@
+# sub_agents/document_retrieval.py
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from google.cloud import bigquery
+
+from ..run_tracking import current_run
+from ..telemetry import annotate_bigquery_job, tracer
+from .schema_catalog import DATASET_ID, PROJECT_ID
+from .bm25_index import tokenize
+from .bigquery_vector_index import (
+    BQ_VECTOR_SEARCH_FRACTION,
+    bigquery_vector_index,
+    vector_search_parameters,
+    vector_search_sql,
+)
+from .vector_index import VECTOR_INDEX_NPROBE, IvfIndex, is_calendar_date, vector_index
+
+# Document retrieval configuration
+MODEL_NAME = "document_embedding_model"
+TABLE_NAME = "document_embeddings"
+MODEL_PATH = f"`{PROJECT_ID}.{DATASET_ID}.{MODEL_NAME}`"
+TABLE_PATH = f"`{PROJECT_ID}.{DATASET_ID}.{TABLE_NAME}`"
+
+# Query embeddings: an in-memory LRU in front of a persistent SQLite store
+QUERY_EMBEDDING_CACHE_MAX = int(os.getenv("QUERY_EMBEDDING_CACHE_MAX", "2048"))
+QUERY_EMBEDDING_STORE_MAX = int(os.getenv("QUERY_EMBEDDING_STORE_MAX", "50000"))
+QUERY_EMBEDDING_CACHE_PATH = os.getenv(
+    "QUERY_EMBEDDING_CACHE_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "../../query_embeddings.sqlite3")),
+)
+_STORE_TRIM_EVERY = 200
+
+# Hybrid ranking: candidates taken from each retriever, the RRF constant, and
+# how short a query must be to be boosted as an exact phrase
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "50"))
+RETRIEVAL_RRF_K = int(os.getenv("RETRIEVAL_RRF_K", "60"))
+RETRIEVAL_PHRASE_MAX_TOKENS = 6
+
+def normalize_query_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+async def run_retrieval_query(
+    client: bigquery.Client, sql: str, job_config: bigquery.QueryJobConfig, span_name: str
+) -> list:
+    """Run a query off the event loop so the agent run stays cancellable."""
+    loop = asyncio.get_running_loop()
+    with tracer.start_as_current_span(span_name) as span:
+        query_job = await loop.run_in_executor(
+            None, lambda: client.query(sql, job_config=job_config)
+        )
+        run = current_run()
+        if run is not None:
+            run.register_job(query_job)
+
+        try:
+            rows = await loop.run_in_executor(None, lambda: list(query_job.result()))
+            annotate_bigquery_job(span, query_job, len(rows))
+        except asyncio.CancelledError:
+            query_job.cancel()
+            raise
+        finally:
+            if run is not None:
+                run.forget_job(query_job)
+    return rows
+
+class QueryEmbeddingCache:
+    """Query embeddings keyed by (model, normalized query text).
+
+    Hot entries live in an LRU; every embedding is also written to SQLite so
+    restarts and other workers reuse it instead of calling the model again.
+    """
+
+    def __init__(
+        self, path: str, max_entries: int, store_max_entries: int, model: str = MODEL_NAME
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.store_max_entries = store_max_entries
+        self.model = model
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "store_hits": 0, "misses": 0, "stores": 0}
+        self._puts_since_trim = 0
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the store on first use; call with the lock held."""
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS query_embeddings (
+                    model TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    used_at REAL NOT NULL,
+                    PRIMARY KEY (model, query)
+                )
+                """
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _remember(self, key: str, embedding: np.ndarray) -> None:
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = normalize_query_text(text)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return embedding
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT embedding FROM query_embeddings WHERE model = ? AND query = ?",
+                (self.model, key),
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            embedding = np.frombuffer(row[0], dtype=np.float32)
+            connection.execute(
+                "UPDATE query_embeddings SET used_at = ? WHERE model = ? AND query = ?",
+                (time.time(), self.model, key),
+            )
+            connection.commit()
+            self._remember(key, embedding)
+            self._stats["store_hits"] += 1
+            return embedding
+
+    def put(self, text: str, embedding: np.ndarray) -> None:
+        key = normalize_query_text(text)
+        embedding = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._remember(key, embedding)
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?)",
+                (self.model, key, embedding.tobytes(), time.time()),
+            )
+            self._puts_since_trim += 1
+            if self._puts_since_trim >= _STORE_TRIM_EVERY:
+                self._puts_since_trim = 0
+                connection.execute(
+                    """
+                    DELETE FROM query_embeddings WHERE rowid IN (
+                        SELECT rowid FROM query_embeddings ORDER BY used_at DESC LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (self.store_max_entries,),
+                )
+            connection.commit()
+            self._stats["stores"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stored = self._connect().execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+            return {
+                "entries": len(self._entries),
+                "stored": stored,
+                "max_entries": self.max_entries,
+                "store_max_entries": self.store_max_entries,
+                **self._stats,
+            }
+
+query_embedding_cache = QueryEmbeddingCache(
+    QUERY_EMBEDDING_CACHE_PATH, QUERY_EMBEDDING_CACHE_MAX, QUERY_EMBEDDING_STORE_MAX
+)
+
+async def embed_queries(client: bigquery.Client, texts: List[str]) -> List[np.ndarray]:
+    """Embed query strings, calling the model once for all cache misses.
+
+    The cache is keyed by the normalized text, but the model always sees the
+    text as the user wrote it.
+    """
+    keys = [normalize_query_text(text) for text in texts]
+    embeddings: Dict[str, np.ndarray] = {}
+    for key in dict.fromkeys(keys):
+        cached = query_embedding_cache.get(key)
+        if cached is not None:
+            embeddings[key] = cached
+    # First spelling of each uncached key -> key
+    missing: Dict[str, str] = {}
+    for text, key in zip(texts, keys):
+        if key not in embeddings and key not in missing.values():
+            missing[text] = key
+    if missing:
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ArrayQueryParameter("texts", "STRING", list(missing))]
+        )
+        sql = f"""
+        SELECT content, ml_generate_embedding_result AS embedding
+        FROM ML.GENERATE_EMBEDDING(MODEL {MODEL_PATH}, (SELECT content FROM UNNEST(@texts) AS content))
+        """
+        rows = await run_retrieval_query(client, sql, job_config, "bigquery.embed_query")
+        for row in rows:
+            key = missing.get(row["content"])
+            if key is None:
+                continue
+            embedding = np.asarray(row["embedding"], dtype=np.float32)
+            embeddings[key] = embedding
+            query_embedding_cache.put(key, embedding)
+        failed = [text for text, key in missing.items() if key not in embeddings]
+        if failed:
+            raise RuntimeError(f"The embedding model returned nothing for: {', '.join(failed)}")
+    return [embeddings[key] for key in keys]
+
+# Fallback filters: filter name -> SQL predicate over T (chunks), E (envelopes), D (documents)
+_SQL_FILTERS = {
+    "envelope_id": "T.envelope_id IN UNNEST(@envelope_id)",
+    "document_id": "T.document_id IN UNNEST(@document_id)",
+    "document_name": "LOWER(D.name) IN UNNEST(@document_name)",
+    "document_type": "LOWER(D.type) IN UNNEST(@document_type)",
+    "envelope_status": "LOWER(E.status) IN UNNEST(@envelope_status)",
+    "created_after": "E.created_timestamp >= TIMESTAMP(@created_after)",
+    "created_before": "E.created_timestamp <= TIMESTAMP(@created_before)",
+}
+# A date-only created_before includes the whole day
+_SQL_CREATED_BEFORE_DATE = (
+    "E.created_timestamp < TIMESTAMP(DATE_ADD(DATE(@created_before), INTERVAL 1 DAY))"
+)
+
+def _filter_sql(filters: Dict[str, Any]) -> tuple:
+    """WHERE clause and parameters for metadata filters in the BigQuery fallback."""
+    predicates: List[str] = []
+    parameters: List[Any] = []
+    for name, wanted in filters.items():
+        if wanted in (None, "", []):
+            continue
+        if name not in _SQL_FILTERS:
+            raise ValueError(f"Unknown filter {name}")
+        if name == "created_before" and is_calendar_date(wanted):
+            predicates.append(_SQL_CREATED_BEFORE_DATE)
+        else:
+            predicates.append(_SQL_FILTERS[name])
+        if name.startswith("created_"):
+            parameters.append(bigquery.ScalarQueryParameter(name, "STRING", str(wanted).strip()))
+        else:
+            values = wanted if isinstance(wanted, list) else [wanted]
+            if name not in ("envelope_id", "document_id"):
+                values = [str(value).lower() for value in values]
+            parameters.append(bigquery.ArrayQueryParameter(name, "STRING", [str(v) for v in values]))
+    where = f"WHERE {' AND '.join(predicates)}" if predicates else ""
+    return where, parameters
+
+async def _brute_force_search(
+    client: bigquery.Client,
+    embeddings: List[np.ndarray],
+    top_k: int,
+    filters: Optional[Dict[str, Any]] = None,
+) -> List[List[Dict[str, Any]]]:
+    """Exact search in BigQuery: one table scan ranks chunks for every query.
+
+    Used while neither the local index nor the BigQuery vector index can serve
+    the query, so it is vector-only. Hits carry the same ids and metadata as
+    the local index's.
+    """
+    dimension = len(embeddings[0])
+    where, filter_parameters = _filter_sql(filters or {})
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ArrayQueryParameter(
+                "flat", "FLOAT64", np.concatenate(embeddings).astype(float).tolist()
+            ),
+            bigquery.ScalarQueryParameter("dimension", "INT64", dimension),
+            bigquery.ScalarQueryParameter("top_k", "INT64", top_k),
+            *filter_parameters,
+        ]
+    )
+    sql = f"""
+    -- 1. Rebuild one embedding per query from the flattened parameter
+    WITH queries AS (
+      SELECT DIV(position, @dimension) AS query_id, ARRAY_AGG(value ORDER BY position) AS embedding
+      FROM UNNEST(@flat) AS value WITH OFFSET position
+      GROUP BY query_id
+    ),
+    documents AS (
+      SELECT envelope_id, document_id, ANY_VALUE(name) AS name, ANY_VALUE(type) AS type
+      FROM `{PROJECT_ID}.{DATASET_ID}.documents`
+      GROUP BY envelope_id, document_id
+    )
+
+    -- 2. Rank the (filtered) document chunks for each query
+    SELECT
+      Q.query_id,
+      T.content AS chunk_content,
+      T.envelope_id,
+      T.document_id,
+      T.chunk_id,
+      D.name AS document_name,
+      D.type AS document_type,
+      E.status AS envelope_status,
+      E.created_timestamp,
+      ML.DISTANCE(Q.embedding, T.embedding, 'COSINE') AS distance
+    FROM {TABLE_PATH} AS T
+    LEFT JOIN `{PROJECT_ID}.{DATASET_ID}.envelopes` AS E ON E.envelope_id = T.envelope_id
+    LEFT JOIN documents AS D ON D.envelope_id = T.envelope_id AND D.document_id = T.document_id
+    CROSS JOIN queries AS Q
+    {where}
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY Q.query_id ORDER BY distance) <= @top_k
+    ORDER BY query_id, distance
+    """
+    rows = await run_retrieval_query(client, sql, job_config, "bigquery.vector_search")
+    results: List[List[Dict[str, Any]]] = [[] for _ in embeddings]
+    for row in rows:
+        created = row["created_timestamp"]
+        results[row["query_id"]].append(
+            {
+                "envelope_id": row["envelope_id"],
+                "document_id": row["document_id"],
+                "document_name": row["document_name"],
+                "document_type": row["document_type"],
+                "envelope_status": row["envelope_status"],
+                "chunk_id": row["chunk_id"],
+                "created_timestamp": created.isoformat() if hasattr(created, "isoformat") else created,
+                "content": row["chunk_content"],
+                "similarity_score": float(row["distance"]),
+            }
+        )
+    return results
+
+async def _vector_search(
+    client: bigquery.Client,
+    embeddings: List[np.ndarray],
+    top_k: int,
+    filters: Optional[Dict[str, Any]],
+    fraction_lists_to_search: Optional[float],
+) -> List[List[Dict[str, Any]]]:
+    """Approximate search through the managed vector index (VECTOR_SEARCH)."""
+    columns = bigquery_vector_index.result_columns()
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=vector_search_parameters(
+            np.concatenate(embeddings).astype(float).tolist(), len(embeddings[0]), filters
+        )
+    )
+    sql = vector_search_sql(top_k, fraction_lists_to_search, filters, columns=columns)
+    rows = await run_retrieval_query(client, sql, job_config, "bigquery.vector_index_search")
+    results: List[List[Dict[str, Any]]] = [[] for _ in embeddings]
+    for row in rows:
+        hit = {name: row[name] for name in columns}
+        hit["similarity_score"] = float(row["distance"])
+        results[row["query_id"]].append(hit)
+    return results
+
+async def _bigquery_search(
+    client: bigquery.Client,
+    embeddings: List[np.ndarray],
+    top_k: int,
+    filters: Optional[Dict[str, Any]],
+    fraction_lists_to_search: Optional[float],
+) -> List[List[Dict[str, Any]]]:
+    """VECTOR_SEARCH once the managed index covers the table, brute force before."""
+    if bigquery_vector_index.stale():
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, bigquery_vector_index.check, client)
+    if bigquery_vector_index.search_mode(filters) == "vector_search":
+        return await _vector_search(client, embeddings, top_k, filters, fraction_lists_to_search)
+    return await _brute_force_search(client, embeddings, top_k, filters)
+
+def _phrases(query: str) -> List[str]:
+    """Exact phrases worth boosting: quoted spans, or a short query as a whole."""
+    quoted = [" ".join(tokenize(phrase)) for phrase in re.findall(r'"([^"]+)"', query)]
+    if any(quoted):
+        return [phrase for phrase in quoted if phrase]
+    tokens = tokenize(query)
+    return [" ".join(tokens)] if 0 < len(tokens) <= RETRIEVAL_PHRASE_MAX_TOKENS else []
+
+def hybrid_search(
+    index: IvfIndex,
+    query: str,
+    embedding: np.ndarray,
+    top_k: int,
+    nprobe: Optional[int] = None,
+    mask: Optional[np.ndarray] = None,
+) -> List[Dict[str, Any]]:
+    """Fuse vector and BM25 rankings with reciprocal-rank fusion, then boost
+    chunks that contain the query's exact phrases."""
+    candidates = max(top_k, RETRIEVAL_CANDIDATES)
+    vector_hits = index.search(embedding, k=candidates, nprobe=nprobe, mask=mask)
+    lexical_hits = index.bm25.search(query, k=candidates, mask=mask)
+
+    fused: Dict[int, Dict[str, Any]] = {}
+    for rank, hit in enumerate(vector_hits):
+        fused[hit["row"]] = {"score": 1 / (RETRIEVAL_RRF_K + rank + 1), "distance": hit["distance"]}
+    for rank, (row, bm25_score) in enumerate(lexical_hits):
+        entry = fused.setdefault(row, {"score": 0.0, "distance": None})
+        entry["score"] += 1 / (RETRIEVAL_RRF_K + rank + 1)
+        entry["bm25"] = bm25_score
+
+    phrases = _phrases(query)
+    results: List[Dict[str, Any]] = []
+    for row, entry in fused.items():
+        content = index.content(row)
+        if phrases:
+            padded = f" {' '.join(tokenize(content))} "
+            entry["score"] += sum(1 / RETRIEVAL_RRF_K for phrase in phrases if f" {phrase} " in padded)
+        results.append(
+            {
+                **index.metadata(row),
+                "content": content,
+                "similarity_score": entry["distance"],
+                "bm25_score": round(entry.get("bm25", 0.0), 4),
+                "score": round(entry["score"], 6),
+            }
+        )
+    results.sort(key=lambda item: item["score"], reverse=True)
+    return results[:top_k]
+
+async def search_documents(
+    client: bigquery.Client,
+    queries: List[str],
+    top_k: int = 5,
+    nprobe: Optional[int] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    fraction_lists_to_search: Optional[float] = BQ_VECTOR_SEARCH_FRACTION,
+) -> List[List[Dict[str, Any]]]:
+    """Top-k chunks for each query, embedding all queries in one model call.
+
+    With the local index loaded, vector and BM25 results are fused and the
+    metadata `filters` are applied inside both indexes before scoring; results
+    carry envelope, document and chunk ids. Otherwise chunks are ranked by
+    vector distance in BigQuery, through VECTOR_SEARCH when the managed index
+    is fully built (`fraction_lists_to_search` sets its recall) and by brute
+    force while it is building.
+    """
+    if not queries:
+        return []
+    # Repeated queries (after normalization) are embedded and searched once,
+    # using the first spelling of each as the user wrote it
+    keys = [normalize_query_text(query) for query in queries]
+    first_spelling: Dict[str, str] = {}
+    for query, key in zip(queries, keys):
+        first_spelling.setdefault(key, query)
+    unique = list(first_spelling.values())
+    embeddings = await embed_queries(client, unique)
+    index = vector_index.index
+    if index is None or not len(index):
+        results = await _bigquery_search(
+            client, embeddings, top_k, filters, fraction_lists_to_search
+        )
+    else:
+        with tracer.start_as_current_span("vector_index.search") as span:
+            mask = index.filter_mask(filters)
+            span.set_attribute("vector_index.version", index.meta.get("version", ""))
+            span.set_attribute("vector_index.nprobe", nprobe or VECTOR_INDEX_NPROBE)
+            span.set_attribute("vector_index.queries", len(unique))
+            if mask is not None:
+                span.set_attribute("vector_index.filtered_rows", int(mask.sum()))
+            results = [
+                hybrid_search(index, query, embedding, top_k, nprobe=nprobe, mask=mask)
+                for query, embedding in zip(unique, embeddings)
+            ]
+    by_key = dict(zip(first_spelling, results))
+    return [by_key[key] for key in keys]
@@ -0,0 +1,98 @@
+# sub_agents/docusign_sql.py
+import os
+from typing import List, Optional
+
+from google.adk.tools import FunctionTool
+from google.adk.tools.agent_tool import AgentTool
+from google.adk.tools.tool_context import ToolContext
+
+from ..bigquery_clients import get_bigquery_client
+from .bigquery_agent import bigquery_agent, credentials, tool_config
+from .bigquery_tools import run_read_only_query
+from .schema_catalog import PROJECT_ID, schema_catalog_prompt
+from .sql_guard import prepare_query, shape_rows
+from .sql_examples import note_verified_query
+
+# Keep the nested bigquery_agent available as a fallback for questions the
+# direct tool cannot express (e.g. INFORMATION_SCHEMA exploration).
+BIGQUERY_AGENT_FALLBACK = os.getenv("BIGQUERY_AGENT_FALLBACK", "1") == "1"
+
+def docusign_bigquery_client():
+    return get_bigquery_client(
+        project=PROJECT_ID,
+        credentials=credentials,
+        location=tool_config.location,
+        user_agent=tool_config.application_name,
+    )
+
+async def run_docusign_sql(
+    query: str,
+    include_large_text: bool = False,
+    tool_context: Optional[ToolContext] = None,
+) -> dict:
+    """Run a read-only GoogleSQL SELECT against the DocuSign dataset.
+
+    Reference tables as `docusign-475113.customdocusignconnector.<table>`. A
+    LIMIT is added when the query has none.
+
+    Args:
+        query: A single SELECT (or WITH ... SELECT) statement.
+        include_large_text: Set only when the user explicitly asked for full
+            document text; otherwise large text columns are refused.
+
+    Returns:
+        dict: {"status": "SUCCESS", "columns": ["name:TYPE", ...], "rows": [[...], ...],
+        "row_count": n} on success. Long results keep only the first rows plus
+        "rows_omitted" and a per-column "column_summary"; long strings are cut.
+        May also include "result_is_likely_truncated" or "cache". On failure
+        {"status": "ERROR", "error_details": ...}; fix the query and retry.
+    """
+    prepared, error = prepare_query(
+        query, tool_config.max_query_result_rows, include_large_text=include_large_text
+    )
+    if error:
+        return {"status": "ERROR", "error_details": error}
+
+    result = await run_read_only_query(
+        docusign_bigquery_client(), PROJECT_ID, prepared, tool_config.max_query_result_rows
+    )
+    if result["status"] != "SUCCESS":
+        return result
+    names = [column["name"] for column in result["columns"]]
+    note_verified_query(tool_context, query, names, len(result["rows"]))
+
+    shaped = shape_rows(names, result["rows"])
+    compact = {
+        "status": "SUCCESS",
+        "columns": [f"{column['name']}:{column['type']}" for column in result["columns"]],
+        "rows": [[row.get(name) for name in names] for row in shaped.pop("rows")],
+        "row_count": len(result["rows"]),
+        **shaped,
+    }
+    for key in ("result_is_likely_truncated", "cache"):
+        if key in result:
+            compact[key] = result[key]
+    return compact
+
+docusign_sql_tool = FunctionTool(func=run_docusign_sql)
+
+def docusign_sql_instruction() -> str:
+    """Instruction section for agents that query with `run_docusign_sql`,
+    rendered from the live schema catalog."""
+    instruction = (
+        "Query data with `run_docusign_sql`, writing GoogleSQL directly against this schema "
+        "(no schema lookups needed):\n" + schema_catalog_prompt()
+    )
+    if BIGQUERY_AGENT_FALLBACK:
+        instruction += (
+            "\nOnly if `run_docusign_sql` keeps failing for a question, delegate it to `bigquery_agent`."
+        )
+    return instruction
+
+def docusign_data_tools() -> List:
+    """Tools an agent needs to read DocuSign data: the direct SQL tool plus the
+    optional bigquery_agent fallback."""
+    tools: List = [docusign_sql_tool]
+    if BIGQUERY_AGENT_FALLBACK:
+        tools.append(AgentTool(agent=bigquery_agent))
+    return tools
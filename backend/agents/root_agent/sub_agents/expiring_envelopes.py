@@ -0,0 +1,125 @@
+# sub_agents/expiring_envelopes.py
+import asyncio
+import datetime
+import os
+from typing import Any, Dict, List, Optional
+
+from google.cloud import bigquery
+
+from .schema_catalog import DATASET_ID, PROJECT_ID, dataset_watermark
+
+EXPIRING_ENVELOPES_TABLE = "expiring_envelopes"
+# How often the background loop looks for a newer sync
+EXPIRING_ENVELOPES_CHECK_SECONDS = float(os.getenv("EXPIRING_ENVELOPES_CHECK_SECONDS", "300"))
+
+# Pending recipients of in-flight envelopes, with expiry computed once:
+# created_timestamp plus expire_after days. Envelopes without a numeric
+# expire_after never expire and are left out.
+_EXPIRING_ENVELOPES_SQL = f"""
+SELECT
+  e.envelope_id,
+  e.subject,
+  e.status AS envelope_status,
+  e.created_timestamp,
+  e.sent_timestamp,
+  TIMESTAMP_ADD(e.created_timestamp, INTERVAL SAFE_CAST(e.expire_after AS INT64) DAY) AS expires_at,
+  r.recipient_id,
+  r.name AS recipient_name,
+  r.email AS recipient_email,
+  r.status AS recipient_status,
+  r.type AS recipient_type,
+  r.routing_order
+FROM `{PROJECT_ID}.{DATASET_ID}.envelopes` e
+JOIN `{PROJECT_ID}.{DATASET_ID}.recipients` r USING (envelope_id)
+WHERE LOWER(e.status) IN ('sent', 'delivered')
+  AND LOWER(r.status) IN ('created', 'sent', 'delivered')
+  AND SAFE_CAST(e.expire_after AS INT64) IS NOT NULL
+  AND TIMESTAMP_ADD(e.created_timestamp, INTERVAL SAFE_CAST(e.expire_after AS INT64) DAY)
+      >= CURRENT_TIMESTAMP()
+ORDER BY expires_at
+"""
+
+# In-memory copy of the table, ordered by expires_at, served to the agent and API
+_expiring_rows: List[Dict[str, Any]] = []
+_expiring_state: Dict[str, Any] = {"refreshed_at": None, "watermark": None, "materialized": False}
+
+def build_expiring_envelopes(client: bigquery.Client) -> Dict[str, Any]:
+    """Recompute the expiring recipients, writing them to the `expiring_envelopes`
+    table in the same query job. Falls back to an in-memory-only snapshot when
+    the credentials cannot write to the dataset."""
+    job_config = bigquery.QueryJobConfig(
+        destination=f"{PROJECT_ID}.{DATASET_ID}.{EXPIRING_ENVELOPES_TABLE}",
+        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+    )
+    materialized = True
+    try:
+        rows = client.query(_EXPIRING_ENVELOPES_SQL, job_config=job_config).result()
+    except Exception as exc:  # pragma: no cover - logging path
+        print(f"[expiring-envelopes] Could not materialize {EXPIRING_ENVELOPES_TABLE}: {exc}")
+        materialized = False
+        rows = client.query(_EXPIRING_ENVELOPES_SQL).result()
+    return {"rows": [dict(row.items()) for row in rows], "materialized": materialized}
+
+async def refresh_expiring_envelopes(
+    client: Optional[bigquery.Client], force: bool = False
+) -> Dict[str, Any]:
+    """Recompute the snapshot when the dataset has changed since the last refresh."""
+    if client is None:
+        return expiring_envelopes_status()
+    loop = asyncio.get_running_loop()
+    metadata = await loop.run_in_executor(None, dataset_watermark, client)
+    if not force and metadata["watermark"] == _expiring_state["watermark"]:
+        return expiring_envelopes_status()
+    snapshot = await loop.run_in_executor(None, build_expiring_envelopes, client)
+    _expiring_rows[:] = snapshot["rows"]
+    _expiring_state.update(
+        refreshed_at=datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        watermark=metadata["watermark"],
+        materialized=snapshot["materialized"],
+    )
+    print(f"[expiring-envelopes] Refreshed {len(_expiring_rows)} pending recipients")
+    return expiring_envelopes_status()
+
+async def keep_expiring_envelopes_fresh(client: Optional[bigquery.Client]) -> None:
+    """Background loop: refresh the snapshot whenever a sync lands."""
+    while True:
+        try:
+            await refresh_expiring_envelopes(client)
+        except Exception as exc:  # pragma: no cover - logging path
+            print(f"[expiring-envelopes] Refresh failed: {exc}")
+        await asyncio.sleep(EXPIRING_ENVELOPES_CHECK_SECONDS)
+
+def _iso(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, (datetime.datetime, datetime.date)) else value
+
+def expiring_within(days: float, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Pending recipients whose envelope expires between now and `days` from now,
+    soonest first. Served from memory; no BigQuery call."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    horizon = now + datetime.timedelta(days=days)
+    matches: List[Dict[str, Any]] = []
+    for row in _expiring_rows:
+        expires_at = row["expires_at"]
+        if expires_at < now:
+            continue
+        if expires_at > horizon or (limit is not None and len(matches) >= limit):
+            break
+        matches.append(
+            {
+                **{key: _iso(value) for key, value in row.items()},
+                "days_until_expiry": round((expires_at - now).total_seconds() / 86400, 2),
+            }
+        )
+    return matches
+
+def expiring_envelopes_loaded() -> bool:
+    return _expiring_state["refreshed_at"] is not None
+
+def expiring_envelopes_status() -> Dict[str, Any]:
+    return {
+        "table": f"{PROJECT_ID}.{DATASET_ID}.{EXPIRING_ENVELOPES_TABLE}",
+        "materialized": _expiring_state["materialized"],
+        "refreshed_at": _expiring_state["refreshed_at"],
+        "watermark": _expiring_state["watermark"],
+        "pending_recipients": len(_expiring_rows),
+    }
@@ -0,0 +1,43 @@
+# sub_agents/quantization.py
+from typing import Tuple
+
+import numpy as np
+
+QUANTIZATION_MODES = ("none", "int8", "binary")
+
+# Set bits per byte value, for Hamming distances over packed codes
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint16)
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric int8 codes with one scale per vector (max |component| / 127)."""
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+    scales = np.abs(vectors).max(axis=1) / 127.0 if vectors.size else np.zeros(len(vectors))
+    scales = scales.astype(np.float32)
+    safe = np.where(scales == 0, 1.0, scales)[:, None]
+    codes = np.clip(np.rint(vectors / safe), -127, 127).astype(np.int8)
+    return codes, scales
+
+def int8_scores(codes: np.ndarray, scales: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Approximate dot products of int8-coded vectors with a float query."""
+    return (np.asarray(codes, dtype=np.float32) @ query) * np.asarray(scales)
+
+def binarize(vectors: np.ndarray) -> np.ndarray:
+    """Sign bits packed eight dimensions per byte."""
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+    return np.packbits(vectors > 0, axis=1)
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    return _POPCOUNT[np.bitwise_xor(np.asarray(codes), query_code)].sum(axis=1)
+
+def binary_scores(codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Negated Hamming distance to the query's sign bits (higher is closer)."""
+    query_code = binarize(np.asarray(query, dtype=np.float32)[None, :])[0]
+    return -hamming_distances(codes, query_code).astype(np.float32)
+
+def bytes_per_vector(dimension: int, mode: str) -> int:
+    """Bytes scanned per vector for a quantization mode (float32 when "none")."""
+    if mode == "int8":
+        return dimension + 4
+    if mode == "binary":
+        return (dimension + 7) // 8
+    return dimension * 4
@@ -1,78 +1,117 @@
 import os 
 from dotenv import load_dotenv
-import json
-
-from docusign_esign import ApiClient, EnvelopesApi
-from docusign_esign.client.api_exception import ApiException
-from docusign_esign.models import Recipients, Signer
 
 from google.adk.agents import Agent
-from google.adk.tools import AgentTool
 from google.adk.tools import FunctionTool
 
-from .bigquery_agent import bigquery_agent
+from .expiring_envelopes import (
+    expiring_envelopes_loaded,
+    expiring_envelopes_status,
+    expiring_within,
+    refresh_expiring_envelopes,
+)
+from .reminder_dispatch import REMINDER_REPORT_LIMIT, get_reminder_dispatcher
+from .docusign_sql import docusign_bigquery_client, docusign_data_tools, docusign_sql_instruction
+from .sql_examples import with_sql_examples
 
 
 load_dotenv()
 
-# --- Helper Functions (Internal Logic) ---
-
-def _send_reminder_to_recipient(envelope_id: str, recipient_id: str, api_client: ApiClient):
-    """Internal function to send a reminder to one recipient using their ID."""
-    account_id = os.getenv("DOCUSIGN_ACCOUNT_ID")
-    envelopes_api = EnvelopesApi(api_client)
-    
-    # Construct the minimal Signer object needed for the update
-    signer = Signer(recipient_id=recipient_id)
-    recipients_to_update = Recipients(signers=[signer])
-    
-    try:
-        envelopes_api.update_recipients(
-            account_id=account_id,
-            envelope_id=envelope_id,
-            recipients=recipients_to_update,
-            resend_envelope='true' # This is the key parameter to trigger the reminder
-        )
-        print(f"✅ Successfully sent reminder to recipient {recipient_id} for envelope {envelope_id}.")
-    except ApiException as e:
-        print(f"❌ Failed to send reminder to recipient {recipient_id}: {e}")
-
 # --- Main Workflow Tool ---
 
-def send_reminders_workflow(recipients_to_remind: list[dict]) -> str:
+async def send_reminders_workflow(recipients_to_remind: list[dict]) -> dict:
     """
     Sends a reminder to each recipient specified in the input list.
-    
+
+    Recipients are reminded concurrently under DocuSign's rate limits, and
+    anyone already reminded today is skipped, so the workflow is safe to re-run.
+
     Args:
         recipients_to_remind: A list of dictionaries, where each dict
                                 contains 'envelope_id' and 'recipient_id'.
+
+    Returns:
+        dict: Counts of sent, skipped_duplicate and failed reminders, plus the
+        recipients reminded and any failures.
     """
     count = len(recipients_to_remind)
     print(f"🚀 Starting reminder workflow for {count} recipients.")
-    
-    # Configure a single API client for the entire workflow
+
     access_token = os.getenv("DOCUSIGN_ACCESS_TOKEN")
-    if not access_token or not os.getenv("DOCUSIGN_ACCOUNT_ID"):
-        return "Error: DocuSign environment variables are not properly set."
-        
-    api_client = ApiClient()
-    api_client.host = 'https://demo.docusign.net/restapi'
-    api_client.set_default_header('Authorization', f'Bearer {access_token}')
-
-    sent_count = 0
-    for recipient_data in recipients_to_remind:
-        try:
-            envelope_id = recipient_data['envelope_id']
-            recipient_id = recipient_data['recipient_id']
-            _send_reminder_to_recipient(envelope_id, recipient_id, api_client)
-            sent_count += 1
-        except KeyError:
-            print(f"❌ Skipping invalid recipient data: {recipient_data}")
-        except Exception as e:
-            print(f"❌ Failed during reminder for {recipient_data}: {e}")
-    
-    summary = f"Workflow complete. Attempted to send {sent_count} reminders."
-    print(summary)
+    account_id = os.getenv("DOCUSIGN_ACCOUNT_ID")
+    if not access_token or not account_id:
+        return {"error": "DocuSign environment variables are not properly set."}
+
+    summary = await get_reminder_dispatcher(access_token, account_id).dispatch(recipients_to_remind)
+    print(
+        f"Workflow complete. Sent {summary['sent']}, skipped {summary['skipped_duplicate']} "
+        f"already reminded today, {summary['failed']} failed in {summary['elapsed_seconds']}s."
+    )
+    return summary
+
+# --- Expiring Envelopes ---
+
+async def _expiring_recipients(days: float) -> list[dict]:
+    # The API server keeps the snapshot fresh; standalone agent runs load it on first use
+    if not expiring_envelopes_loaded():
+        await refresh_expiring_envelopes(docusign_bigquery_client())
+    return expiring_within(days)
+
+async def find_expiring_envelopes(days: int) -> dict:
+    """
+    Lists pending recipients of envelopes that expire within the next `days` days.
+
+    Reads the precomputed expiring-envelopes snapshot, so no SQL is needed.
+
+    Args:
+        days: The expiration threshold in days (e.g. 7 for "in the next 7 days").
+
+    Returns:
+        dict: "count" of pending recipients and "recipients", soonest expiry first,
+        each with envelope_id, subject, expires_at, days_until_expiry,
+        recipient_id, recipient_name and recipient_email.
+    """
+    recipients = await _expiring_recipients(days)
+    return {
+        "as_of": expiring_envelopes_status()["refreshed_at"],
+        "count": len(recipients),
+        "recipients": [
+            {
+                key: recipient[key]
+                for key in (
+                    "envelope_id", "subject", "expires_at", "days_until_expiry",
+                    "recipient_id", "recipient_name", "recipient_email",
+                )
+            }
+            for recipient in recipients[:REMINDER_REPORT_LIMIT]
+        ],
+    }
+
+async def remind_expiring_recipients(days: int) -> dict:
+    """
+    Sends a reminder to every pending recipient of an envelope that expires
+    within the next `days` days.
+
+    Args:
+        days: The expiration threshold in days (e.g. 7 for "in the next 7 days").
+
+    Returns:
+        dict: The reminder summary (see `send_reminders_workflow`), with the
+        reminded recipients' names and expiry dates.
+    """
+    recipients = await _expiring_recipients(days)
+    summary = await send_reminders_workflow(recipients)
+    if "error" in summary:
+        return summary
+    details = {(item["envelope_id"], item["recipient_id"]): item for item in recipients}
+    summary["sent_to"] = [
+        {
+            **sent,
+            "recipient_name": details[(sent["envelope_id"], sent["recipient_id"])]["recipient_name"],
+            "expires_at": details[(sent["envelope_id"], sent["recipient_id"])]["expires_at"],
+        }
+        for sent in summary["sent_to"]
+    ]
     return summary
 
 # --- Tool & Agent Definitions ---
@@ -80,24 +119,28 @@ def send_reminders_workflow(recipients_to_remind: list[dict]) -> str:
 send_reminders_tool = FunctionTool(
     func=send_reminders_workflow,
 )
+find_expiring_tool = FunctionTool(func=find_expiring_envelopes)
+remind_expiring_tool = FunctionTool(func=remind_expiring_recipients)
 
 rem_agent = Agent(
     name="reminder_agent",
     model=os.getenv("GOOGLE_MODEL_NAME", "gemini-2.5-flash"),
     description="An agent that sends reminders for expiring DocuSign contracts by running an automated workflow.",
-    instruction=(
+    instruction=with_sql_examples(
         """You are a helpful assistant that automates sending DocuSign reminders.
         A user will tell you the expiration threshold in days (e.g., "in the next 7 days").
         
-        First, use `bigquery_agent` to query for expiring envelopes. Your query must be:
-        "Find all envelopes that are 'sent' and will expire between now and X DAY from now (use the user's day count for X). The expiration date is `sent_timestamp` plus `expire_after` days. Return only a valid JSON array of objects, each with 'envelope_id' and 'recipient_id' keys."
+        To send reminders, call `remind_expiring_recipients` with the user's day count. It reads the precomputed list of pending recipients on envelopes expiring within that many days (expiry is `created_timestamp` plus `expire_after` days) and reminds all of them; do not query for them yourself.
         
-        Second, parse the returned JSON to get the list of recipient objects.
-        
-        Third, call the `send_reminders_workflow` tool with the *entire list* of recipient objects you received from BigQuery.
+        If the user only wants to see what is expiring, call `find_expiring_envelopes` instead and do not send anything.
+
+        If the user gives you specific envelopes or recipients, call `send_reminders_workflow` with a list of objects, each with 'envelope_id' and 'recipient_id' keys.
+
+        Use `run_docusign_sql` only for follow-up questions the tools above do not answer.
 
-        Finally, report the summary from the `send_reminders_workflow` tool back to the user. You should return the list of envelopes reminded (with recipient names) .
-        """
+        Finally, report the summary back to the user. You should return the list of envelopes reminded (with recipient names).
+        """,
+        docusign_sql_instruction,
     ),
-    tools=[send_reminders_tool, AgentTool(agent=bigquery_agent)],
+    tools=[remind_expiring_tool, find_expiring_tool, send_reminders_tool, *docusign_data_tools()],
 )
\ No newline at end of file
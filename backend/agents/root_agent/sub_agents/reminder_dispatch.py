@@ -0,0 +1,258 @@
+# sub_agents/reminder_dispatch.py
+import asyncio
+import datetime
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from docusign_esign import ApiClient, EnvelopesApi
+from docusign_esign.client.api_exception import ApiException
+from docusign_esign.client.api_response import RESTClientObject
+from docusign_esign.client.configuration import Configuration
+from docusign_esign.models import Recipients, Signer
+
+# DocuSign endpoint; point it at a local mock server for load tests
+DOCUSIGN_BASE_PATH = os.getenv("DOCUSIGN_BASE_PATH", "https://demo.docusign.net/restapi")
+
+# Dispatch tuning. DocuSign allows bursts of 500 calls per 30 seconds per account,
+# so the per-second bucket refills a little under that and keeps a modest burst.
+# The account is also capped at 3,000 calls per hour, shared with every other
+# DocuSign call this backend makes, so reminders get their own slice of it.
+REMINDER_WORKERS = int(os.getenv("REMINDER_WORKERS", "8"))
+REMINDER_RATE_PER_SECOND = float(os.getenv("REMINDER_RATE_PER_SECOND", "15"))
+REMINDER_BURST = int(os.getenv("REMINDER_BURST", "30"))
+REMINDER_HOURLY_LIMIT = int(os.getenv("REMINDER_HOURLY_LIMIT", "2000"))
+REMINDER_HOURLY_BURST = int(os.getenv("REMINDER_HOURLY_BURST", "500"))
+REMINDER_MAX_RETRIES = int(os.getenv("REMINDER_MAX_RETRIES", "4"))
+REMINDER_BACKOFF_SECONDS = float(os.getenv("REMINDER_BACKOFF_SECONDS", "1.0"))
+REMINDER_REPORT_LIMIT = 50
+REMINDER_LOG_PATH = os.getenv(
+    "REMINDER_LOG_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "../../reminder_log.sqlite3")),
+)
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def hourly(cls, limit: int, burst: int) -> "TokenBucket":
+        """A bucket that never allows more than `limit` calls in any rolling hour.
+
+        The burst is spent up front and the rest refills over the hour, so
+        burst + refill never exceeds the limit.
+        """
+        burst = max(1, min(burst, limit - 1))
+        return cls((limit - burst) / 3600.0, burst)
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class ReminderLog:
+    """Idempotency log of reminders, keyed by (envelope, recipient, UTC day).
+
+    A key is reserved before DocuSign is called and released only if the call
+    fails, so concurrent dispatches never remind the same recipient twice.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS reminders (
+                    envelope_id TEXT NOT NULL,
+                    recipient_id TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    sent_at TEXT NOT NULL,
+                    PRIMARY KEY (envelope_id, recipient_id, day)
+                )
+                """
+            )
+            self._connection.commit()
+
+    def reserve(self, envelope_id: str, recipient_id: str, day: str) -> bool:
+        """Claim the key; False when another dispatch already holds or sent it."""
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT OR IGNORE INTO reminders VALUES (?, ?, ?, ?)",
+                (envelope_id, recipient_id, day, datetime.datetime.now(datetime.timezone.utc).isoformat()),
+            )
+            self._connection.commit()
+        return cursor.rowcount == 1
+
+    def release(self, envelope_id: str, recipient_id: str, day: str) -> None:
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM reminders WHERE envelope_id = ? AND recipient_id = ? AND day = ?",
+                (envelope_id, recipient_id, day),
+            )
+            self._connection.commit()
+
+def _retry_after_seconds(exc: ApiException) -> Optional[float]:
+    headers = dict(exc.headers or {})
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+class ReminderDispatcher:
+    """Send DocuSign reminders through a bounded worker pool.
+
+    One `ApiClient` (and its HTTP connection pool) is shared by all workers.
+    Every call waits on the per-second and hourly token buckets; 429 and 5xx
+    responses are retried with exponential backoff (honouring Retry-After), and
+    recipients already reminded today are skipped using the idempotency log.
+    """
+
+    def __init__(
+        self,
+        api_client: ApiClient,
+        account_id: str,
+        log: ReminderLog,
+        workers: int = REMINDER_WORKERS,
+        rate_per_second: float = REMINDER_RATE_PER_SECOND,
+        burst: int = REMINDER_BURST,
+        hourly_bucket: Optional[TokenBucket] = None,
+        max_retries: int = REMINDER_MAX_RETRIES,
+        backoff_seconds: float = REMINDER_BACKOFF_SECONDS,
+        sleep: Callable[[float], Any] = asyncio.sleep,
+    ):
+        self.envelopes_api = EnvelopesApi(api_client)
+        self.account_id = account_id
+        self.log = log
+        self.workers = workers
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.hourly_bucket = hourly_bucket or TokenBucket.hourly(REMINDER_HOURLY_LIMIT, REMINDER_HOURLY_BURST)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._sleep = sleep
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reminders")
+
+    def _send(self, envelope_id: str, recipient_id: str) -> None:
+        self.envelopes_api.update_recipients(
+            account_id=self.account_id,
+            envelope_id=envelope_id,
+            recipients=Recipients(signers=[Signer(recipient_id=recipient_id)]),
+            resend_envelope="true",  # This is the key parameter to trigger the reminder
+        )
+
+    async def _remind(self, envelope_id: str, recipient_id: str, day: str) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        result: Dict[str, Any] = {"envelope_id": envelope_id, "recipient_id": recipient_id}
+        if not await loop.run_in_executor(self._executor, self.log.reserve, envelope_id, recipient_id, day):
+            return {**result, "status": "skipped_duplicate"}
+        outcome = await self._send_with_retries(envelope_id, recipient_id)
+        if outcome["status"] != "sent":
+            await loop.run_in_executor(self._executor, self.log.release, envelope_id, recipient_id, day)
+        return {**result, **outcome}
+
+    async def _send_with_retries(self, envelope_id: str, recipient_id: str) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            await self.hourly_bucket.acquire()
+            await self.bucket.acquire()
+            try:
+                await loop.run_in_executor(self._executor, self._send, envelope_id, recipient_id)
+                return {"status": "sent", "attempts": attempt + 1}
+            except ApiException as exc:
+                retryable = exc.status == 429 or (exc.status is not None and exc.status >= 500)
+                if not retryable or attempt == self.max_retries:
+                    return {"status": "failed", "error": f"{exc.status} {exc.reason}"}
+                delay = _retry_after_seconds(exc) or self.backoff_seconds * (2 ** attempt)
+                await self._sleep(delay * (1 + random.random() * 0.1))
+            except Exception as exc:  # pylint: disable=broad-except
+                return {"status": "failed", "error": str(exc)}
+        return {"status": "failed", "error": "retries exhausted"}
+
+    async def dispatch(self, recipients: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Remind every (envelope_id, recipient_id) pair once; returns a summary."""
+        started = time.perf_counter()
+        day = datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+        queue: asyncio.Queue = asyncio.Queue()
+        seen: set = set()
+        invalid = 0
+        for item in recipients:
+            try:
+                key: Tuple[str, str] = (str(item["envelope_id"]), str(item["recipient_id"]))
+            except (KeyError, TypeError):
+                invalid += 1
+                continue
+            if key not in seen:
+                seen.add(key)
+                queue.put_nowait(key)
+
+        results: List[Dict[str, Any]] = []
+
+        async def worker() -> None:
+            while True:
+                try:
+                    envelope_id, recipient_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                results.append(await self._remind(envelope_id, recipient_id, day))
+
+        await asyncio.gather(*(worker() for _ in range(min(self.workers, max(queue.qsize(), 1)))))
+
+        counts: Dict[str, int] = {"sent": 0, "skipped_duplicate": 0, "failed": 0}
+        for result in results:
+            counts[result["status"]] += 1
+        return {
+            **counts,
+            "invalid": invalid,
+            "duplicates_in_request": len(recipients) - invalid - len(seen),
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+            # Keep the summary small enough to hand back to the model
+            "sent_to": [result for result in results if result["status"] == "sent"][:REMINDER_REPORT_LIMIT],
+            "failures": [result for result in results if result["status"] == "failed"][:REMINDER_REPORT_LIMIT],
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+_dispatcher: Optional[ReminderDispatcher] = None
+_dispatcher_token: Optional[str] = None
+# Outlives dispatcher rebuilds so a token refresh does not reset the hourly quota
+_hourly_bucket = TokenBucket.hourly(REMINDER_HOURLY_LIMIT, REMINDER_HOURLY_BURST)
+
+def get_reminder_dispatcher(access_token: str, account_id: str) -> ReminderDispatcher:
+    """Return the shared dispatcher, rebuilding it when the access token changes."""
+    global _dispatcher, _dispatcher_token
+    if _dispatcher is None or _dispatcher_token != access_token:
+        if _dispatcher is not None:
+            _dispatcher.close()
+        api_client = ApiClient()
+        api_client.host = DOCUSIGN_BASE_PATH
+        # One pooled connection per worker so concurrent calls never reconnect
+        configuration = Configuration()
+        configuration.connection_pool_maxsize = REMINDER_WORKERS
+        api_client.rest_client = RESTClientObject(configuration=configuration)
+        api_client.set_default_header("Authorization", f"Bearer {access_token}")
+        _dispatcher = ReminderDispatcher(
+            api_client, account_id, ReminderLog(REMINDER_LOG_PATH), hourly_bucket=_hourly_bucket
+        )
+        _dispatcher_token = access_token
+    return _dispatcher
@@ -1,89 +1,98 @@
 import os
 import json
+from typing import Optional
 from google.adk.agents.llm_agent import Agent
-from google.adk.tools.agent_tool import AgentTool
 from google.adk.tools import FunctionTool
-from google.cloud import bigquery
-from google.oauth2 import service_account
-from .bigquery_agent import bigquery_agent
-
-# Document retrieval configuration
-PROJECT_ID = "docusign-475113"
-DATASET_ID = "customdocusignconnector"
-MODEL_NAME = "document_embedding_model"
-TABLE_NAME = "document_embeddings"
-SERVICE_ACCOUNT_JSON_PATH = os.getenv("GOOGLE_SERVICE_ACCOUNT_FILE", os.path.join(os.path.dirname(__file__), "../../docusign-arpit.json"))
-
-
-def retrieve_documents(query_text: str) -> str:
+from .docusign_sql import docusign_data_tools, docusign_sql_instruction
+from .sql_examples import with_sql_examples
+from .document_retrieval import PROJECT_ID, search_documents
+from ..bigquery_clients import get_bigquery_client
+
+async def retrieve_documents(
+    query_text: str,
+    top_k: int = 5,
+    envelope_id: Optional[str] = None,
+    document_type: Optional[str] = None,
+    envelope_status: Optional[str] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    nprobe: Optional[int] = None,
+) -> str:
     """
-    Performs a vector search on a BigQuery table using a service account.
+    Searches the embedded document chunks by meaning and by exact words
+    (clause names, party names), optionally restricted by metadata.
 
     Args:
-        query_text: The natural language search query
+        query_text: The search query; put exact phrases in double quotes
+        top_k: How many chunks to return
+        envelope_id: Only search this envelope's documents
+        document_type: Only search documents of this DocuSign type
+        envelope_status: Only search envelopes with this status (e.g. completed)
+        created_after: Only envelopes created on/after this ISO date
+        created_before: Only envelopes created on/before this ISO date
+        nprobe: Optional recall/latency knob for the local index; higher searches
+            more of the corpus (leave unset for the default)
 
     Returns:
-        A JSON string containing the search results with content chunks and similarity scores
+        A JSON string listing matching chunks with their content, envelope_id,
+        document_id, chunk_id, document_name and scores
     """
     try:
-        # --- Authentication ---
-        credentials = service_account.Credentials.from_service_account_file(
-            SERVICE_ACCOUNT_JSON_PATH
+        # --- Shared client: credentials and HTTP connections are reused across calls ---
+        client = get_bigquery_client(project=PROJECT_ID)
+        if client is None:
+            raise RuntimeError("BigQuery credentials are not configured")
+
+        filters = {
+            "envelope_id": envelope_id,
+            "document_type": document_type,
+            "envelope_status": envelope_status,
+            "created_after": created_after,
+            "created_before": created_before,
+        }
+        results = await search_documents(
+            client, [query_text], top_k=top_k, nprobe=nprobe, filters=filters
         )
 
-        client = bigquery.Client(project=PROJECT_ID, credentials=credentials)
-
-        model_path = f"`{PROJECT_ID}.{DATASET_ID}.{MODEL_NAME}`"
-        table_path = f"`{PROJECT_ID}.{DATASET_ID}.{TABLE_NAME}`"
-
-        sql = f"""
-        -- 1. Create a CTE to embed the user's search query
-        WITH query_embedding AS (
-          SELECT
-            ml_generate_embedding_result AS embedding
-          FROM
-            ML.GENERATE_EMBEDDING(
-              MODEL {model_path},
-              (SELECT @query_text AS content)
-            )
-        )
+        # Return as JSON string
+        return json.dumps(results[0], indent=2)
 
-        -- 2. Find the closest matches from the document chunks
-        SELECT
-          T.content AS chunk_content, -- This is the original text chunk
-          ML.DISTANCE(
-            Q.embedding,
-            T.embedding,
-            'COSINE'
-          ) AS distance
-        FROM
-          {table_path} AS T,
-          query_embedding AS Q
-        ORDER BY
-          distance ASC -- Order by distance (lowest is best)
-        LIMIT 5;       -- Show the top 5 matches
-        """
-
-        # 3. Use QueryJobConfig to set the @query_text parameter
-        job_config = bigquery.QueryJobConfig(
-            query_parameters=[
-                bigquery.ScalarQueryParameter("query_text", "STRING", query_text)
-            ]
-        )
+    except Exception as e:
+        error_msg = f"An error occurred during document retrieval: {str(e)}"
+        print(error_msg)
+        return json.dumps({"error": error_msg})
 
-        # 4. Run the query
-        query_job = client.query(sql, job_config=job_config)
 
-        # 5. Collect results
-        results = []
-        for row in query_job.result():
-            results.append({
-                "content": row.chunk_content,
-                "similarity_score": float(row.distance)
-            })
+async def retrieve_documents_batch(
+    queries: list[str],
+    top_k: int = 5,
+    filters: Optional[dict] = None,
+    nprobe: Optional[int] = None,
+) -> str:
+    """
+    Runs several document searches at once. Prefer this over repeated
+    retrieve_documents calls when you need more than one search.
 
-        # Return as JSON string
-        return json.dumps(results, indent=2)
+    Args:
+        queries: The search queries
+        top_k: How many chunks to return per query
+        filters: Optional metadata filters applied to every query, with the
+            same keys as retrieve_documents (envelope_id, document_type,
+            envelope_status, created_after, created_before)
+        nprobe: Optional recall/latency knob for the local index
+
+    Returns:
+        A JSON string mapping each query to its matching chunks
+    """
+    try:
+        client = get_bigquery_client(project=PROJECT_ID)
+        if client is None:
+            raise RuntimeError("BigQuery credentials are not configured")
+
+        results = await search_documents(
+            client, queries, top_k=top_k, nprobe=nprobe, filters=filters
+        )
+        return json.dumps(dict(zip(queries, results)), indent=2)
 
     except Exception as e:
         error_msg = f"An error occurred during document retrieval: {str(e)}"
@@ -95,6 +104,9 @@ def retrieve_documents(query_text: str) -> str:
 document_retrieval_tool = FunctionTool(
     func=retrieve_documents,
 )
+document_batch_retrieval_tool = FunctionTool(
+    func=retrieve_documents_batch,
+)
 
 # This is the system prompt you'll use in your Cloud Function or Workflow
 
@@ -102,16 +114,16 @@ sales_agent = Agent(
     name="sales_agent",
     model=os.getenv("GOOGLE_MODEL_NAME", "gemini-2.5-flash"),
     description="An agent that analyzes sales data, contract information, and provides insights using document retrieval capabilities.",
-    instruction=(
+    instruction=with_sql_examples(
         """You are a helpful sales operations analyst that can analyze contract data and retrieve relevant document information.
 
         You have access to:
-        1. BigQuery data through the bigquery_agent for structured data queries
-        2. Document retrieval through the retrieve_documents tool for searching embedded documents
+        1. BigQuery data through the run_docusign_sql tool for structured data queries
+        2. Document retrieval through the retrieve_documents tool for searching embedded documents (retrieve_documents_batch runs several searches in one call)
 
         When analyzing customer data or providing insights:
-        - Use bigquery_agent for structured queries on envelopes, contracts, and customer data
-        - Use retrieve_documents to search through document embeddings for relevant context, performance data, or contract details
+        - Use run_docusign_sql for structured queries on envelopes, contracts, and customer data
+        - Use retrieve_documents to search through document embeddings for relevant context, performance data, or contract details. Narrow it with envelope_id, document_type, envelope_status or a created date range instead of scanning document text with SQL, and quote exact clause or party names
         - Combine both tools when needed to provide comprehensive analysis
 
         You have the following responsibilities:
@@ -120,7 +132,8 @@ sales_agent = Agent(
         - Return comprehensive reasons for your choices and insights.
         
         Always provide actionable insights based on the data you retrieve.
-        """
+        """,
+        docusign_sql_instruction,
     ),
-    tools=[AgentTool(agent=bigquery_agent), document_retrieval_tool],
+    tools=[*docusign_data_tools(), document_retrieval_tool, document_batch_retrieval_tool],
 )
\ No newline at end of file
@@ -0,0 +1,359 @@
+# sub_agents/schema_catalog.py
+import asyncio
+import datetime
+import fcntl
+import json
+import os
+import re
+import tempfile
+from typing import Any, Dict, List, Optional, Set
+
+from google.cloud import bigquery
+
+PROJECT_ID = "docusign-475113"
+DATASET_ID = "customdocusignconnector"
+
+# Generated catalog artifact and how often to look for a newer sync
+SCHEMA_CATALOG_PATH = os.getenv(
+    "SCHEMA_CATALOG_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "../../schema_catalog.json")),
+)
+SCHEMA_CATALOG_CHECK_SECONDS = float(os.getenv("SCHEMA_CATALOG_CHECK_SECONDS", "600"))
+SCHEMA_CATALOG_MAX_ENUM_VALUES = 12
+
+# Hand-written starting point, used until a generated catalog has been loaded
+_SEED_CATALOG: Dict[str, Dict[str, str]] = {
+    "envelopes": {
+        "envelope_id": "STRING",
+        "status": "STRING",
+        "sent_timestamp": "TIMESTAMP",
+        "completed_timestamp": "TIMESTAMP",
+        "created_timestamp": "TIMESTAMP",
+        "last_modified_timestamp": "TIMESTAMP",
+        "expire_after": "STRING",
+        "subject": "STRING",
+        "contract_cycle_time_hours": "FLOAT64",
+        "conversion_status": "STRING",
+    },
+    "recipients": {
+        "envelope_id": "STRING",
+        "recipient_id": "STRING",
+        "name": "STRING",
+        "email": "STRING",
+        "status": "STRING",
+        "type": "STRING",
+        "routing_order": "INT64",
+    },
+    "enhanced_recipients": {
+        "envelope_id": "STRING",
+        "recipient_id": "STRING",
+        "name": "STRING",
+        "email": "STRING",
+        "status": "STRING",
+        "type": "STRING",
+        "routing_order": "INT64",
+        "declined_reason": "STRING",
+        "sent_timestamp": "TIMESTAMP",
+        "signed_timestamp": "TIMESTAMP",
+    },
+    "audit_events": {
+        "envelope_id": "STRING",
+        "event_id": "STRING",
+        "logtime": "STRING",
+        "activity": "STRING",
+        "eventdescription": "STRING",
+        "useremail": "STRING",
+        "authenticationmethod": "STRING",
+    },
+    "documents": {
+        "envelope_id": "STRING",
+        "document_id": "STRING",
+        "name": "STRING",
+        "type": "STRING",
+        "pages": "INT64",
+    },
+    "document_contents": {
+        "envelope_id": "STRING",
+        "document_id": "STRING",
+        "content_sha256": "STRING",
+        "text_sha256": "STRING",
+    },
+    "envelope_document_texts": {
+        "envelope_id": "STRING",
+        "document_id": "STRING",
+        "content_sha256": "STRING",
+        "text_sha256": "STRING",
+        "content_text": "STRING",
+    },
+    "templates": {
+        "template_id": "STRING",
+        "name": "STRING",
+        "description": "STRING",
+        "created_timestamp": "TIMESTAMP",
+        "last_modified_timestamp": "TIMESTAMP",
+        "shared": "STRING",
+    },
+    "custom_fields": {
+        "envelope_id": "STRING",
+        "field_name": "STRING",
+        "value": "STRING",
+        "type": "STRING",
+    },
+    "document_embeddings": {
+        "content": "STRING",
+        "embedding": "ARRAY<FLOAT64>",
+    },
+}
+
+# Live catalog: table -> {column: type}. Updated in place when a generated
+# catalog is applied so every importer sees the refresh.
+SCHEMA_CATALOG: Dict[str, Dict[str, str]] = {
+    table: dict(columns) for table, columns in _SEED_CATALOG.items()
+}
+# table -> column -> {"null_rate", "min", "max", "values"}
+COLUMN_STATS: Dict[str, Dict[str, Dict[str, Any]]] = {}
+_catalog_state: Dict[str, Any] = {"generated_at": None, "watermark": None, "source": "seed"}
+
+# Tables whose columns mirror source fields and may grow without notice
+DYNAMIC_COLUMN_TABLES = {"audit_events"}
+
+# Tables this backend and the embedding pipeline write into the dataset
+# themselves; writing them is not a sync
+DERIVED_TABLES = {
+    "expiring_envelopes", "document_texts", "chunk_embeddings", "document_embeddings",
+    "envelope_document_texts",
+}
+# Per-shard staging tables of the embedding pipeline
+_DERIVED_TABLE_NAME = re.compile(r"_text_staging(_\d+_of_\d+)?$")
+
+# Columns too large to hand back to the model wholesale
+LARGE_TEXT_COLUMNS: Dict[str, Set[str]] = {
+    "document_contents": {"content_text", "content_base64"},
+    "document_embeddings": {"content", "embedding"},
+    "document_blobs": {"content_base64"},
+    "document_texts": {"content_text"},
+    "envelope_document_texts": {"content_text"},
+    "chunk_embeddings": {"content", "embedding"},
+}
+
+# Payload-looking STRING columns the profiler skips even when they are not
+# registered above, so a new document column is never scanned wholesale
+_PAYLOAD_COLUMN_NAME = re.compile(r"(base_?64|content|text|body|blob|payload|embedding|html)", re.IGNORECASE)
+
+_NUMERIC_TYPES = {"INT64", "FLOAT64", "NUMERIC", "BIGNUMERIC"}
+_TEMPORAL_TYPES = {"TIMESTAMP", "DATETIME", "DATE"}
+
+def _describe_column(table: str, name: str, column_type: str) -> str:
+    stats = COLUMN_STATS.get(table, {}).get(name, {})
+    described = f"{name} {column_type}"
+    if stats.get("values"):
+        described += " {" + "|".join(str(value) for value in stats["values"]) + "}"
+    elif stats.get("min") is not None and stats.get("max") is not None:
+        described += f" [{stats['min']}..{stats['max']}]"
+    if stats.get("null_rate"):
+        described += f" nulls {round(stats['null_rate'] * 100)}%"
+    return described
+
+def schema_catalog_prompt() -> str:
+    """Compact one-line-per-table rendering of the catalog for agent instructions."""
+    lines = [f"Dataset: `{PROJECT_ID}.{DATASET_ID}`"]
+    row_counts = _catalog_state.get("row_counts") or {}
+    for table, columns in SCHEMA_CATALOG.items():
+        rendered = ", ".join(
+            _describe_column(table, name, column_type) for name, column_type in columns.items()
+        )
+        suffix = ", …dynamic audit fields" if table in DYNAMIC_COLUMN_TABLES else ""
+        rows = f" (~{row_counts[table]} rows)" if table in row_counts else ""
+        lines.append(f"- {table}{rows}: {rendered}{suffix}")
+    large = ", ".join(
+        f"{table}.{column}" for table, columns in LARGE_TEXT_COLUMNS.items() for column in sorted(columns)
+    )
+    lines.append(f"Large columns ({large}) must be filtered or wrapped in SUBSTR/LENGTH, not selected raw.")
+    return "\n".join(lines)
+
+# --- Catalog generation ---
+
+def _dataset_path(name: str) -> str:
+    return f"`{PROJECT_ID}.{DATASET_ID}.{name}`"
+
+def is_derived_table(name: str) -> bool:
+    return name in DERIVED_TABLES or bool(_DERIVED_TABLE_NAME.search(name))
+
+def dataset_watermark(client: bigquery.Client) -> Dict[str, Any]:
+    """Row counts and the latest modification time across the dataset's synced tables."""
+    rows = client.query(
+        f"SELECT table_id, row_count, last_modified_time FROM {_dataset_path('__TABLES__')}"
+    ).result()
+    row_counts: Dict[str, int] = {}
+    watermark = 0
+    for row in rows:
+        row_counts[row["table_id"]] = int(row["row_count"] or 0)
+        if not is_derived_table(row["table_id"]):
+            watermark = max(watermark, int(row["last_modified_time"] or 0))
+    return {"watermark": watermark, "row_counts": row_counts}
+
+def _column_stats(
+    client: bigquery.Client, table: str, columns: Dict[str, str]
+) -> Dict[str, Dict[str, Any]]:
+    """Null rates, value ranges and small enumerations, in one scan per table."""
+    selects: List[str] = ["COUNT(*) AS row_total"]
+    profiled: List[tuple] = []
+    for index, (name, column_type) in enumerate(columns.items()):
+        if name in LARGE_TEXT_COLUMNS.get(table, ()) or column_type.startswith(("ARRAY", "STRUCT", "BYTES")):
+            continue
+        if column_type == "STRING" and _PAYLOAD_COLUMN_NAME.search(name):
+            continue
+        column = f"`{name}`"
+        selects.append(f"COUNTIF({column} IS NULL) AS c{index}_nulls")
+        if column_type in _NUMERIC_TYPES or column_type in _TEMPORAL_TYPES:
+            selects.append(f"CAST(MIN({column}) AS STRING) AS c{index}_min")
+            selects.append(f"CAST(MAX({column}) AS STRING) AS c{index}_max")
+        elif column_type == "STRING":
+            selects.append(f"APPROX_COUNT_DISTINCT({column}) AS c{index}_distinct")
+            selects.append(
+                f"APPROX_TOP_COUNT({column}, {SCHEMA_CATALOG_MAX_ENUM_VALUES}) AS c{index}_top"
+            )
+        profiled.append((index, name, column_type))
+    row = list(client.query(f"SELECT {', '.join(selects)} FROM {_dataset_path(table)}").result())[0]
+
+    total = int(row["row_total"] or 0)
+    stats: Dict[str, Dict[str, Any]] = {}
+    for index, name, column_type in profiled:
+        column_stats: Dict[str, Any] = {
+            "null_rate": round(int(row[f"c{index}_nulls"]) / total, 3) if total else 0.0
+        }
+        if column_type == "STRING":
+            distinct = int(row[f"c{index}_distinct"] or 0)
+            if 0 < distinct <= SCHEMA_CATALOG_MAX_ENUM_VALUES:
+                column_stats["values"] = [
+                    entry["value"] for entry in row[f"c{index}_top"] if entry["value"] is not None
+                ]
+        elif f"c{index}_min" in row.keys():
+            column_stats["min"] = row[f"c{index}_min"]
+            column_stats["max"] = row[f"c{index}_max"]
+        stats[name] = column_stats
+    return stats
+
+def build_schema_catalog(client: bigquery.Client) -> Dict[str, Any]:
+    """Snapshot INFORMATION_SCHEMA plus cheap column statistics for the dataset."""
+    metadata = dataset_watermark(client)
+    columns: Dict[str, Dict[str, str]] = {}
+    for row in client.query(
+        f"SELECT table_name, column_name, data_type "
+        f"FROM {_dataset_path('INFORMATION_SCHEMA.COLUMNS')} "
+        f"ORDER BY table_name, ordinal_position"
+    ).result():
+        columns.setdefault(row["table_name"], {})[row["column_name"]] = row["data_type"]
+
+    tables: Dict[str, Any] = {}
+    for table, table_columns in columns.items():
+        try:
+            stats = _column_stats(client, table, table_columns)
+        except Exception as exc:  # pragma: no cover - logging path
+            print(f"[schema-catalog] Skipping statistics for {table}: {exc}")
+            stats = {}
+        tables[table] = {"columns": table_columns, "stats": stats}
+
+    return {
+        "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "watermark": metadata["watermark"],
+        "row_counts": metadata["row_counts"],
+        "tables": tables,
+    }
+
+def apply_schema_catalog(artifact: Dict[str, Any]) -> None:
+    """Swap a generated catalog into the live catalog and statistics."""
+    tables = artifact.get("tables") or {}
+    if not tables:
+        return
+    SCHEMA_CATALOG.clear()
+    SCHEMA_CATALOG.update({table: dict(entry["columns"]) for table, entry in tables.items()})
+    COLUMN_STATS.clear()
+    COLUMN_STATS.update({table: entry.get("stats", {}) for table, entry in tables.items()})
+    _catalog_state.update(
+        generated_at=artifact.get("generated_at"),
+        watermark=artifact.get("watermark"),
+        row_counts=artifact.get("row_counts") or {},
+        source="generated",
+    )
+
+def load_schema_catalog(path: str = SCHEMA_CATALOG_PATH) -> bool:
+    """Apply the cached catalog artifact if one exists."""
+    artifact = _read_artifact(path)
+    if artifact is None:
+        return False
+    apply_schema_catalog(artifact)
+    return True
+
+def _read_artifact(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except Exception as exc:  # pragma: no cover - logging path
+        print(f"[schema-catalog] Could not read {path}: {exc}")
+        return None
+
+def _write_artifact(artifact: Dict[str, Any], path: str) -> None:
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=os.path.dirname(path) or ".", suffix=".tmp", delete=False
+    ) as handle:
+        json.dump(artifact, handle, indent=2, default=str)
+    os.replace(handle.name, path)
+
+def _rebuild_artifact(
+    client: bigquery.Client, watermark: Optional[str], force: bool, path: str
+) -> Dict[str, Any]:
+    """Build and write the artifact, holding a file lock so that one worker
+    profiles the dataset while the others wait and then reuse its result."""
+    with open(f"{path}.lock", "w") as lock_handle:
+        fcntl.flock(lock_handle, fcntl.LOCK_EX)
+        # Another worker may have rebuilt for this sync while we waited
+        existing = _read_artifact(path)
+        if not force and existing and existing.get("tables") and existing.get("watermark") == watermark:
+            return existing
+        artifact = build_schema_catalog(client)
+        _write_artifact(artifact, path)
+        print(f"[schema-catalog] Rebuilt catalog for {len(artifact['tables'])} tables")
+        return artifact
+
+async def refresh_schema_catalog(
+    client: Optional[bigquery.Client], force: bool = False, path: str = SCHEMA_CATALOG_PATH
+) -> Dict[str, Any]:
+    """Rebuild the catalog when the dataset has changed since the last build.
+
+    The dataset watermark (latest table modification) moves on every sync, so a
+    cheap `__TABLES__` read decides whether the full rebuild is needed.
+    """
+    if client is None:
+        return schema_catalog_status()
+    loop = asyncio.get_running_loop()
+    watermark = None
+    if not force:
+        metadata = await loop.run_in_executor(None, dataset_watermark, client)
+        watermark = metadata["watermark"]
+        if watermark == _catalog_state.get("watermark"):
+            return schema_catalog_status()
+    artifact = await loop.run_in_executor(None, _rebuild_artifact, client, watermark, force, path)
+    apply_schema_catalog(artifact)
+    return schema_catalog_status()
+
+async def keep_schema_catalog_fresh(client: Optional[bigquery.Client]) -> None:
+    """Background loop: refresh the catalog whenever a sync lands."""
+    while True:
+        try:
+            await refresh_schema_catalog(client)
+        except Exception as exc:  # pragma: no cover - logging path
+            print(f"[schema-catalog] Refresh failed: {exc}")
+        await asyncio.sleep(SCHEMA_CATALOG_CHECK_SECONDS)
+
+def schema_catalog_status() -> Dict[str, Any]:
+    return {
+        "source": _catalog_state["source"],
+        "generated_at": _catalog_state["generated_at"],
+        "watermark": _catalog_state["watermark"],
+        "tables": {table: len(columns) for table, columns in SCHEMA_CATALOG.items()},
+    }
+
+load_schema_catalog()
@@ -0,0 +1,218 @@
+# sub_agents/sql_cache.py
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SQL_CACHE_MAX_ENTRIES = int(os.getenv("SQL_CACHE_MAX_ENTRIES", "256"))
+SQL_CACHE_MAX_BYTES = int(os.getenv("SQL_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+SQL_CACHE_TTL_SECONDS = float(os.getenv("SQL_CACHE_TTL_SECONDS", "3600"))
+SQL_CACHE_WATERMARK_CHECK_SECONDS = float(os.getenv("SQL_CACHE_WATERMARK_CHECK_SECONDS", "60"))
+
+_TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<comment>--[^\n]*|\#[^\n]*|/\*.*?\*/)
+    |(?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+    |(?P<quoted>`[^`]*`)
+    |(?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+    |(?P<word>[A-Za-z_@][A-Za-z0-9_.]*)
+    |(?P<space>\s+)
+    |(?P<symbol>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+# GoogleSQL reserved keywords; the only words whose case never matters
+_KEYWORDS = {
+    "all", "and", "any", "array", "as", "asc", "assert_rows_modified", "at", "between", "by",
+    "case", "cast", "collate", "contains", "create", "cross", "cube", "current", "default",
+    "define", "desc", "distinct", "else", "end", "enum", "escape", "except", "exclude", "exists",
+    "extract", "false", "fetch", "following", "for", "from", "full", "group", "grouping", "groups",
+    "hash", "having", "if", "ignore", "in", "inner", "intersect", "interval", "into", "is", "join",
+    "lateral", "left", "like", "limit", "lookup", "merge", "natural", "new", "no", "not", "null",
+    "nulls", "of", "on", "or", "order", "outer", "over", "partition", "preceding", "proto",
+    "qualify", "range", "recursive", "respect", "right", "rollup", "rows", "select", "set", "some",
+    "struct", "tablesample", "then", "to", "treat", "true", "unbounded", "union", "unnest", "using",
+    "when", "where", "window", "with", "within",
+}
+# Functions whose value changes between runs of the same query text
+_NON_DETERMINISTIC_FUNCTIONS = {
+    "current_date", "current_datetime", "current_time", "current_timestamp", "rand",
+    "generate_uuid", "session_user",
+}
+
+def tokenize_sql(query: str, lowercase_words: bool = True) -> List[Tuple[str, str]]:
+    """Split SQL into (kind, text) tokens, dropping comments and whitespace."""
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(query):
+        kind = match.lastgroup or "symbol"
+        if kind in ("comment", "space"):
+            continue
+        text = match.group()
+        if kind == "word" and lowercase_words:
+            text = text.lower()
+        tokens.append((kind, text))
+    return tokens
+
+def _sort_in_lists(tokens: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """Order literal-only `IN (...)` lists so equivalent predicates compare equal."""
+    result: List[Tuple[str, str]] = []
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        result.append(token)
+        if token == ("word", "in") and index + 1 < len(tokens) and tokens[index + 1] == ("symbol", "("):
+            end = index + 2
+            literals: List[Tuple[str, str]] = []
+            while end < len(tokens) and tokens[end][0] in ("string", "number"):
+                literals.append(tokens[end])
+                if end + 1 < len(tokens) and tokens[end + 1] == ("symbol", ","):
+                    end += 2
+                    continue
+                end += 1
+                break
+            if literals and end < len(tokens) and tokens[end] == ("symbol", ")"):
+                result.append(("symbol", "("))
+                for position, literal in enumerate(sorted(literals, key=lambda item: item[1])):
+                    if position:
+                        result.append(("symbol", ","))
+                    result.append(literal)
+                result.append(("symbol", ")"))
+                index = end + 1
+                continue
+        index += 1
+    return result
+
+def normalize_sql(query: str) -> str:
+    """Canonical form of a query: no comments, single spaces, lower-cased
+    keywords, sorted literal IN-lists and no trailing semicolon. Identifiers
+    keep their case: BigQuery table names are case-sensitive."""
+    tokens = [
+        (kind, text.lower() if kind == "word" and text.lower() in _KEYWORDS else text)
+        for kind, text in tokenize_sql(query, lowercase_words=False)
+    ]
+    tokens = _sort_in_lists(tokens)
+    while tokens and tokens[-1] == ("symbol", ";"):
+        tokens.pop()
+    return " ".join(text for _, text in tokens)
+
+def is_deterministic(query: str) -> bool:
+    """Whether re-running the query over unchanged tables returns the same rows."""
+    return not any(
+        kind == "word" and text in _NON_DETERMINISTIC_FUNCTIONS
+        for kind, text in tokenize_sql(query)
+    )
+
+class TableWatermarks:
+    """Last-modified times of BigQuery tables, looked up at most once per interval."""
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._known: Dict[str, Tuple[float, Optional[str]]] = {}
+
+    def get(self, table_ids: List[str], fetch: Callable[[str], Optional[str]]) -> Dict[str, Optional[str]]:
+        now = time.monotonic()
+        watermarks: Dict[str, Optional[str]] = {}
+        for table_id in table_ids:
+            with self._lock:
+                checked_at, watermark = self._known.get(table_id, (0.0, None))
+            if now - checked_at >= self.check_interval:
+                try:
+                    watermark = fetch(table_id)
+                except Exception as exc:  # pragma: no cover - logging path
+                    print(f"[sql-cache] Could not read watermark for {table_id}: {exc}")
+                    watermark = None
+                with self._lock:
+                    self._known[table_id] = (now, watermark)
+            watermarks[table_id] = watermark
+        return watermarks
+
+class SqlResultCache:
+    """LRU cache of query results keyed by normalized SQL.
+
+    Entries are bounded by count and approximate JSON size, expire after a TTL,
+    and are dropped as soon as any referenced table's last-modified watermark
+    moves (for example after a Fivetran sync).
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key: str, watermarks: Dict[str, Optional[str]]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            expired = time.time() - entry["stored_at"] > self.ttl_seconds
+            stale = entry["watermarks"] != watermarks
+            if expired or stale:
+                self._drop(key)
+                self._stats["invalidations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            entry["hits"] += 1
+            self._stats["hits"] += 1
+            return entry
+
+    def put(self, key: str, result: Dict[str, Any], watermarks: Dict[str, Optional[str]]) -> None:
+        size = len(json.dumps(result, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = {
+                "result": result,
+                "watermarks": watermarks,
+                "stored_at": time.time(),
+                "size": size,
+                "hits": 0,
+            }
+            self._bytes += size
+            self._stats["stores"] += 1
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._stats["evictions"] += 1
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry["size"]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                **self._stats,
+            }
+
+# Shared by every agent that reaches BigQuery through `execute_sql`
+sql_result_cache = SqlResultCache(
+    max_entries=SQL_CACHE_MAX_ENTRIES,
+    max_bytes=SQL_CACHE_MAX_BYTES,
+    ttl_seconds=SQL_CACHE_TTL_SECONDS,
+)
+table_watermarks = TableWatermarks(check_interval=SQL_CACHE_WATERMARK_CHECK_SECONDS)
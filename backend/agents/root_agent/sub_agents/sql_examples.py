@@ -0,0 +1,289 @@
+# sub_agents/sql_examples.py
+import asyncio
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.genai import types
+
+from ..run_tracking import AgentRun, current_run
+
+SQL_EXAMPLE_STORE_PATH = os.getenv(
+    "SQL_EXAMPLE_STORE_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "../../sql_examples.sqlite3")),
+)
+SQL_EXAMPLE_MAX = int(os.getenv("SQL_EXAMPLE_MAX", "500"))
+SQL_EXAMPLE_TOP_K = int(os.getenv("SQL_EXAMPLE_TOP_K", "3"))
+SQL_EXAMPLE_MIN_SCORE = float(os.getenv("SQL_EXAMPLE_MIN_SCORE", "0.25"))
+
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "give", "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "please", "show",
+    "tell", "that", "the", "this", "to", "us", "was", "we", "what", "which", "with", "you",
+}
+
+def normalize_question(text: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+def _terms(text: str) -> List[str]:
+    return [term for term in normalize_question(text).split() if term not in _STOPWORDS]
+
+def content_text(content: Optional[types.Content]) -> str:
+    if not content or not content.parts:
+        return ""
+    return " ".join(part.text for part in content.parts if getattr(part, "text", None))
+
+def request_text(context: Optional[ReadonlyContext]) -> str:
+    """The request an agent is answering.
+
+    Sub-agents see the delegated request; the root agent sees the whole chat
+    transcript, which is reduced to the user's latest message.
+    """
+    text = content_text(context.user_content) if context is not None else ""
+    run = current_run()
+    if run is not None and run.question and text.endswith(run.question):
+        return run.question
+    return text
+
+class SqlExampleStore:
+    """Verified (question, SQL, result shape) pairs, persisted in SQLite.
+
+    Pairs are harvested from agent runs that completed successfully, so every
+    stored query has executed against the live dataset at least once. Every
+    write goes to the database, so all API workers share one set of examples
+    instead of overwriting each other's copies; similarity search runs over an
+    in-memory copy that is refreshed when the database changes.
+    """
+
+    def __init__(self, path: str, max_examples: int):
+        self.path = path
+        self.max_examples = max_examples
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._corpus: Optional[_Corpus] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the store on first use; call with the lock held."""
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sql_examples (
+                    question_key TEXT PRIMARY KEY,
+                    question TEXT NOT NULL,
+                    sql TEXT NOT NULL,
+                    columns TEXT NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    verified_at REAL NOT NULL,
+                    uses INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    @staticmethod
+    def _example(row: tuple) -> Dict[str, Any]:
+        question, sql, columns, row_count, verified_at, uses = row
+        return {
+            "question": question,
+            "sql": sql,
+            "columns": json.loads(columns),
+            "row_count": row_count,
+            "verified_at": verified_at,
+            "uses": uses,
+        }
+
+    def add(self, question: str, sql: str, columns: List[str], row_count: int) -> None:
+        key = normalize_question(question)
+        if not key:
+            return
+        try:
+            with self._lock:
+                connection = self._connect()
+                with connection:
+                    # A changed query for the same question starts over at zero uses
+                    connection.execute(
+                        """
+                        INSERT INTO sql_examples VALUES (?, ?, ?, ?, ?, ?, 0)
+                        ON CONFLICT (question_key) DO UPDATE SET
+                          question = excluded.question,
+                          columns = excluded.columns,
+                          row_count = excluded.row_count,
+                          verified_at = excluded.verified_at,
+                          uses = CASE WHEN sql_examples.sql = excluded.sql THEN sql_examples.uses ELSE 0 END,
+                          sql = excluded.sql
+                        """,
+                        (key, question.strip(), sql.strip(), json.dumps(columns), row_count, time.time()),
+                    )
+                    connection.execute(
+                        """
+                        DELETE FROM sql_examples WHERE question_key IN (
+                            SELECT question_key FROM sql_examples
+                            ORDER BY uses DESC, verified_at DESC LIMIT -1 OFFSET ?
+                        )
+                        """,
+                        (self.max_examples,),
+                    )
+                self._corpus = None
+        except sqlite3.Error as exc:  # pragma: no cover - logging path
+            print(f"[sql-examples] Could not write {self.path}: {exc}")
+
+    def harvest(self, run: AgentRun) -> int:
+        """Store the query of each question answered by exactly one distinct
+        successful query during a completed run.
+
+        A request that needed several queries (several charts, or exploration
+        before the real query) has no single SQL that answers it, and replaying
+        one of them as an exact match would return a partial answer.
+        """
+        by_question: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for query in run.verified_queries:
+            by_question.setdefault(normalize_question(query["question"]), {})[query["sql"].strip()] = query
+        stored = 0
+        for queries in by_question.values():
+            if len(queries) != 1:
+                continue
+            query = next(iter(queries.values()))
+            self.add(query["question"], query["sql"], query["columns"], query["row_count"])
+            stored += 1
+        return stored
+
+    def exact(self, question: str) -> Optional[Dict[str, Any]]:
+        key = normalize_question(question)
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("UPDATE sql_examples SET uses = uses + 1 WHERE question_key = ?", (key,))
+                row = connection.execute(
+                    "SELECT question, sql, columns, row_count, verified_at, uses FROM sql_examples "
+                    "WHERE question_key = ?",
+                    (key,),
+                ).fetchone()
+        return self._example(row) if row else None
+
+    def examples(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._current_corpus().examples)
+
+    def _current_corpus(self) -> "_Corpus":
+        """The vectorised examples; call with the lock held.
+
+        The corpus is rebuilt only when this process wrote an example or
+        another worker committed to the database since it was last built.
+        """
+        connection = self._connect()
+        data_version = connection.execute("PRAGMA data_version").fetchone()[0]
+        if self._corpus is None or self._corpus.data_version != data_version:
+            rows = connection.execute(
+                "SELECT question, sql, columns, row_count, verified_at, uses FROM sql_examples"
+            ).fetchall()
+            self._corpus = _Corpus(data_version, [self._example(row) for row in rows])
+        return self._corpus
+
+    def similar(self, question: str, k: int = SQL_EXAMPLE_TOP_K) -> List[Dict[str, Any]]:
+        """Top-k examples by IDF-weighted cosine similarity of question terms."""
+        query_terms = Counter(_terms(question))
+        if not query_terms:
+            return []
+        with self._lock:
+            corpus = self._current_corpus()
+        query_weights = corpus.weights(query_terms)
+        query_norm = math.sqrt(sum(value * value for value in query_weights.values()))
+        if not query_norm:
+            return []
+        scored = []
+        for example, example_weights, norm in zip(corpus.examples, corpus.vectors, corpus.norms):
+            if not norm:
+                continue
+            dot = sum(value * example_weights.get(term, 0.0) for term, value in query_weights.items())
+            score = dot / (norm * query_norm)
+            if score >= SQL_EXAMPLE_MIN_SCORE:
+                scored.append((score, example))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [example for _, example in scored[:k]]
+
+class _Corpus:
+    """Stored examples with their question term weights precomputed."""
+
+    def __init__(self, data_version: int, examples: List[Dict[str, Any]]):
+        self.data_version = data_version
+        self.examples = examples
+        documents = [Counter(_terms(example["question"])) for example in examples]
+        self.document_frequency: Counter = Counter()
+        for terms in documents:
+            self.document_frequency.update(terms.keys())
+        self.vectors = [self.weights(terms) for terms in documents]
+        self.norms = [
+            math.sqrt(sum(value * value for value in vector.values())) for vector in self.vectors
+        ]
+
+    def weights(self, terms: Counter) -> Dict[str, float]:
+        total = len(self.examples)
+        return {
+            term: count * math.log(1 + total / (1 + self.document_frequency[term]))
+            for term, count in terms.items()
+        }
+
+def render_examples(question: str, examples: List[Dict[str, Any]]) -> str:
+    if not examples:
+        return ""
+    lines = ["Verified example queries (already executed successfully against this dataset):"]
+    normalized = normalize_question(question)
+    for example in examples:
+        if normalize_question(example["question"]) == normalized:
+            lines.append("- This exact request was answered before; run this SQL unchanged:")
+        lines.append(f"  Q: {example['question']}")
+        lines.append(f"  SQL: {example['sql']}")
+        lines.append(f"  Returns: {', '.join(example['columns'])} ({example['row_count']} rows)")
+    return "\n".join(lines)
+
+def note_verified_query(
+    context: Optional[ReadonlyContext], sql: str, columns: List[str], row_count: int
+) -> None:
+    """Queue a successful query for harvesting once the current run completes.
+
+    The question is whatever request the calling agent is answering: the user's
+    message for the root agent, the delegated request for a sub-agent.
+    """
+    run = current_run()
+    question = request_text(context)
+    if run is None or not question:
+        return
+    run.verified_queries.append(
+        {"question": question, "sql": sql, "columns": columns, "row_count": row_count}
+    )
+
+# Shared by every agent that writes SQL
+sql_example_store = SqlExampleStore(SQL_EXAMPLE_STORE_PATH, SQL_EXAMPLE_MAX)
+
+def with_sql_examples(
+    instruction: str, *sections: Callable[[], str]
+) -> Callable[[ReadonlyContext], Awaitable[str]]:
+    """Wrap a static instruction so it is followed by the current output of each
+    `sections` callable (e.g. the live schema catalog) and by the most similar
+    verified examples for the agent's current request.
+
+    The example lookup may read SQLite, so it runs off the event loop.
+    """
+
+    async def provider(context: ReadonlyContext) -> str:
+        parts = [instruction, *(section() for section in sections)]
+        question = request_text(context)
+        examples = await asyncio.to_thread(sql_example_store.similar, question) if question else []
+        rendered = render_examples(question, examples)
+        if rendered:
+            parts.append(rendered)
+        return "\n\n".join(part for part in parts if part)
+
+    return provider
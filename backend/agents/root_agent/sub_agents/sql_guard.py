@@ -0,0 +1,284 @@
+# sub_agents/sql_guard.py
+import os
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from .schema_catalog import (
+    DATASET_ID,
+    DYNAMIC_COLUMN_TABLES,
+    LARGE_TEXT_COLUMNS,
+    PROJECT_ID,
+    SCHEMA_CATALOG,
+)
+from .sql_cache import tokenize_sql
+
+# How much of a result set is handed back to the model
+SQL_GUARD_PREVIEW_ROWS = int(os.getenv("SQL_GUARD_PREVIEW_ROWS", "20"))
+SQL_GUARD_MAX_CELL_CHARS = int(os.getenv("SQL_GUARD_MAX_CELL_CHARS", "300"))
+
+_WRITE_KEYWORDS = {
+    "insert", "update", "delete", "merge", "create", "drop", "alter", "truncate",
+    "grant", "revoke",
+}
+_TABLE_KEYWORDS = {"from", "join"}
+# Functions whose arguments use FROM without naming a table
+_FROM_ARGUMENT_FUNCTIONS = {"extract", "trim", "substring"}
+# Words that can follow a table reference without being its alias
+_CLAUSE_KEYWORDS = {
+    "where", "join", "left", "right", "inner", "outer", "cross", "full", "on", "using",
+    "group", "order", "limit", "union", "intersect", "except", "qualify", "having",
+    "window", "tablesample", "for", "lateral",
+}
+# Words that end a FROM list at their parenthesis level
+_FROM_CLAUSE_END = {
+    "where", "group", "having", "qualify", "window", "order", "limit", "union",
+    "intersect", "except", "select",
+}
+
+Tokens = List[Tuple[str, str]]
+
+def _resolve_table(reference: str) -> Optional[str]:
+    """Map a table reference to a catalog table name, or None if it is foreign."""
+    parts = reference.strip("`").split(".")
+    if len(parts) == 3 and parts[:2] != [PROJECT_ID, DATASET_ID]:
+        return None
+    if len(parts) == 2 and parts[0].lower() != DATASET_ID:
+        return None
+    if len(parts) > 3:
+        return None
+    table = parts[-1].lower()
+    return table if table in SCHEMA_CATALOG else None
+
+def _statement_tokens(query: str) -> Tokens:
+    tokens = tokenize_sql(query)
+    while tokens and tokens[-1] == ("symbol", ";"):
+        tokens.pop()
+    return tokens
+
+def _table_references(tokens: Tokens) -> Tuple[Dict[str, str], Optional[str]]:
+    """Return {alias or table name: catalog table} for every FROM/JOIN target,
+    including comma-separated FROM items, or an error for a table outside the
+    catalog or a table function other than UNNEST."""
+    cte_names = {
+        tokens[index][1]
+        for index in range(len(tokens) - 2)
+        if tokens[index][0] == "word"
+        and tokens[index + 1] == ("word", "as")
+        and tokens[index + 2] == ("symbol", "(")
+    }
+    aliases: Dict[str, str] = {}
+    openers: List[str] = []
+    # One flag per parenthesis level: whether a comma there starts another FROM item
+    in_from: List[bool] = [False]
+    expect_item = False
+    for index, (kind, text) in enumerate(tokens):
+        if text == "(" and kind == "symbol":
+            # A parenthesised FROM item is a subquery; its own FROM is seen inside
+            expect_item = False
+            openers.append(tokens[index - 1][1] if index else "")
+            in_from.append(False)
+            continue
+        if text == ")" and kind == "symbol":
+            if openers:
+                openers.pop()
+                in_from.pop()
+            continue
+        if text == "," and kind == "symbol" and in_from[-1]:
+            expect_item = True
+            continue
+        if kind == "word" and text in _TABLE_KEYWORDS:
+            if openers and openers[-1] in _FROM_ARGUMENT_FUNCTIONS:
+                continue
+            in_from[-1] = True
+            expect_item = True
+            continue
+        if kind == "word" and text in _FROM_CLAUSE_END:
+            in_from[-1] = False
+        if not expect_item:
+            continue
+        expect_item = False
+        if kind not in ("word", "quoted"):
+            continue
+        if index + 1 < len(tokens) and tokens[index + 1] == ("symbol", "("):
+            if kind == "word" and text == "unnest":
+                continue
+            return aliases, (
+                f"Table function {text} is not allowed. Query `{PROJECT_ID}.{DATASET_ID}` tables directly."
+            )
+        if text in cte_names:
+            continue
+        table = _resolve_table(text)
+        if table is None:
+            known = ", ".join(sorted(SCHEMA_CATALOG))
+            return aliases, (
+                f"Unknown table {text}. Query `{PROJECT_ID}.{DATASET_ID}` tables only: {known}."
+            )
+        aliases[table] = table
+        alias_index = index + 1
+        if alias_index < len(tokens) and tokens[alias_index] == ("word", "as"):
+            alias_index += 1
+        if alias_index < len(tokens):
+            alias_kind, alias = tokens[alias_index]
+            if alias_kind == "word" and "." not in alias and alias not in _CLAUSE_KEYWORDS:
+                aliases[alias] = table
+    return aliases, None
+
+def referenced_table_ids(query: str) -> Optional[List[str]]:
+    """Fully-qualified ids of the catalog tables a query reads, resolved the
+    same way validation does; None when any reference cannot be resolved."""
+    aliases, error = _table_references(_statement_tokens(query))
+    if error:
+        return None
+    return sorted({f"{PROJECT_ID}.{DATASET_ID}.{table}" for table in aliases.values()})
+
+def _check_columns(tokens: Tokens, aliases: Dict[str, str]) -> Optional[str]:
+    """Reject `alias.column` references to columns the catalog does not have."""
+    for kind, text in tokens:
+        if kind != "word" or "." not in text:
+            continue
+        prefix, column = text.split(".", 1)
+        table = aliases.get(prefix)
+        if table is None or table in DYNAMIC_COLUMN_TABLES or not column:
+            continue
+        column = column.split(".", 1)[0]
+        if column not in SCHEMA_CATALOG[table]:
+            known = ", ".join(SCHEMA_CATALOG[table])
+            return f"Unknown column {text} on table {table}. Columns: {known}."
+    return None
+
+def _check_large_text(tokens: Tokens, aliases: Dict[str, str]) -> Optional[str]:
+    """Reject selecting large text/embedding columns, or `*` over their tables,
+    unless they are wrapped in a function such as LENGTH or SUBSTR."""
+    large = {
+        column: table
+        for table in set(aliases.values())
+        for column in LARGE_TEXT_COLUMNS.get(table, ())
+    }
+    if not large:
+        return None
+    # One frame per parenthesis level: what opened it and whether we are in a SELECT list
+    frames: List[Dict[str, Any]] = [{"opener": "", "in_select": False}]
+    previous = ""
+    for kind, text in tokens:
+        if kind == "symbol" and text == "(":
+            frames.append({"opener": previous, "in_select": False})
+        elif kind == "symbol" and text == ")":
+            if len(frames) > 1:
+                frames.pop()
+        elif kind == "word" and text == "select":
+            frames[-1]["in_select"] = True
+        elif kind == "word" and text == "from" and frames[-1]["opener"] not in _FROM_ARGUMENT_FUNCTIONS:
+            frames[-1]["in_select"] = False
+        elif frames[-1]["in_select"]:
+            column = text.rsplit(".", 1)[-1] if kind == "word" else ""
+            star = kind == "symbol" and text == "*" and (
+                previous in ("select", "distinct", ",") or previous.endswith(".")
+            )
+            if column in large or star:
+                name = column if column in large else "*"
+                tables = ", ".join(sorted(set(large.values())))
+                return (
+                    f"Selecting {name} would return large text from {tables}. List the columns you "
+                    "need, wrap text in SUBSTR/LENGTH, or set include_large_text=true if the full "
+                    "text was explicitly requested."
+                )
+        previous = text
+    return None
+
+def validate_sql(query: str, include_large_text: bool = False) -> Optional[str]:
+    """Return an error message if the query is not a single read-only SELECT
+    over catalog tables and columns, otherwise None."""
+    tokens = _statement_tokens(query)
+    if not tokens:
+        return "The query is empty."
+    if ("symbol", ";") in tokens:
+        return "Only a single statement is allowed."
+    if tokens[0][1] not in ("select", "with"):
+        return "Only SELECT queries (optionally starting with WITH) are allowed."
+    for kind, text in tokens:
+        if kind == "word" and text in _WRITE_KEYWORDS:
+            return f"Write or scripting keyword `{text.upper()}` is not allowed."
+
+    aliases, error = _table_references(tokens)
+    if error:
+        return error
+    error = _check_columns(tokens, aliases)
+    if error:
+        return error
+    if not include_large_text:
+        return _check_large_text(tokens, aliases)
+    return None
+
+def inject_limit(query: str, limit: Optional[int]) -> str:
+    """Append `LIMIT n` when the outermost query has no LIMIT of its own."""
+    if limit is None:
+        return query
+    depth = 0
+    for kind, text in _statement_tokens(query):
+        if kind == "symbol" and text == "(":
+            depth += 1
+        elif kind == "symbol" and text == ")":
+            depth -= 1
+        elif depth == 0 and kind == "word" and text == "limit":
+            return query
+    trimmed = query.rstrip()
+    while trimmed.endswith(";"):
+        trimmed = trimmed[:-1].rstrip()
+    return f"{trimmed}\nLIMIT {limit}"
+
+def prepare_query(
+    query: str, max_rows: Optional[int], include_large_text: bool = False
+) -> Tuple[Optional[str], Optional[str]]:
+    """Validate a query locally and bound it; returns (query to run, error)."""
+    error = validate_sql(query, include_large_text=include_large_text)
+    if error:
+        return None, error
+    return inject_limit(query, max_rows), None
+
+def _summarize_column(values: List[Any]) -> Dict[str, Any]:
+    present = [value for value in values if value is not None]
+    summary: Dict[str, Any] = {"nulls": len(values) - len(present)}
+    numbers = [
+        value for value in present if isinstance(value, (int, float)) and not isinstance(value, bool)
+    ]
+    if numbers and len(numbers) == len(present):
+        summary.update(
+            min=min(numbers), max=max(numbers), mean=round(sum(numbers) / len(numbers), 4)
+        )
+    elif present:
+        counts = Counter(str(value)[:80] for value in present)
+        summary["distinct"] = len(counts)
+        summary["top_values"] = [value for value, _ in counts.most_common(5)]
+    return summary
+
+def shape_rows(
+    columns: List[str],
+    rows: List[Dict[str, Any]],
+    preview_rows: int = SQL_GUARD_PREVIEW_ROWS,
+    max_cell_chars: int = SQL_GUARD_MAX_CELL_CHARS,
+) -> Dict[str, Any]:
+    """Trim a result set before it reaches the model.
+
+    Long strings are cut to `max_cell_chars`. Past `preview_rows` only the
+    first rows are kept, alongside per-column statistics over all rows.
+    """
+    truncated_cells = 0
+    shaped: List[Dict[str, Any]] = []
+    for row in rows[:preview_rows]:
+        trimmed = {}
+        for key, value in row.items():
+            if isinstance(value, str) and len(value) > max_cell_chars:
+                value = value[:max_cell_chars] + "…"
+                truncated_cells += 1
+            trimmed[key] = value
+        shaped.append(trimmed)
+
+    result: Dict[str, Any] = {"rows": shaped}
+    if truncated_cells:
+        result["truncated_cells"] = truncated_cells
+    if len(rows) > preview_rows:
+        result["rows_omitted"] = len(rows) - preview_rows
+        result["column_summary"] = {
+            column: _summarize_column([row.get(column) for row in rows]) for column in columns
+        }
+    return result
@@ -0,0 +1,620 @@
+# sub_agents/vector_index.py
+import asyncio
+import datetime
+import fcntl
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from google.cloud import bigquery
+
+from .bm25_index import Bm25Index, write_bm25
+from .quantization import (
+    QUANTIZATION_MODES,
+    binarize,
+    binary_scores,
+    bytes_per_vector,
+    int8_scores,
+    quantize_int8,
+)
+from .schema_catalog import DATASET_ID, PROJECT_ID
+
+EMBEDDINGS_TABLE = f"{PROJECT_ID}.{DATASET_ID}.document_embeddings"
+# Tables whose changes alter the mirrored chunks or their metadata
+_SOURCE_TABLES = (
+    EMBEDDINGS_TABLE,
+    f"{PROJECT_ID}.{DATASET_ID}.envelopes",
+    f"{PROJECT_ID}.{DATASET_ID}.documents",
+)
+
+# On-disk index, memory-mapped by every worker process
+VECTOR_INDEX_DIR = os.getenv(
+    "VECTOR_INDEX_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "../../vector_index")),
+)
+VECTOR_INDEX_CHECK_SECONDS = float(os.getenv("VECTOR_INDEX_CHECK_SECONDS", "300"))
+# Lists probed per query by default; more probes trade latency for recall
+VECTOR_INDEX_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE", "8"))
+# Retrain the coarse quantizer once the corpus has grown this much since training
+VECTOR_INDEX_RETRAIN_GROWTH = float(os.getenv("VECTOR_INDEX_RETRAIN_GROWTH", "2.0"))
+# Filters matching at most this many chunks are searched exactly instead of via lists
+VECTOR_INDEX_EXACT_FILTER_ROWS = int(os.getenv("VECTOR_INDEX_EXACT_FILTER_ROWS", "20000"))
+# Representation scanned by searches: "none" (float32), "int8" (per-vector
+# scale) or "binary" (sign bits, Hamming distance). Quantized indexes keep the
+# float32 vectors memory-mapped and only page in the candidates they rescore.
+VECTOR_INDEX_QUANTIZATION = os.getenv("VECTOR_INDEX_QUANTIZATION", "none").lower()
+# Candidates rescored at full precision per requested result
+VECTOR_INDEX_RESCORE = int(os.getenv("VECTOR_INDEX_RESCORE", "8"))
+VECTOR_INDEX_KMEANS_ITERATIONS = 12
+VECTOR_INDEX_KMEANS_SAMPLE = 50_000
+_FETCH_BATCH = 5_000
+_KEY_SCHEME = "chunk"
+
+# Chunk metadata mirrored next to the vectors so filters run before scoring.
+# String fields are stored as codes into a per-version vocabulary.
+CATEGORICAL_FIELDS = ("envelope_id", "document_id", "document_name", "document_type", "envelope_status")
+_MISSING_CODE = -1
+_MISSING_TIME = np.iinfo(np.int64).min
+
+def is_calendar_date(value: Any) -> bool:
+    """Whether a created_* filter value is a bare date such as "2025-06-30".
+
+    A date-only `created_before` covers that whole day, so it is compared
+    with `<` against midnight of the next day rather than `<=` midnight.
+    """
+    return bool(re.fullmatch(r"\d{4}-\d{2}-\d{2}", str(value).strip()))
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+def train_centroids(vectors: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means over (a sample of) unit vectors."""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > VECTOR_INDEX_KMEANS_SAMPLE:
+        vectors = vectors[rng.choice(len(vectors), VECTOR_INDEX_KMEANS_SAMPLE, replace=False)]
+    nlist = max(1, min(nlist, len(vectors)))
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(VECTOR_INDEX_KMEANS_ITERATIONS):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for list_id in range(nlist):
+            members = vectors[assignment == list_id]
+            if len(members):
+                centroids[list_id] = members.sum(axis=0)
+        centroids = _normalize(centroids)
+    return centroids
+
+def default_nlist(count: int) -> int:
+    return max(1, int(np.sqrt(count)))
+
+class IvfIndex:
+    """Inverted-file index over unit-normalized chunk embeddings.
+
+    Vectors are stored grouped by their nearest centroid, so probing a list is
+    one contiguous slice of the memory-mapped matrix. Chunk text lives in a
+    single UTF-8 blob addressed by offsets, also memory-mapped. Quantized
+    versions scan int8 or binary codes and rescore the best candidates against
+    the float32 vectors.
+    """
+
+    FILES = ("centroids", "list_offsets", "vectors", "keys", "text_offsets", "chunk_ids", "created")
+
+    def __init__(self, path: str, meta: Dict[str, Any]):
+        self.path = path
+        self.meta = meta
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in self.FILES
+        }
+        self.centroids = np.asarray(arrays["centroids"])
+        self.list_offsets = np.asarray(arrays["list_offsets"])
+        self.vectors = arrays["vectors"]
+        self.keys = arrays["keys"]
+        self.text_offsets = arrays["text_offsets"]
+        self.chunk_ids = arrays["chunk_ids"]
+        self.created = arrays["created"]
+        self.quantization = meta.get("quantization", "none")
+        if self.quantization == "int8":
+            self.int8_codes = np.load(os.path.join(path, "vectors_int8.npy"), mmap_mode="r")
+            self.int8_scales = np.load(os.path.join(path, "vector_scales.npy"), mmap_mode="r")
+        elif self.quantization == "binary":
+            self.binary_codes = np.load(os.path.join(path, "vectors_binary.npy"), mmap_mode="r")
+        self.codes = {
+            field: np.load(os.path.join(path, f"meta_{field}.npy"), mmap_mode="r")
+            for field in CATEGORICAL_FIELDS
+        }
+        with open(os.path.join(path, "vocabulary.json"), "r", encoding="utf-8") as handle:
+            self.vocabulary: Dict[str, List[str]] = json.load(handle)
+        self._lookup = {
+            field: {value.lower(): code for code, value in enumerate(values)}
+            for field, values in self.vocabulary.items()
+        }
+        self.bm25 = Bm25Index(path)
+        text_path = os.path.join(path, "text.bin")
+        self.text = (
+            np.memmap(text_path, dtype=np.uint8, mode="r")
+            if os.path.getsize(text_path)
+            else np.zeros(0, dtype=np.uint8)
+        )
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def content(self, row: int) -> str:
+        start, end = int(self.text_offsets[row]), int(self.text_offsets[row + 1])
+        return bytes(self.text[start:end]).decode("utf-8")
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        described: Dict[str, Any] = {}
+        for field in CATEGORICAL_FIELDS:
+            code = int(self.codes[field][row])
+            described[field] = self.vocabulary[field][code] if code != _MISSING_CODE else None
+        chunk_id = int(self.chunk_ids[row])
+        described["chunk_id"] = chunk_id if chunk_id >= 0 else None
+        created = int(self.created[row])
+        described["created_timestamp"] = (
+            datetime.datetime.fromtimestamp(created, datetime.timezone.utc).isoformat()
+            if created != _MISSING_TIME
+            else None
+        )
+        return described
+
+    def filter_mask(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Boolean row mask for metadata filters, or None when nothing is filtered.
+
+        Categorical filters take a value or a list of values (case-insensitive);
+        `created_after` / `created_before` take ISO dates or timestamps; a
+        date-only `created_before` includes the whole day.
+        """
+        if not filters:
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        for field, wanted in filters.items():
+            if wanted in (None, "", []):
+                continue
+            if field in ("created_after", "created_before"):
+                moment = datetime.datetime.fromisoformat(str(wanted).strip())
+                if moment.tzinfo is None:
+                    moment = moment.replace(tzinfo=datetime.timezone.utc)
+                created = np.asarray(self.created)
+                if field == "created_after":
+                    in_range = created >= int(moment.timestamp())
+                elif is_calendar_date(wanted):
+                    in_range = created < int((moment + datetime.timedelta(days=1)).timestamp())
+                else:
+                    in_range = created <= int(moment.timestamp())
+                mask &= (created != _MISSING_TIME) & in_range
+                continue
+            if field not in CATEGORICAL_FIELDS:
+                raise ValueError(f"Unknown filter {field}")
+            values = wanted if isinstance(wanted, list) else [wanted]
+            codes = [self._lookup[field].get(str(value).lower()) for value in values]
+            mask &= np.isin(np.asarray(self.codes[field]), [code for code in codes if code is not None])
+        return mask
+
+    def _scores(self, rows: Any, query: np.ndarray) -> np.ndarray:
+        """Scores from the scanned representation; `rows` is a slice or row array."""
+        if self.quantization == "int8":
+            return int8_scores(self.int8_codes[rows], self.int8_scales[rows], query)
+        if self.quantization == "binary":
+            return binary_scores(self.binary_codes[rows], query)
+        return np.asarray(self.vectors[rows]) @ query
+
+    def _rescore(
+        self, rows: np.ndarray, scores: np.ndarray, query: np.ndarray, k: int
+    ) -> tuple:
+        """Exact cosine scores for the best `k * VECTOR_INDEX_RESCORE` candidates."""
+        keep = min(len(rows), k * max(1, VECTOR_INDEX_RESCORE))
+        if keep < len(rows):
+            rows = rows[np.argpartition(-scores, keep - 1)[:keep]]
+        rows = np.sort(rows)
+        return rows, np.asarray(self.vectors[rows]) @ query
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        mask: Optional[np.ndarray] = None,
+    ) -> List[Dict[str, Any]]:
+        """Top-k rows by cosine distance; `nprobe` >= nlist scans everything.
+
+        With a `mask`, only matching rows are scored; selective masks are
+        searched exactly.
+        """
+        if not len(self):
+            return []
+        query = _normalize(np.asarray(query, dtype=np.float32))
+        if mask is not None and int(mask.sum()) <= VECTOR_INDEX_EXACT_FILTER_ROWS:
+            all_rows = np.nonzero(mask)[0]
+            if not len(all_rows):
+                return []
+            all_scores = self._scores(all_rows, query)
+        else:
+            nprobe = max(1, min(nprobe or VECTOR_INDEX_NPROBE, self.nlist))
+            if nprobe >= self.nlist:
+                probed = np.arange(self.nlist)
+            else:
+                probed = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+
+            rows: List[np.ndarray] = []
+            scores: List[np.ndarray] = []
+            for list_id in probed:
+                start, end = int(self.list_offsets[list_id]), int(self.list_offsets[list_id + 1])
+                if start == end:
+                    continue
+                list_rows = np.arange(start, end)
+                list_scores = self._scores(slice(start, end), query)
+                if mask is not None:
+                    keep = mask[start:end]
+                    list_rows, list_scores = list_rows[keep], list_scores[keep]
+                rows.append(list_rows)
+                scores.append(list_scores)
+            if not rows:
+                return []
+            all_rows = np.concatenate(rows)
+            all_scores = np.concatenate(scores)
+            if not len(all_rows):
+                return []
+        if self.quantization != "none":
+            all_rows, all_scores = self._rescore(all_rows, all_scores, query, k)
+        top = min(k, len(all_rows))
+        best = np.argpartition(-all_scores, top - 1)[:top]
+        best = best[np.argsort(-all_scores[best])]
+        return [
+            {
+                "row": int(all_rows[index]),
+                "key": int(self.keys[all_rows[index]]),
+                "content": self.content(int(all_rows[index])),
+                "distance": float(1.0 - all_scores[index]),
+            }
+            for index in best
+        ]
+
+def write_index(
+    directory: str,
+    keys: np.ndarray,
+    vectors: np.ndarray,
+    contents: List[str],
+    metadata: List[Dict[str, Any]],
+    centroids: np.ndarray,
+    meta: Dict[str, Any],
+    quantization: str = VECTOR_INDEX_QUANTIZATION,
+) -> str:
+    """Write a new index version next to the current one and make it current."""
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization {quantization}")
+    version = f"v{int(time.time() * 1000)}"
+    path = os.path.join(directory, version)
+    os.makedirs(path, exist_ok=True)
+
+    assignment = (
+        np.argmax(vectors @ centroids.T, axis=1) if len(vectors) else np.zeros(0, dtype=np.int64)
+    )
+    order = np.argsort(assignment, kind="stable")
+    counts = np.bincount(assignment, minlength=len(centroids))
+    list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    encoded = [contents[index].encode("utf-8") for index in order]
+    text_offsets = np.concatenate([[0], np.cumsum([len(item) for item in encoded])]).astype(np.int64)
+    with open(os.path.join(path, "text.bin"), "wb") as handle:
+        handle.write(b"".join(encoded))
+    np.save(os.path.join(path, "centroids.npy"), centroids.astype(np.float32))
+    np.save(os.path.join(path, "list_offsets.npy"), list_offsets)
+    ordered_vectors = vectors[order].astype(np.float32)
+    np.save(os.path.join(path, "vectors.npy"), ordered_vectors)
+    if quantization == "int8":
+        codes, scales = quantize_int8(ordered_vectors)
+        np.save(os.path.join(path, "vectors_int8.npy"), codes)
+        np.save(os.path.join(path, "vector_scales.npy"), scales)
+    elif quantization == "binary":
+        np.save(os.path.join(path, "vectors_binary.npy"), binarize(ordered_vectors))
+    np.save(os.path.join(path, "keys.npy"), keys[order].astype(np.int64))
+    np.save(os.path.join(path, "text_offsets.npy"), text_offsets)
+
+    ordered = [metadata[index] for index in order]
+
+    def column(field: str, convert: Any, missing: int, dtype: Any) -> np.ndarray:
+        return np.asarray(
+            [convert(item[field]) if item.get(field) is not None else missing for item in ordered],
+            dtype=dtype,
+        )
+
+    vocabulary: Dict[str, List[str]] = {}
+    for field in CATEGORICAL_FIELDS:
+        values = sorted({str(item[field]) for item in ordered if item.get(field) is not None})
+        codes = {value: code for code, value in enumerate(values)}
+        vocabulary[field] = values
+        np.save(
+            os.path.join(path, f"meta_{field}.npy"),
+            column(field, lambda value: codes[str(value)], _MISSING_CODE, np.int32),
+        )
+    with open(os.path.join(path, "vocabulary.json"), "w", encoding="utf-8") as handle:
+        json.dump(vocabulary, handle)
+    np.save(os.path.join(path, "chunk_ids.npy"), column("chunk_id", int, -1, np.int64))
+    np.save(os.path.join(path, "created.npy"), column("created", int, _MISSING_TIME, np.int64))
+    write_bm25(path, [contents[index] for index in order])
+
+    meta = {
+        **meta,
+        "version": version,
+        "count": int(len(keys)),
+        "nlist": int(len(centroids)),
+        "quantization": quantization,
+    }
+    temp_path = os.path.join(directory, "current.json.tmp")
+    with open(temp_path, "w", encoding="utf-8") as handle:
+        json.dump(meta, handle, indent=2)
+    os.replace(temp_path, os.path.join(directory, "current.json"))
+    return version
+
+def _remove_stale_versions(directory: str, keep: str) -> None:
+    # Open memory maps stay valid after their files are unlinked
+    for name in os.listdir(directory):
+        if name.startswith("v") and name != keep:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+class VectorIndexMirror:
+    """Local IVF mirror of `document_embeddings`, refreshed incrementally.
+
+    Chunks are keyed by their (envelope, document, chunk) ids, falling back to
+    FARM_FINGERPRINT(content) for tables without them. A refresh only downloads
+    embeddings for keys the mirror lacks and drops keys that disappeared; the
+    centroids are reused until the corpus has grown enough to retrain them.
+    Chunk metadata (ids, document and envelope attributes) is re-read on every
+    refresh because envelope status changes without touching the chunks.
+    One process builds at a time (file lock); the others pick up the new
+    version from `current.json`.
+    """
+
+    def __init__(self, directory: str = VECTOR_INDEX_DIR):
+        self.directory = directory
+        self._index: Optional[IvfIndex] = None
+        self._lock = threading.Lock()
+
+    def _read_meta(self) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self.directory, "current.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as handle:
+            return json.load(handle)
+
+    def load(self) -> Optional[IvfIndex]:
+        """Open the current on-disk version if it differs from the loaded one."""
+        with self._lock:
+            meta = self._read_meta()
+            if meta is None:
+                return self._index
+            if self._index is None or self._index.meta.get("version") != meta["version"]:
+                try:
+                    self._index = IvfIndex(os.path.join(self.directory, meta["version"]), meta)
+                except Exception as exc:  # pragma: no cover - logging path
+                    print(f"[vector-index] Could not open {meta['version']}: {exc}")
+            return self._index
+
+    @property
+    def index(self) -> Optional[IvfIndex]:
+        return self._index if self._index is not None else self.load()
+
+    def search(
+        self, query: np.ndarray, k: int = 5, nprobe: Optional[int] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Search the mirror, or return None when there is no index to search."""
+        index = self.index
+        if index is None or not len(index):
+            return None
+        return index.search(query, k=k, nprobe=nprobe)
+
+    @staticmethod
+    def _chunk_key_sql(columns: set) -> str:
+        """One key per (envelope, document, chunk), so a chunk shared by many
+        documents (template boilerplate) keeps a row, and metadata, for each."""
+        if {"envelope_id", "document_id", "chunk_id"} <= columns:
+            return "FARM_FINGERPRINT(FORMAT('%t/%t/%t', envelope_id, document_id, chunk_id))"
+        return "FARM_FINGERPRINT(content)"
+
+    def _fetch_rows(
+        self, client: bigquery.Client, keys: List[int], key_sql: str
+    ) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        for start in range(0, len(keys), _FETCH_BATCH):
+            job_config = bigquery.QueryJobConfig(
+                query_parameters=[
+                    bigquery.ArrayQueryParameter("keys", "INT64", keys[start:start + _FETCH_BATCH])
+                ]
+            )
+            rows.extend(
+                dict(row.items())
+                for row in client.query(
+                    f"""
+                    SELECT ANY_VALUE(content) AS content, ANY_VALUE(embedding) AS embedding,
+                           {key_sql} AS key
+                    FROM `{EMBEDDINGS_TABLE}`
+                    WHERE {key_sql} IN UNNEST(@keys)
+                    GROUP BY key
+                    """,
+                    job_config=job_config,
+                ).result()
+            )
+        return rows
+
+    def _fetch_metadata(
+        self, client: bigquery.Client, columns: set, key_sql: str
+    ) -> Dict[int, Dict[str, Any]]:
+        def chunk_column(name: str, column_type: str) -> str:
+            return f"ANY_VALUE({name})" if name in columns else f"CAST(NULL AS {column_type})"
+
+        sql = f"""
+        WITH chunks AS (
+          SELECT
+            {key_sql} AS key,
+            {chunk_column("envelope_id", "STRING")} AS envelope_id,
+            {chunk_column("document_id", "STRING")} AS document_id,
+            {chunk_column("chunk_id", "INT64")} AS chunk_id
+          FROM `{EMBEDDINGS_TABLE}`
+          WHERE content IS NOT NULL AND ARRAY_LENGTH(embedding) > 0
+          GROUP BY key
+        ),
+        documents AS (
+          SELECT envelope_id, document_id, ANY_VALUE(name) AS name, ANY_VALUE(type) AS type
+          FROM `{PROJECT_ID}.{DATASET_ID}.documents`
+          GROUP BY envelope_id, document_id
+        )
+        SELECT
+          C.key, C.envelope_id, C.document_id, C.chunk_id,
+          D.name AS document_name,
+          D.type AS document_type,
+          E.status AS envelope_status,
+          UNIX_SECONDS(E.created_timestamp) AS created
+        FROM chunks AS C
+        LEFT JOIN `{PROJECT_ID}.{DATASET_ID}.envelopes` AS E USING (envelope_id)
+        LEFT JOIN documents AS D USING (envelope_id, document_id)
+        """
+        return {int(row["key"]): dict(row.items()) for row in client.query(sql).result()}
+
+    @staticmethod
+    def _up_to_date(current: Optional[IvfIndex], watermark: Optional[str]) -> bool:
+        # A changed VECTOR_INDEX_QUANTIZATION rewrites the index without retraining;
+        # an index keyed by content alone is rebuilt with per-chunk keys
+        return (
+            current is not None
+            and current.meta.get("watermark") == watermark
+            and current.quantization == VECTOR_INDEX_QUANTIZATION
+            and current.meta.get("key_scheme") == _KEY_SCHEME
+        )
+
+    def sync(self, client: bigquery.Client, force: bool = False) -> Dict[str, Any]:
+        """Bring the on-disk index up to date with the table (blocking)."""
+        modified = [client.get_table(table).modified for table in _SOURCE_TABLES]
+        watermark = max((value for value in modified if value), default=None)
+        watermark = watermark.isoformat() if watermark else None
+        current = self.load()
+        if not force and self._up_to_date(current, watermark):
+            return self.status()
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "w") as lock_handle:
+            fcntl.flock(lock_handle, fcntl.LOCK_EX)
+            # Another worker may have finished the same build while we waited
+            current = self.load()
+            if not force and self._up_to_date(current, watermark):
+                return self.status()
+
+            columns = {field.name for field in client.get_table(EMBEDDINGS_TABLE).schema}
+            key_sql = self._chunk_key_sql(columns)
+            remote = self._fetch_metadata(client, columns, key_sql)
+            remote_keys = set(remote)
+            local_keys = np.asarray(current.keys) if current is not None else np.zeros(0, dtype=np.int64)
+            keep_mask = np.isin(local_keys, np.fromiter(remote_keys, dtype=np.int64))
+            missing = sorted(remote_keys - set(int(key) for key in local_keys))
+            fetched = self._fetch_rows(client, missing, key_sql) if missing else []
+            if current is None and not fetched:
+                # Nothing embedded yet, so there is nothing to build
+                return self.status()
+
+            kept_rows = np.nonzero(keep_mask)[0]
+            keys = np.concatenate(
+                [local_keys[kept_rows], np.asarray([row["key"] for row in fetched], dtype=np.int64)]
+            )
+            contents = [current.content(int(row)) for row in kept_rows] if current is not None else []
+            contents += [row["content"] for row in fetched]
+            metadata = [remote[int(key)] for key in keys]
+            if len(kept_rows) or not fetched:
+                dimension = current.vectors.shape[1]
+            else:
+                dimension = len(fetched[0]["embedding"])
+            new_vectors = (
+                _normalize(np.asarray([row["embedding"] for row in fetched], dtype=np.float32))
+                if fetched
+                else np.zeros((0, dimension), dtype=np.float32)
+            )
+            kept_vectors = (
+                np.asarray(current.vectors[kept_rows])
+                if len(kept_rows)
+                else np.zeros((0, dimension), dtype=np.float32)
+            )
+            vectors = np.concatenate([kept_vectors, new_vectors])
+
+            trained_on = current.meta.get("trained_on", 0) if current is not None else 0
+            reuse_centroids = (
+                current is not None
+                and current.nlist
+                and current.centroids.shape[1] == dimension
+                and len(keys) < trained_on * VECTOR_INDEX_RETRAIN_GROWTH
+            )
+            if reuse_centroids and not force:
+                centroids = np.asarray(current.centroids)
+            elif len(vectors):
+                centroids = train_centroids(vectors, default_nlist(len(vectors)))
+                trained_on = len(vectors)
+            else:
+                centroids = np.zeros((0, 0), dtype=np.float32)
+
+            version = write_index(
+                self.directory,
+                keys,
+                vectors,
+                contents,
+                metadata,
+                centroids,
+                {
+                    "watermark": watermark,
+                    "key_scheme": _KEY_SCHEME,
+                    "trained_on": int(trained_on),
+                    "built_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                    "added": len(fetched),
+                    "removed": int(len(local_keys) - len(kept_rows)),
+                },
+            )
+            self.load()
+            _remove_stale_versions(self.directory, version)
+        print(
+            f"[vector-index] Built {version}: {len(keys)} chunks "
+            f"(+{len(fetched)}, -{int(len(local_keys) - len(kept_rows))})"
+        )
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        index = self.index
+        if index is None:
+            return {"loaded": False, "directory": self.directory}
+        return {
+            "loaded": True,
+            "directory": self.directory,
+            **{
+                key: index.meta.get(key)
+                for key in ("version", "count", "nlist", "watermark", "built_at", "added", "removed")
+            },
+            "quantization": index.quantization,
+            "scanned_bytes": int(
+                len(index) * bytes_per_vector(int(index.vectors.shape[1]), index.quantization)
+            ),
+            "default_nprobe": VECTOR_INDEX_NPROBE,
+        }
+
+# Shared by the retrieval tool and the API's refresh loop
+vector_index = VectorIndexMirror()
+
+async def refresh_vector_index(client: Optional[bigquery.Client], force: bool = False) -> Dict[str, Any]:
+    if client is None:
+        return vector_index.status()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, lambda: vector_index.sync(client, force=force))
+
+async def keep_vector_index_fresh(client: Optional[bigquery.Client]) -> None:
+    """Background loop: mirror new embeddings whenever the table changes."""
+    while True:
+        try:
+            await refresh_vector_index(client)
+        except Exception as exc:  # pragma: no cover - logging path
+            print(f"[vector-index] Refresh failed: {exc}")
+        await asyncio.sleep(VECTOR_INDEX_CHECK_SECONDS)
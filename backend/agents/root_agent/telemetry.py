@@ -0,0 +1,26 @@
+from typing import Any, Optional
+
+from opentelemetry import trace
+
+# ADK already emits invoke_agent / call_llm / execute_tool spans; these helpers
+# add the BigQuery job spans that sit underneath the tool calls.
+tracer = trace.get_tracer("docusign.agents")
+
+def annotate_bigquery_job(span: Any, job: Any, row_count: Optional[int] = None) -> None:
+    """Copy BigQuery job statistics onto a span."""
+    if not span.is_recording():
+        return
+    job_id = getattr(job, "job_id", None)
+    if job_id:
+        span.set_attribute("bigquery.job_id", job_id)
+    for attribute, name in (
+        ("total_bytes_processed", "bigquery.bytes_processed"),
+        ("total_bytes_billed", "bigquery.bytes_billed"),
+        ("slot_millis", "bigquery.slot_millis"),
+        ("cache_hit", "bigquery.cache_hit"),
+    ):
+        value = getattr(job, attribute, None)
+        if value is not None:
+            span.set_attribute(name, value)
+    if row_count is not None:
+        span.set_attribute("bigquery.row_count", row_count)
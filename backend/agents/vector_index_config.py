@@ -0,0 +1,36 @@
+# Settings of the BigQuery vector index on document_embeddings, shared by the
+# embedding pipeline (embeddings.py), which creates the index, and the API
+# (root_agent/sub_agents/bigquery_vector_index.py), which searches it. Kept
+# free of third-party imports so the pipeline script can load it directly.
+import json
+import os
+import re
+from typing import List, Optional
+
+BQ_VECTOR_INDEX_NAME = os.getenv("BQ_VECTOR_INDEX_NAME", "document_embeddings_index")
+VECTOR_INDEX_DISTANCE = "COSINE"
+# Stored with the index so filters on them keep VECTOR_SEARCH on the index
+VECTOR_INDEX_STORED_COLUMNS = ("envelope_id", "document_id")
+
+def ddl_option(ddl: str, name: str) -> Optional[str]:
+    """Value of a string option (e.g. index_type) in an index's DDL."""
+    match = re.search(rf"{name}\s*=\s*['\"]([^'\"]+)['\"]", ddl or "", re.IGNORECASE)
+    return match.group(1).upper() if match else None
+
+def ddl_json_option(ddl: str, name: str, key: str) -> Optional[int]:
+    """Integer `key` of a JSON option (e.g. ivf_options.num_lists) in an index's DDL."""
+    match = re.search(rf"{name}\s*=\s*'(\{{[^']*\}})'", ddl or "", re.IGNORECASE)
+    if not match:
+        return None
+    try:
+        value = json.loads(match.group(1)).get(key)
+    except (ValueError, AttributeError):
+        return None
+    return int(value) if value is not None else None
+
+def ddl_stored_columns(ddl: str) -> List[str]:
+    """Columns in an index's STORING clause, in DDL order."""
+    match = re.search(r"STORING\s*\(([^)]*)\)", ddl or "", re.IGNORECASE)
+    if not match:
+        return []
+    return [name.strip().strip("`") for name in match.group(1).split(",") if name.strip()]
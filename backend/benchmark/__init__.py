@@ -0,0 +1 @@
+# Offline record/replay benchmark for chat turns; run with `python -m backend.benchmark`.
@@ -0,0 +1,80 @@
+"""
+CLI for the chat benchmark harness.
+
+Usage:
+  python -m backend.benchmark record                 # live run, writes fixtures
+  python -m backend.benchmark replay                 # offline run, prints report
+  python -m backend.benchmark replay --simulate-latency --baseline baseline.json
+  python -m backend.benchmark replay --output report.json
+
+`replay` exits with status 1 when a turn fails or a metric regresses past
+--tolerance relative to --baseline.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+
+from .harness import (
+    DEFAULT_FIXTURES_DIR,
+    DEFAULT_QUESTIONS_FILE,
+    compare,
+    load_questions,
+    record,
+    replay,
+    summarize,
+)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Record or replay chat benchmark turns")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS_FILE, help="Golden question set (JSON)")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR, help="Fixture directory")
+    parser.add_argument("--only", nargs="*", help="Question ids to run")
+    parser.add_argument(
+        "--simulate-latency",
+        action="store_true",
+        help="Sleep for the recorded model/tool latency during replay",
+    )
+    parser.add_argument("--baseline", help="Previous report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression")
+    parser.add_argument("--output", help="Write the report to this file")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    if args.only:
+        questions = [item for item in questions if item["id"] in set(args.only)]
+
+    if args.mode == "record":
+        turns = asyncio.run(record(questions, args.fixtures))
+    else:
+        turns = asyncio.run(replay(questions, args.fixtures, args.simulate_latency))
+
+    report = {"mode": args.mode, "summary": summarize(turns), "turns": turns}
+    synthetic = report["summary"]["synthetic_fixtures"]
+    if synthetic:
+        report["note"] = (
+            f"{synthetic} of {len(turns)} turns replayed synthetic fixtures: their input_tokens, "
+            "output_tokens and recorded latencies are representative values, not measurements. "
+            "estimated_input_tokens is computed from this run's requests."
+        )
+    rendered = json.dumps(report, indent=2)
+    print(rendered)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(rendered + "\n")
+
+    if args.mode == "replay":
+        failed = report["summary"]["failed_turns"] > 0
+        regressions = []
+        if args.baseline:
+            with open(args.baseline, "r", encoding="utf-8") as handle:
+                regressions = compare(report, json.load(handle), args.tolerance)
+            for regression in regressions:
+                print(f"[benchmark] Regression: {regression}", file=sys.stderr)
+        if failed or regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
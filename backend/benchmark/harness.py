@@ -0,0 +1,358 @@
+"""
+Record/replay benchmark harness for end-to-end chat turns.
+
+`record` runs each golden question through `root_agent` against the live model
+and BigQuery, capturing every model response and every non-agent tool result
+(BigQuery queries, document retrieval, reminders) into a JSON fixture.
+
+`replay` runs the same questions through `root_agent` offline: model calls and
+tool calls are answered from the fixture by a plugin, so the agent topology,
+prompts and callbacks execute for real while no network is touched. Each turn
+reports latency, LLM hop count, tool-call count and token volume, and the run
+can be compared against a baseline report to catch regressions.
+
+Token volume is reported twice. `input_tokens` / `output_tokens` are the
+usage numbers stored in the fixture, so in replay they describe the run that
+was recorded. `estimated_input_tokens` is computed from the requests this run
+actually sends (about four characters per token), so prompt growth shows up
+in replay even though no model is called.
+
+The fixtures committed under fixtures/ are synthetic (`"source": "synthetic"`):
+they follow the recorded format but hold representative data rather than a
+capture of the live project, so replay works out of the box. Their latencies
+and token usage are made up, and the report says so. `record` overwrites them
+with live captures marked `"source": "recorded"`.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.plugins.base_plugin import BasePlugin
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools.agent_tool import AgentTool
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+from google.genai import types
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_QUESTIONS_FILE = os.path.join(BENCHMARK_DIR, "golden_questions.json")
+DEFAULT_FIXTURES_DIR = os.path.join(BENCHMARK_DIR, "fixtures")
+BENCHMARK_APP_NAME = "docusign_benchmark"
+BENCHMARK_USER_ID = "benchmark"
+
+class ReplayMismatch(Exception):
+    """Raised when a replayed run asks for a call the fixture does not contain."""
+
+def _tool_key(agent_name: str, tool_name: str, tool_args: Dict[str, Any]) -> str:
+    canonical = json.dumps(tool_args, sort_keys=True, default=str)
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+    return f"{agent_name}:{tool_name}:{digest}"
+
+def _delegates_to_agents(tool: BaseTool) -> bool:
+    """Agent tools (and the parallel fan-out tool) do their work in nested runs."""
+    return isinstance(tool, AgentTool) or getattr(tool, "delegates_to_agents", False)
+
+def _usage(llm_response: LlmResponse) -> Tuple[int, int]:
+    usage = llm_response.usage_metadata
+    if usage is None:
+        return 0, 0
+    return int(usage.prompt_token_count or 0), int(usage.candidates_token_count or 0)
+
+def estimate_request_tokens(llm_request: LlmRequest) -> int:
+    """Approximate prompt size of a model request: system instruction, tool
+    declarations and conversation, at about four characters per token."""
+    pieces: List[str] = []
+    config = llm_request.config
+    if config is not None:
+        instruction = config.system_instruction
+        if isinstance(instruction, str):
+            pieces.append(instruction)
+        elif isinstance(instruction, types.Content):
+            pieces.extend(part.text or "" for part in instruction.parts or [])
+        for tool in config.tools or []:
+            dump = getattr(tool, "model_dump_json", None)
+            pieces.append(dump(exclude_none=True) if dump else str(tool))
+    for content in llm_request.contents or []:
+        for part in content.parts or []:
+            if part.text:
+                pieces.append(part.text)
+            if part.function_call:
+                pieces.append(json.dumps(part.function_call.args or {}, default=str))
+            if part.function_response:
+                pieces.append(json.dumps(part.function_response.response or {}, default=str))
+    return math.ceil(sum(len(piece) for piece in pieces) / 4)
+
+class TurnStats:
+    """Counters collected for a single benchmark turn."""
+
+    def __init__(self) -> None:
+        self.llm_hops = 0
+        self.tool_calls = 0
+        self.agent_tool_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.estimated_input_tokens = 0
+        self.hops_by_agent: Dict[str, int] = {}
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "llm_hops": self.llm_hops,
+            "tool_calls": self.tool_calls,
+            "agent_tool_calls": self.agent_tool_calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "estimated_input_tokens": self.estimated_input_tokens,
+            "hops_by_agent": dict(self.hops_by_agent),
+        }
+
+class RecordReplayPlugin(BasePlugin):
+    """Capture or serve model responses and tool results for one turn.
+
+    The plugin is inherited by the nested runners `AgentTool` creates, so
+    sub-agent hops are recorded and replayed as well. `AgentTool` calls
+    themselves always execute so the real topology is exercised.
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        fixture: Optional[Dict[str, Any]] = None,
+        simulate_latency: bool = False,
+    ):
+        super().__init__(name="record_replay")
+        if mode not in {"record", "replay"}:
+            raise ValueError(f"Unknown mode: {mode}")
+        self.mode = mode
+        self.simulate_latency = simulate_latency
+        self.stats = TurnStats()
+        self.fixture: Dict[str, Any] = fixture or {"model_calls": {}, "tool_calls": []}
+        self._model_cursor: Dict[str, int] = {}
+        self._tool_cursor: Dict[str, int] = {}
+        self._started: Dict[str, float] = {}
+
+    async def before_model_callback(
+        self, *, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> Optional[LlmResponse]:
+        agent_name = callback_context.agent_name
+        self.stats.llm_hops += 1
+        self.stats.hops_by_agent[agent_name] = self.stats.hops_by_agent.get(agent_name, 0) + 1
+        self.stats.estimated_input_tokens += estimate_request_tokens(llm_request)
+
+        if self.mode == "record":
+            self._started[f"model:{callback_context.invocation_id}:{agent_name}"] = time.monotonic()
+            return None
+
+        recorded = self.fixture["model_calls"].get(agent_name, [])
+        cursor = self._model_cursor.get(agent_name, 0)
+        if cursor >= len(recorded):
+            raise ReplayMismatch(
+                f"{agent_name} requested model call #{cursor + 1} but the fixture has {len(recorded)}"
+            )
+        self._model_cursor[agent_name] = cursor + 1
+        entry = recorded[cursor]
+        if self.simulate_latency:
+            await asyncio.sleep(entry.get("latency_ms", 0) / 1000)
+        llm_response = LlmResponse.model_validate(entry["response"])
+        input_tokens, output_tokens = _usage(llm_response)
+        self.stats.input_tokens += input_tokens
+        self.stats.output_tokens += output_tokens
+        return llm_response
+
+    async def after_model_callback(
+        self, *, callback_context: CallbackContext, llm_response: LlmResponse
+    ) -> Optional[LlmResponse]:
+        if self.mode != "record" or llm_response.partial:
+            return None
+        agent_name = callback_context.agent_name
+        started = self._started.pop(
+            f"model:{callback_context.invocation_id}:{agent_name}", time.monotonic()
+        )
+        input_tokens, output_tokens = _usage(llm_response)
+        self.stats.input_tokens += input_tokens
+        self.stats.output_tokens += output_tokens
+        self.fixture["model_calls"].setdefault(agent_name, []).append({
+            "latency_ms": round((time.monotonic() - started) * 1000, 2),
+            "response": llm_response.model_dump(mode="json", exclude_none=True),
+        })
+        return None
+
+    async def before_tool_callback(
+        self, *, tool: BaseTool, tool_args: Dict[str, Any], tool_context: ToolContext
+    ) -> Optional[Any]:
+        self.stats.tool_calls += 1
+        if _delegates_to_agents(tool):
+            self.stats.agent_tool_calls += 1
+            return None
+
+        if self.mode == "record":
+            self._started[f"tool:{tool_context.function_call_id}"] = time.monotonic()
+            return None
+
+        key = _tool_key(tool_context.agent_name, tool.name, tool_args)
+        entries = self.fixture["tool_calls"]
+        entry = next((item for item in entries if item["key"] == key and not item.get("_used")), None)
+        if entry is None:
+            # Arguments drifted (e.g. a reworded SQL query); fall back to call order per tool
+            cursor = self._tool_cursor.get(tool.name, 0)
+            same_tool = [item for item in entries if item["tool"] == tool.name]
+            if cursor >= len(same_tool):
+                raise ReplayMismatch(f"No recorded result for tool call {key}")
+            entry = same_tool[cursor]
+        self._tool_cursor[tool.name] = self._tool_cursor.get(tool.name, 0) + 1
+        entry["_used"] = True
+        if self.simulate_latency:
+            await asyncio.sleep(entry.get("latency_ms", 0) / 1000)
+        return entry["result"]
+
+    async def after_tool_callback(
+        self,
+        *,
+        tool: BaseTool,
+        tool_args: Dict[str, Any],
+        tool_context: ToolContext,
+        result: Any,
+    ) -> Optional[dict]:
+        if self.mode != "record" or _delegates_to_agents(tool):
+            return None
+        started = self._started.pop(f"tool:{tool_context.function_call_id}", time.monotonic())
+        self.fixture["tool_calls"].append({
+            "key": _tool_key(tool_context.agent_name, tool.name, tool_args),
+            "agent": tool_context.agent_name,
+            "tool": tool.name,
+            "args": json.loads(json.dumps(tool_args, default=str)),
+            "latency_ms": round((time.monotonic() - started) * 1000, 2),
+            "result": json.loads(json.dumps(result, default=str)),
+        })
+        return None
+
+def load_questions(path: str) -> List[Dict[str, str]]:
+    with open(path, "r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+def fixture_path(fixtures_dir: str, question_id: str) -> str:
+    return os.path.join(fixtures_dir, f"{question_id}.json")
+
+async def run_turn(root_agent: Any, question: str, plugin: RecordReplayPlugin) -> Dict[str, Any]:
+    """Run one question through a fresh runner and session; return its report."""
+    session_service = InMemorySessionService()
+    runner = Runner(
+        agent=root_agent,
+        app_name=BENCHMARK_APP_NAME,
+        session_service=session_service,
+        plugins=[plugin],
+    )
+    session = await session_service.create_session(
+        app_name=BENCHMARK_APP_NAME, user_id=BENCHMARK_USER_ID, session_id=uuid.uuid4().hex
+    )
+    content = types.Content(role="user", parts=[types.Part(text=f"user: {question}")])
+
+    final_text = ""
+    error: Optional[str] = None
+    started = time.perf_counter()
+    try:
+        async for event in runner.run_async(
+            user_id=BENCHMARK_USER_ID, session_id=session.id, new_message=content
+        ):
+            if event.is_final_response() and event.content and event.content.parts:
+                final_text = "".join(str(getattr(part, "text", "") or "") for part in event.content.parts)
+    except ReplayMismatch as exc:
+        error = f"stale fixture: {exc}"
+    except Exception as exc:
+        error = str(exc)
+    latency_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    report: Dict[str, Any] = {"latency_ms": latency_ms, **plugin.stats.as_dict()}
+    if error:
+        report["error"] = error
+    report["final_text_chars"] = len(final_text)
+    return report
+
+def _import_root_agent(offline: bool) -> Any:
+    if offline:
+        # Lets the agent modules import without a service account on CI machines
+        os.environ.setdefault("AGENTS_OFFLINE", "1")
+    from ..agents.root_agent.agent import root_agent
+
+    return root_agent
+
+async def record(questions: List[Dict[str, str]], fixtures_dir: str) -> List[Dict[str, Any]]:
+    """Run the questions live and write one fixture per question."""
+    root_agent = _import_root_agent(offline=False)
+    os.makedirs(fixtures_dir, exist_ok=True)
+    reports = []
+    for item in questions:
+        plugin = RecordReplayPlugin("record")
+        report = await run_turn(root_agent, item["question"], plugin)
+        fixture = {"question": item["question"], "source": "recorded", **plugin.fixture}
+        with open(fixture_path(fixtures_dir, item["id"]), "w", encoding="utf-8") as handle:
+            json.dump(fixture, handle, indent=2)
+        reports.append({"id": item["id"], **report})
+        print(f"[benchmark] Recorded {item['id']}: {report['llm_hops']} LLM hops, {report['latency_ms']} ms")
+    return reports
+
+async def replay(
+    questions: List[Dict[str, str]],
+    fixtures_dir: str,
+    simulate_latency: bool = False,
+) -> List[Dict[str, Any]]:
+    """Replay recorded fixtures offline and return a per-turn report."""
+    root_agent = _import_root_agent(offline=True)
+    reports = []
+    for item in questions:
+        path = fixture_path(fixtures_dir, item["id"])
+        if not os.path.exists(path):
+            reports.append({"id": item["id"], "error": "missing fixture"})
+            continue
+        with open(path, "r", encoding="utf-8") as handle:
+            fixture = json.load(handle)
+        plugin = RecordReplayPlugin("replay", fixture=fixture, simulate_latency=simulate_latency)
+        report = await run_turn(root_agent, item["question"], plugin)
+        reports.append({"id": item["id"], "fixture_source": fixture.get("source", "recorded"), **report})
+    return reports
+
+def summarize(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    completed = [report for report in reports if "error" not in report]
+    latencies = sorted(report["latency_ms"] for report in completed)
+
+    def total(field: str) -> int:
+        return sum(int(report.get(field, 0)) for report in completed)
+
+    return {
+        "turns": len(reports),
+        "failed_turns": len(reports) - len(completed),
+        "latency_ms_p50": latencies[len(latencies) // 2] if latencies else 0.0,
+        "latency_ms_max": latencies[-1] if latencies else 0.0,
+        "llm_hops": total("llm_hops"),
+        "tool_calls": total("tool_calls"),
+        "input_tokens": total("input_tokens"),
+        "output_tokens": total("output_tokens"),
+        "estimated_input_tokens": total("estimated_input_tokens"),
+        "synthetic_fixtures": sum(1 for report in reports if report.get("fixture_source") == "synthetic"),
+    }
+
+def compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float,
+) -> List[str]:
+    """Return human-readable regressions of `current` against `baseline`."""
+    regressions = []
+    fields = ("llm_hops", "tool_calls", "input_tokens", "output_tokens", "estimated_input_tokens", "latency_ms_p50")
+    for field in fields:
+        before = float(baseline.get("summary", {}).get(field, 0) or 0)
+        after = float(current.get("summary", {}).get(field, 0) or 0)
+        if before and after > before * (1 + tolerance):
+            regressions.append(f"{field}: {before:g} -> {after:g}")
+    if current.get("summary", {}).get("failed_turns", 0) > baseline.get("summary", {}).get("failed_turns", 0):
+        regressions.append("failed_turns increased")
+    return regressions
@@ -0,0 +1,132 @@
+"""
+Recall-vs-memory benchmark for quantized retrieval embeddings.
+
+Compares the representations the local vector index can scan (float32, int8
+with per-vector scale, binary sign codes) on the chunk embeddings of the
+current index version. Each sampled chunk is used as a query with itself
+excluded; exact float32 search gives the ground truth, and each quantized scan
+is rescored at full precision over `k * rescore` candidates. Scan memory is
+reported for the corpus as it is and grown by --growth.
+
+Usage:
+  python -m backend.benchmark.quantization                       # current local index
+  python -m backend.benchmark.quantization --rescore 1 4 8 16 --k 10
+  python -m backend.benchmark.quantization --synthetic 200000 --dimension 768
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from ..agents.root_agent.sub_agents.quantization import (
+    binarize,
+    binary_scores,
+    bytes_per_vector,
+    int8_scores,
+    quantize_int8,
+)
+from ..agents.root_agent.sub_agents.vector_index import VECTOR_INDEX_DIR
+
+def load_corpus(directory: str) -> np.ndarray:
+    """Float32 vectors of the current index version (memory-mapped)."""
+    with open(os.path.join(directory, "current.json"), "r", encoding="utf-8") as handle:
+        meta = json.load(handle)
+    return np.load(os.path.join(directory, meta["version"], "vectors.npy"), mmap_mode="r")
+
+def synthetic_corpus(count: int, dimension: int, clusters: int = 64, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors, a stand-in when no index has been built."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.6 * rng.normal(
+        size=(count, dimension)
+    ).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.argsort(-scores[best])]
+
+def run(
+    vectors: np.ndarray, queries: int, k: int, rescore: List[int], growth: float, seed: int = 0
+) -> Dict[str, Any]:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    count, dimension = vectors.shape
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(count, min(queries, count), replace=False)
+    codes, scales = quantize_int8(vectors)
+    bits = binarize(vectors)
+    scanners = {
+        "none": lambda query: vectors @ query,
+        "int8": lambda query: int8_scores(codes, scales, query),
+        "binary": lambda query: binary_scores(bits, query),
+    }
+
+    truth: Dict[int, set] = {}
+    for row in query_rows:
+        scores = vectors @ vectors[row]
+        scores[row] = -np.inf
+        truth[int(row)] = set(_top(scores, k).tolist())
+
+    results: List[Dict[str, Any]] = []
+    for mode, scan in scanners.items():
+        for factor in [1] if mode == "none" else rescore:
+            recalls: List[float] = []
+            started = time.perf_counter()
+            for row in query_rows:
+                query = vectors[row]
+                scores = scan(query).astype(np.float32)
+                scores[row] = -np.inf
+                candidates = _top(scores, min(count - 1, k * factor))
+                if mode != "none":
+                    exact = vectors[np.sort(candidates)] @ query
+                    candidates = np.sort(candidates)[_top(exact, min(k, len(candidates)))]
+                recalls.append(len(truth[int(row)] & set(candidates[:k].tolist())) / k)
+            elapsed = time.perf_counter() - started
+            per_vector = bytes_per_vector(dimension, mode)
+            results.append(
+                {
+                    "quantization": mode,
+                    "rescore": factor if mode != "none" else None,
+                    f"recall@{k}": round(float(np.mean(recalls)), 4),
+                    "ms_per_query": round(1000 * elapsed / len(query_rows), 3),
+                    "bytes_per_vector": per_vector,
+                    "scan_mb": round(count * per_vector / 2**20, 2),
+                    "scan_mb_at_growth": round(count * growth * per_vector / 2**20, 2),
+                }
+            )
+    return {
+        "corpus": {"vectors": int(count), "dimension": int(dimension), "growth": growth},
+        "queries": int(len(query_rows)),
+        "k": k,
+        "results": results,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recall vs memory of quantized embeddings")
+    parser.add_argument("--index-dir", default=VECTOR_INDEX_DIR, help="Local vector index directory")
+    parser.add_argument("--synthetic", type=int, help="Use this many synthetic vectors instead")
+    parser.add_argument("--dimension", type=int, default=768, help="Synthetic vector dimension")
+    parser.add_argument("--queries", type=int, default=200, help="Chunks sampled as queries")
+    parser.add_argument("--k", type=int, default=10, help="Results per query")
+    parser.add_argument("--rescore", type=int, nargs="*", default=[1, 4, 8, 16], help="Rescore factors")
+    parser.add_argument("--growth", type=float, default=10.0, help="Corpus growth to project memory for")
+    parser.add_argument("--output", help="Write the report to this file")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = synthetic_corpus(args.synthetic, args.dimension)
+    else:
+        vectors = load_corpus(args.index_dir)
+    report = run(vectors, args.queries, args.k, args.rescore, args.growth)
+    rendered = json.dumps(report, indent=2)
+    print(rendered)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(rendered + "\n")
+
+if __name__ == "__main__":
+    main()
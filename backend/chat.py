@@ -1,18 +1,29 @@
+import asyncio
 import json
 import os
-from typing import Any, Dict, Optional
+import uuid
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, Optional
 
 from fastapi import HTTPException, Request
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from google.genai import types
 
 from .agents.root_agent.agent import root_agent
+from .agents.root_agent.run_tracking import AgentRun, bind_run, record_run_outcome
+from .agents.root_agent.sub_agents.sql_examples import sql_example_store
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 
+from .admission import admit_agent_run
 from .config import APP_NAME, USER_ID, SESSION_ID
+from .fast_path import answer_fast_path, to_fenced_json
+from .tracing import REQUEST_ID_ATTRIBUTE, tracer
 from .utils import (
     ALLOWED_CHART_TYPES,
+    ChartStreamParser,
     build_widget_prompt,
     extract_json_candidate,
     extract_structured_payload,
@@ -24,6 +35,89 @@ from .utils import (
 session_service = InMemorySessionService()
 runner = Runner(agent=root_agent, app_name=APP_NAME, session_service=session_service)
 
+# Stream partial model output so charts can be emitted before the final event
+stream_run_config = RunConfig(streaming_mode=StreamingMode.SSE)
+
+# How often an idle stream checks whether the client has gone away
+DISCONNECT_POLL_SECONDS = 1.0
+
+# Latest chat run per conversation, so a new question supersedes the previous
+# one. The frontend sends a random id per chat window; requests without one
+# are never superseded.
+_active_chat_runs: Dict[str, AgentRun] = {}
+CHAT_ID_MAX_LENGTH = 128
+_RUN_FINISHED = object()
+
+async def _iterate_agent_run(
+    run: AgentRun,
+    request: Request,
+    content: types.Content,
+    run_config: Optional[RunConfig] = None,
+) -> AsyncIterator[Any]:
+    """Yield runner events, cancelling the whole run when the client disconnects.
+
+    The runner is driven from its own task so its nested sub-agent calls and
+    BigQuery jobs can be torn down as a unit when nobody is listening anymore.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump() -> None:
+        bind_run(run)
+        try:
+            # Root span for the request; ADK's agent, LLM and tool spans nest under it
+            with tracer.start_as_current_span(
+                "agent_run",
+                attributes={REQUEST_ID_ATTRIBUTE: run.run_id, "app.path": request.url.path},
+            ):
+                async for event in runner.run_async(
+                    user_id=USER_ID,
+                    session_id=SESSION_ID,
+                    new_message=content,
+                    run_config=run_config,
+                ):
+                    await queue.put(event)
+        except Exception as exc:
+            await queue.put(exc)
+        finally:
+            await queue.put(_RUN_FINISHED)
+
+    record_run_outcome("started")
+    agent_task = asyncio.create_task(pump())
+    outcome = "completed"
+    try:
+        while not run.cancelled:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=DISCONNECT_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    print(f"[chat] Client gone; cancelling agent run {run.run_id}")
+                    break
+                continue
+            if item is _RUN_FINISHED:
+                break
+            if isinstance(item, Exception):
+                outcome = "failed"
+                raise item
+            yield item
+    finally:
+        if not agent_task.done():
+            agent_task.cancel()
+            run.cancel()
+            outcome = "cancelled"
+        record_run_outcome(outcome)
+        if outcome == "completed":
+            # Only queries from runs that finished cleanly become examples; the
+            # SQLite write happens off the event loop
+            asyncio.get_running_loop().run_in_executor(None, sql_example_store.harvest, run)
+
+def request_id_for(request: Request) -> str:
+    """Return the id assigned to this request by the request-id middleware."""
+    request_id = getattr(request.state, "request_id", None)
+    if not request_id:
+        request_id = uuid.uuid4().hex
+        request.state.request_id = request_id
+    return request_id
+
 async def setup_session():
     """Initialize the session for the agent runner."""
     return await session_service.create_session(
@@ -35,6 +129,9 @@ async def chat(request: Request):
     body = await request.json()
     message = body.get("message")
     history = body.get("history", [])  # Add history from frontend
+    chat_id = body.get("chatId")
+    if not isinstance(chat_id, str) or not chat_id or len(chat_id) > CHAT_ID_MAX_LENGTH:
+        chat_id = None
 
     print("[chat] Incoming request", json.dumps({
         "message": message,
@@ -44,6 +141,22 @@ async def chat(request: Request):
     if not message:
         return {"error": "Message not found"}
 
+    # The frontend repeats the current message as the last history entry
+    prior_turns = history[:-1] if history and history[-1].get("role") == "user" else history
+
+    request_id = request_id_for(request)
+    with tracer.start_as_current_span(
+        "fast_path", attributes={REQUEST_ID_ATTRIBUTE: request_id, "app.path": request.url.path}
+    ):
+        fast_answer = await answer_fast_path(message, has_history=bool(prior_turns))
+    if fast_answer is not None:
+        fast_payload = {"raw": to_fenced_json(fast_answer), "structured": fast_answer}
+
+        async def fast_stream():
+            yield f"data: {json.dumps(fast_payload)}\n\n"
+
+        return StreamingResponse(fast_stream(), media_type="text/event-stream")
+
     await setup_session()
 
     transcript_segments = []
@@ -61,32 +174,64 @@ async def chat(request: Request):
         parts=[types.Part(text="\n\n".join(transcript_segments))],
     )
 
+    previous_run = _active_chat_runs.get(chat_id) if chat_id is not None else None
+    if previous_run is not None:
+        previous_run.cancel()
+
+    # Admit before streaming so overload surfaces as a fast 429
+    slot = await admit_agent_run()
+    run = AgentRun(run_id=request_id, question=message)
+    if chat_id is not None:
+        _active_chat_runs[chat_id] = run
+
     async def event_stream():
+        chart_parser = ChartStreamParser()
         try:
-            async for event in runner.run_async(
-                user_id=USER_ID, session_id=SESSION_ID, new_message=content
-            ):
-                if event.is_final_response() and event.content and event.content.parts:
-                    text_parts = [str(getattr(part, "text", "") or "") for part in event.content.parts]
-                    combined_text = "".join(text_parts)
-                    structured = extract_structured_payload(combined_text)
-                    payload = {"raw": combined_text}
-                    print("structured is", payload)
-                    if structured is not None:
-                        payload["structured"] = structured
-                    print("[chat] Final event payload", json.dumps({
-                        "parts": text_parts,
-                        "combined": combined_text,
-                        "structured": structured,
-                    }, indent=2))
-                    yield f"data: {json.dumps(payload)}\n\n"
-                else:
-                    print("[chat] Non-final event encountered", repr(event))
+            events = _iterate_agent_run(run, request, content, stream_run_config)
+            async with aclosing(events):
+                async for event in events:
+                    if event.partial:
+                        if event.content and event.content.parts:
+                            partial_text = "".join(
+                                str(getattr(part, "text", "") or "")
+                                for part in event.content.parts
+                                if not getattr(part, "thought", False)
+                            )
+                            for chart in chart_parser.feed(partial_text):
+                                yield f"data: {json.dumps({'chart': chart})}\n\n"
+                        continue
+                    # Each model response streams independently; start fresh for the next one
+                    chart_parser = ChartStreamParser()
+                    if event.is_final_response() and event.content and event.content.parts:
+                        text_parts = [str(getattr(part, "text", "") or "") for part in event.content.parts]
+                        combined_text = "".join(text_parts)
+                        structured = extract_structured_payload(combined_text)
+                        payload = {"raw": combined_text}
+                        print("structured is", payload)
+                        if structured is not None:
+                            payload["structured"] = structured
+                        print("[chat] Final event payload", json.dumps({
+                            "parts": text_parts,
+                            "combined": combined_text,
+                            "structured": structured,
+                        }, indent=2))
+                        yield f"data: {json.dumps(payload)}\n\n"
+                    else:
+                        print("[chat] Non-final event encountered", repr(event))
         except Exception as e:
             print(f"An error occurred: {e}")
             yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        finally:
+            if chat_id is not None and _active_chat_runs.get(chat_id) is run:
+                _active_chat_runs.pop(chat_id, None)
+            await slot.release()
 
-    return StreamingResponse(event_stream(), media_type="text/event-stream")
+    # The background task covers responses whose stream never started
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        background=BackgroundTask(slot.release),
+    )
 
 async def resolve_widget(request: Request):
     """Resolve widget requests for analytics charts and insights."""
@@ -107,6 +252,24 @@ async def resolve_widget(request: Request):
         else:
             chart_type_value = "bar"
 
+    request_id = request_id_for(request)
+    with tracer.start_as_current_span(
+        "fast_path", attributes={REQUEST_ID_ATTRIBUTE: request_id, "app.path": request.url.path}
+    ):
+        fast_answer = await answer_fast_path(
+            prompt,
+            force_charts=kind == "chart",
+            chart_type=chart_type_value,
+        )
+    if fast_answer is not None:
+        return {
+            "content": {
+                "raw": to_fenced_json(fast_answer),
+                "text": fast_answer.get("text"),
+                "charts": fast_answer.get("charts", []),
+            }
+        }
+
     agent_prompt = build_widget_prompt(prompt, kind, chart_type_value)
 
     await setup_session()
@@ -119,22 +282,23 @@ async def resolve_widget(request: Request):
     raw_text = ""
     structured_payload: Optional[Any] = None
 
-    try:
-        async for event in runner.run_async(
-            user_id=USER_ID, session_id=SESSION_ID, new_message=content
-        ):
-            if event.is_final_response() and event.content and event.content.parts:
-                text_parts = [
-                    str(getattr(part, "text", "") or "") for part in event.content.parts
-                ]
-                combined_text = "".join(text_parts)
-                raw_text = combined_text
-                candidate_structured = extract_structured_payload(combined_text)
-                if candidate_structured is not None:
-                    structured_payload = candidate_structured
-    except Exception as exc:
-        print("[resolve-widget] Agent run failed", exc)
-        return {"error": str(exc)}
+    run = AgentRun(run_id=request_id)
+    async with await admit_agent_run():
+        try:
+            async with aclosing(_iterate_agent_run(run, request, content)) as events:
+                async for event in events:
+                    if event.is_final_response() and event.content and event.content.parts:
+                        text_parts = [
+                            str(getattr(part, "text", "") or "") for part in event.content.parts
+                        ]
+                        combined_text = "".join(text_parts)
+                        raw_text = combined_text
+                        candidate_structured = extract_structured_payload(combined_text)
+                        if candidate_structured is not None:
+                            structured_payload = candidate_structured
+        except Exception as exc:
+            print("[resolve-widget] Agent run failed", exc)
+            return {"error": str(exc)}
 
     message_content: Dict[str, Any] = {"raw": raw_text}
     message_content = merge_content(
@@ -1,8 +1,9 @@
 import asyncio
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from google.cloud import bigquery
 
+from .agents.root_agent.telemetry import annotate_bigquery_job, tracer
 from .config import bigquery_client
 
 def serialize_value(value: Any) -> Any:
@@ -34,13 +35,15 @@ async def run_bigquery_query(
     if client is None:
         raise RuntimeError("BigQuery client is not configured")
 
-    def _execute() -> List[Dict[str, Any]]:
+    def _execute() -> Tuple[Any, List[Dict[str, Any]]]:
         job_config = bigquery.QueryJobConfig(query_parameters=query_parameters or [])
         job = client.query(query, job_config=job_config)
         results = job.result()
-        return [dict(row.items()) for row in results]
+        return job, [dict(row.items()) for row in results]
 
     loop = asyncio.get_running_loop()
-    raw_rows = await loop.run_in_executor(None, _execute)
+    with tracer.start_as_current_span("bigquery.analytics_query") as span:
+        job, raw_rows = await loop.run_in_executor(None, _execute)
+        annotate_bigquery_job(span, job, len(raw_rows))
     return serialize_rows(raw_rows)
 
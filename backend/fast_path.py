@@ -0,0 +1,361 @@
+import datetime
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Pattern, Tuple
+
+from .analytics import (
+    get_cycle_time_by_document,
+    get_daily_sent_vs_completed,
+    get_dashboard_kpis,
+    get_status_distribution,
+)
+from .utils import ALLOWED_CHART_TYPES
+
+# Questions mentioning any of these need reasoning, documents or side effects
+# that only the agent can provide, so they never take the fast path.
+_AGENT_ONLY_TERMS = re.compile(
+    r"\b(why|remind|reminder|send|email|contract text|clause|customer|upsell|renewal|"
+    r"recommend|predict|forecast|risk|legal|document content|summari[sz]e)\b",
+    re.IGNORECASE,
+)
+_CHART_REQUEST = re.compile(r"\b(chart|graph|plot|visuali[sz]e|visuali[sz]ation|diagram)\b", re.IGNORECASE)
+_CHART_TYPE_HINTS = [
+    (re.compile(r"\bdouble[- ]bar\b", re.IGNORECASE), "double-bar"),
+    (re.compile(r"\bpie\b", re.IGNORECASE), "pie"),
+    (re.compile(r"\bline\b", re.IGNORECASE), "line"),
+    (re.compile(r"\bbar\b", re.IGNORECASE), "bar"),
+]
+_TOP_N = re.compile(r"\btop\s+(\d{1,2})\b", re.IGNORECASE)
+_LAST_N_UNITS = re.compile(r"\b(?:last|past|previous)\s+(\d{1,3})\s+(day|week|month)s?\b", re.IGNORECASE)
+_LAST_UNIT = re.compile(r"\b(?:last|past|previous|this)\s+(week|month|quarter)\b", re.IGNORECASE)
+_UNIT_DAYS = {"day": 1, "week": 7, "month": 30, "quarter": 90}
+# Every word a fast-path question may use. Anything else (a sender, customer,
+# template or document name, an email address) is a filter the templates
+# cannot apply, so the question falls through to the agent.
+_FAST_PATH_VOCABULARY = set(
+    """
+    a about across against agreement agreements all an and any are as at average avg bar be been
+    breakdown by can chart charts common completed complete completion contract contracts could
+    count counts create cycle daily dashboard day days delivered declined diagram display
+    distribution do document documents does double draw each envelope envelopes fastest for from
+    get give graph has have hour hours how i in indicators is it key kpi kpis last least line list
+    long longest make many me mean metrics month months most much my number of on or our over past
+    pending per percentage performance pie please plot previous quarter rate ratio sent share
+    shortest show signed slowest split status statuses take takes tell than that the these this
+    time times to today top total type types using versus visualisation visualise visualization
+    visualize voided vs was we week weeks were what whats which with yesterday you
+    """.split()
+)
+
+@dataclass
+class FastPathQuery:
+    """Parameters extracted from a question for a fast-path template."""
+
+    question: str
+    include_charts: bool
+    chart_type: str
+    limit: Optional[int] = None
+    days: Optional[int] = None
+
+@dataclass
+class FastPathTemplate:
+    """A parameterised question shape that `analytics.py` can answer directly."""
+
+    name: str
+    patterns: List[Pattern[str]]
+    handler: Callable[[FastPathQuery], Awaitable[Dict[str, Any]]]
+    default_chart_type: str
+    allowed_chart_types: List[str]
+    # Longest look-back window the handler honours; None when its window is
+    # fixed, so questions naming a window fall through to the agent
+    max_days: Optional[int] = None
+
+    def matches(self, question: str) -> bool:
+        return any(pattern.search(question) for pattern in self.patterns)
+
+def extract_chart_type(question: str) -> Optional[str]:
+    """Return an explicitly requested chart type, if any."""
+    for pattern, chart_type in _CHART_TYPE_HINTS:
+        if pattern.search(question):
+            return chart_type
+    return None
+
+def extract_days(question: str) -> Optional[int]:
+    """Return the look-back window in days expressed in the question."""
+    match = _LAST_N_UNITS.search(question)
+    if match:
+        return int(match.group(1)) * _UNIT_DAYS[match.group(2).lower()]
+    match = _LAST_UNIT.search(question)
+    if match:
+        return _UNIT_DAYS[match.group(1).lower()]
+    if re.search(r"\b(today|yesterday)\b", question, re.IGNORECASE):
+        return 1
+    return None
+
+def extract_limit(question: str) -> Optional[int]:
+    match = _TOP_N.search(question)
+    return int(match.group(1)) if match else None
+
+def _chart(chart_id: str, chart_type: str, title: str, description: str, data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "id": chart_id,
+        "type": chart_type,
+        "title": title,
+        "description": description,
+        "data": data,
+    }
+
+def unrecognised_words(question: str) -> List[str]:
+    """Words outside the fast-path vocabulary, in order of appearance."""
+    words = re.findall(r"[a-z]+", question.lower().replace("'", ""))
+    return [word for word in words if word not in _FAST_PATH_VOCABULARY]
+
+def _mentioned(values: List[str], question: str) -> List[str]:
+    """Values named in the question as whole words ("sent" is not in "represent")."""
+    return [
+        value
+        for value in values
+        if value and re.search(rf"\b{re.escape(value)}\b", question, re.IGNORECASE)
+    ]
+
+async def _answer_kpis(query: FastPathQuery) -> Dict[str, Any]:
+    kpis = await get_dashboard_kpis()
+    text = (
+        f"Average contract cycle time over the last 90 days is {kpis['average_contract_cycle_days']} days "
+        f"({kpis['average_contract_cycle_hours']} hours). "
+        f"{kpis['agreements_completed_last_30_days']} agreements were completed in the last 30 days, and "
+        f"{kpis['pending_envelopes_last_90_days']} envelopes modified in the last 90 days are still pending."
+    )
+    result: Dict[str, Any] = {"text": text}
+    if query.include_charts:
+        result["charts"] = [
+            _chart(
+                "chart-1",
+                query.chart_type,
+                "Envelope KPIs",
+                "Completed agreements (last 30 days) and pending envelopes (last 90 days).",
+                [
+                    {"name": "Completed (30d)", "value": kpis["agreements_completed_last_30_days"]},
+                    {"name": "Pending (90d)", "value": kpis["pending_envelopes_last_90_days"]},
+                ],
+            )
+        ]
+    return result
+
+async def _answer_status_distribution(query: FastPathQuery) -> Dict[str, Any]:
+    payload = await get_status_distribution(query.limit or 6)
+    items = payload["items"]
+    total = sum(item["count"] for item in items)
+    statuses = [item["status"] for item in items]
+    focus = _mentioned(statuses, query.question)
+    if focus:
+        focus_items = [item for item in items if item["status"] in focus]
+        text = "; ".join(
+            f"{item['count']} envelopes are {item['status'].lower()}"
+            + (f" ({item['count'] / total:.0%} of {total})" if total else "")
+            for item in focus_items
+        ) + "."
+    elif items:
+        leader = items[0]
+        share = f" ({leader['count'] / total:.0%})" if total else ""
+        text = (
+            f"Across {total} envelopes, {leader['status']} is the most common status with "
+            f"{leader['count']}{share}. "
+            + ", ".join(f"{item['status']}: {item['count']}" for item in items)
+            + "."
+        )
+    else:
+        text = "No envelopes were found."
+    result: Dict[str, Any] = {"text": text}
+    if query.include_charts and items:
+        result["charts"] = [
+            _chart(
+                "chart-1",
+                query.chart_type,
+                "Envelope status distribution",
+                "Number of envelopes in each DocuSign status.",
+                [{"name": item["status"], "value": item["count"]} for item in items],
+            )
+        ]
+    return result
+
+async def _answer_cycle_time(query: FastPathQuery) -> Dict[str, Any]:
+    payload = await get_cycle_time_by_document(query.limit or 6)
+    items = payload["items"]
+    focus = _mentioned([item["type"] for item in items], query.question)
+    if focus:
+        items = [item for item in items if item["type"] in focus]
+    if items:
+        slowest = items[0]
+        text = (
+            f"Over the last 60 days, {slowest['type']} envelopes take the longest to complete at "
+            f"{slowest['avgHours']} hours on average. "
+            + ", ".join(f"{item['type']}: {item['avgHours']}h" for item in items)
+            + "."
+        )
+    else:
+        text = "No completed envelopes with a document type were found in the last 60 days."
+    result: Dict[str, Any] = {"text": text}
+    if query.include_charts and items:
+        result["charts"] = [
+            _chart(
+                "chart-1",
+                query.chart_type,
+                "Average cycle time by document type",
+                "Average hours from sent to completed over the last 60 days.",
+                [{"name": item["type"], "value": item["avgHours"]} for item in items],
+            )
+        ]
+    return result
+
+async def _answer_sent_vs_completed(query: FastPathQuery) -> Dict[str, Any]:
+    payload = await get_daily_sent_vs_completed(60)
+    items = payload["items"]
+    days = query.days or 60
+    if days < 60:
+        cutoff = (datetime.date.today() - datetime.timedelta(days=days - 1)).isoformat()
+        items = [item for item in items if str(item["date"]) >= cutoff]
+    sent_total = sum(item["sent"] for item in items)
+    completed_total = sum(item["completed"] for item in items)
+    text = (
+        f"In the last {days} days, {sent_total} envelopes were sent and {completed_total} were completed"
+        + (f" across {len(items)} active days." if items else ".")
+    )
+    result: Dict[str, Any] = {"text": text}
+    if query.include_charts and items:
+        chart_type = query.chart_type
+        if chart_type == "double-bar":
+            chart = _chart(
+                "chart-1",
+                "double-bar",
+                "Daily envelopes sent vs completed",
+                f"Envelopes sent (series A) and completed (series B) per day over the last {days} days.",
+                [
+                    {"name": str(item["date"]), "seriesA": item["sent"], "seriesB": item["completed"]}
+                    for item in items
+                ],
+            )
+            chart["meta"] = {"seriesALabel": "Sent", "seriesBLabel": "Completed"}
+        else:
+            chart = _chart(
+                "chart-1",
+                chart_type,
+                "Daily envelopes completed",
+                f"Envelopes completed per day over the last {days} days.",
+                [{"name": str(item["date"]), "value": item["completed"]} for item in items],
+            )
+        result["charts"] = [chart]
+    return result
+
+FAST_PATH_TEMPLATES: List[FastPathTemplate] = [
+    FastPathTemplate(
+        name="cycle_time_by_document",
+        patterns=[
+            re.compile(r"\bcycle[- ]?times?\b.*\b(by|per|for each|across)\b.*\b(document|envelope|contract)?\s*types?\b", re.IGNORECASE),
+            re.compile(r"\b(document|envelope|contract) types?\b.*\bcycle[- ]?times?\b", re.IGNORECASE),
+            re.compile(r"\bwhich (document|envelope|contract) types?\b.*\b(slowest|fastest|longest)\b", re.IGNORECASE),
+        ],
+        handler=_answer_cycle_time,
+        default_chart_type="bar",
+        allowed_chart_types=["bar", "line", "pie"],
+    ),
+    FastPathTemplate(
+        name="daily_sent_vs_completed",
+        patterns=[
+            re.compile(r"\bsent\b.*\b(vs\.?|versus|and|against)\b.*\bcompleted\b", re.IGNORECASE),
+            re.compile(r"\b(daily|per day|each day)\b.*\b(sent|completed)\b.*\benvelopes?\b", re.IGNORECASE),
+            re.compile(r"\benvelopes?\b.*\b(sent|completed)\b.*\b(daily|per day|each day)\b", re.IGNORECASE),
+        ],
+        handler=_answer_sent_vs_completed,
+        default_chart_type="double-bar",
+        allowed_chart_types=["double-bar", "line", "bar"],
+        max_days=60,
+    ),
+    FastPathTemplate(
+        name="status_distribution",
+        patterns=[
+            re.compile(r"\bstatus (distribution|breakdown|split|counts?)\b", re.IGNORECASE),
+            re.compile(r"\b(envelopes?|contracts?) (by|per) status\b", re.IGNORECASE),
+            re.compile(r"\b(distribution|breakdown) of (envelope |contract )?status(es)?\b", re.IGNORECASE),
+        ],
+        handler=_answer_status_distribution,
+        default_chart_type="pie",
+        allowed_chart_types=["pie", "bar"],
+    ),
+    FastPathTemplate(
+        name="dashboard_kpis",
+        patterns=[
+            re.compile(r"\b(kpis?|key (performance )?(metrics|indicators))\b", re.IGNORECASE),
+            re.compile(r"\baverage (contract )?cycle[- ]?time\b(?!.*\b(by|per)\b)", re.IGNORECASE),
+            re.compile(r"\bhow many (envelopes|agreements|contracts) (are|were) (pending|completed)\b", re.IGNORECASE),
+        ],
+        handler=_answer_kpis,
+        default_chart_type="bar",
+        allowed_chart_types=["bar", "pie"],
+    ),
+]
+
+def match_fast_path(
+    question: str,
+    force_charts: bool = False,
+    chart_type: Optional[str] = None,
+    has_history: bool = False,
+) -> Optional[Tuple[FastPathTemplate, FastPathQuery]]:
+    """Match a question against the template registry.
+
+    Returns `(template, FastPathQuery)` for a confident match, otherwise None so
+    the caller falls through to the agent. A question is not a confident match
+    when it names a look-back window or any other filter the template cannot
+    apply, or when it follows earlier turns (`has_history`) it may depend on.
+    """
+    if not question or len(question) > 300 or _AGENT_ONLY_TERMS.search(question):
+        return None
+    if has_history or unrecognised_words(question):
+        return None
+
+    for template in FAST_PATH_TEMPLATES:
+        if not template.matches(question):
+            continue
+        days = extract_days(question)
+        if days is not None and (template.max_days is None or days > template.max_days):
+            return None
+        requested_type = chart_type or extract_chart_type(question)
+        if requested_type not in ALLOWED_CHART_TYPES or requested_type not in template.allowed_chart_types:
+            requested_type = template.default_chart_type
+        query = FastPathQuery(
+            question=question,
+            include_charts=force_charts or bool(_CHART_REQUEST.search(question)) or chart_type is not None,
+            chart_type=requested_type,
+            limit=extract_limit(question),
+            days=days,
+        )
+        return template, query
+    return None
+
+async def answer_fast_path(
+    question: str,
+    force_charts: bool = False,
+    chart_type: Optional[str] = None,
+    has_history: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """Answer a common analytics question without the agent chain.
+
+    Returns the `{"text", "charts"}` contract, or None when the question does
+    not match a template or the underlying query fails.
+    """
+    matched = match_fast_path(question, force_charts, chart_type, has_history)
+    if matched is None:
+        return None
+    template, query = matched
+    try:
+        result = await template.handler(query)
+    except Exception as exc:
+        print(f"[fast-path] {template.name} failed, falling back to agent: {exc}")
+        return None
+    print(f"[fast-path] Answered with template {template.name}")
+    return result
+
+def to_fenced_json(payload: Dict[str, Any]) -> str:
+    """Render a payload the way the root agent does: a fenced `json` block."""
+    return f"```json\n{json.dumps(payload, indent=2)}\n```"
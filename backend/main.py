@@ -1,10 +1,38 @@
+import asyncio
+import uuid
 from typing import Optional
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
-from .config import CORS_ORIGINS
+from .admission import admission_controller
+from .agents.root_agent.bigquery_clients import bigquery_clients, warm_up_bigquery_clients
+from .agents.root_agent.run_tracking import run_metrics
+from .agents.root_agent.sub_agents.bigquery_vector_index import (
+    bigquery_vector_index,
+    check_bigquery_vector_index,
+    keep_bigquery_vector_index_fresh,
+)
+from .agents.root_agent.sub_agents.document_retrieval import query_embedding_cache
+from .agents.root_agent.sub_agents.expiring_envelopes import (
+    expiring_envelopes_status,
+    expiring_within,
+    keep_expiring_envelopes_fresh,
+    refresh_expiring_envelopes,
+)
+from .agents.root_agent.sub_agents.schema_catalog import (
+    keep_schema_catalog_fresh,
+    refresh_schema_catalog,
+    schema_catalog_status,
+)
+from .agents.root_agent.sub_agents.sql_cache import sql_result_cache
+from .agents.root_agent.sub_agents.vector_index import (
+    keep_vector_index_fresh,
+    refresh_vector_index,
+    vector_index,
+)
+from .config import CORS_ORIGINS, DOCUSIGN_DATASET, bigquery_client
 from .analytics import (
     get_dashboard_kpis,
     get_cycle_time_by_document,
@@ -13,12 +41,60 @@ from .analytics import (
     get_envelopes_table,
 )
 from .chat import chat, resolve_widget
+from .tracing import configure_tracing, request_trace_store
 
 # Load environment variables from .env for local development
 load_dotenv()
 
 app = FastAPI()
 
+configure_tracing()
+
+@app.on_event("startup")
+async def warm_up_bigquery():
+    # Fetch an access token and open pooled connections before the first request
+    try:
+        await warm_up_bigquery_clients([DOCUSIGN_DATASET])
+    except Exception as exc:  # pragma: no cover - logging path
+        print(f"[bigquery] Warmup failed: {exc}")
+
+@app.on_event("startup")
+async def start_schema_catalog_refresh():
+    # Rebuild the agents' schema catalog whenever a sync changes the dataset
+    app.state.schema_catalog_task = asyncio.create_task(keep_schema_catalog_fresh(bigquery_client))
+
+@app.on_event("startup")
+async def start_expiring_envelopes_refresh():
+    # Recompute the expiring-envelopes snapshot after every sync
+    app.state.expiring_envelopes_task = asyncio.create_task(
+        keep_expiring_envelopes_fresh(bigquery_client)
+    )
+
+@app.on_event("startup")
+async def start_vector_index_refresh():
+    # Mirror new document embeddings into the local ANN index
+    app.state.vector_index_task = asyncio.create_task(keep_vector_index_fresh(bigquery_client))
+
+@app.on_event("startup")
+async def start_bigquery_vector_index_status():
+    # Track the managed VECTOR_SEARCH index's coverage; the embedding pipeline owns its DDL
+    app.state.bigquery_vector_index_task = asyncio.create_task(
+        keep_bigquery_vector_index_fresh(bigquery_client)
+    )
+
+@app.middleware("http")
+async def assign_request_id(request: Request, call_next):
+    """Tag every request with an id that also keys its trace.
+
+    Ids are always generated here; a client-supplied X-Request-ID could
+    collide with or overwrite another caller's run and trace.
+    """
+    request_id = uuid.uuid4().hex
+    request.state.request_id = request_id
+    response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -26,6 +102,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "Retry-After"],
 )
 
 # Analytics routes (delegating to analytics module)
@@ -63,6 +140,79 @@ async def chat_endpoint(request: Request):
 async def resolve_widget_endpoint(request: Request):
     return await resolve_widget(request)
 
+# Operational metrics
+@app.get("/metrics/admission")
+async def admission_metrics():
+    return admission_controller.snapshot()
+
+@app.get("/metrics/agent-runs")
+async def agent_run_metrics():
+    return run_metrics()
+
+@app.get("/metrics/bigquery-clients")
+async def bigquery_client_metrics():
+    return bigquery_clients.snapshot()
+
+@app.get("/metrics/query-embeddings")
+async def query_embedding_metrics():
+    return query_embedding_cache.snapshot()
+
+@app.get("/metrics/sql-cache")
+async def sql_cache_metrics():
+    return sql_result_cache.snapshot()
+
+# Agent schema catalog
+@app.get("/schema-catalog")
+async def get_schema_catalog():
+    return schema_catalog_status()
+
+@app.post("/schema-catalog/refresh")
+async def refresh_schema_catalog_endpoint(force: bool = False):
+    """Hook for the sync job: rebuild the catalog if the dataset changed."""
+    return await refresh_schema_catalog(bigquery_client, force=force)
+
+# Expiring envelopes (served from the precomputed snapshot)
+@app.get("/reminders/expiring")
+async def get_expiring_envelopes(days: float = 7, limit: Optional[int] = None):
+    recipients = expiring_within(days, limit)
+    return {**expiring_envelopes_status(), "days": days, "count": len(recipients), "recipients": recipients}
+
+@app.post("/reminders/expiring/refresh")
+async def refresh_expiring_envelopes_endpoint(force: bool = False):
+    """Hook for the sync job: recompute the snapshot if the dataset changed."""
+    return await refresh_expiring_envelopes(bigquery_client, force=force)
+
+# Local document vector index
+@app.get("/vector-index")
+async def get_vector_index():
+    return vector_index.status()
+
+@app.post("/vector-index/refresh")
+async def refresh_vector_index_endpoint(force: bool = False):
+    """Hook for the embedding job: mirror new chunks if the table changed."""
+    return await refresh_vector_index(bigquery_client, force=force)
+
+@app.get("/vector-index/bigquery")
+async def get_bigquery_vector_index():
+    return bigquery_vector_index.snapshot()
+
+@app.post("/vector-index/bigquery/refresh")
+async def refresh_bigquery_vector_index_endpoint():
+    """Recheck the index's status and coverage (no DDL)."""
+    return await check_bigquery_vector_index(bigquery_client)
+
+# Request traces
+@app.get("/traces")
+async def list_traces():
+    return {"request_ids": request_trace_store.request_ids()}
+
+@app.get("/traces/{request_id}")
+async def get_trace(request_id: str):
+    recorded = request_trace_store.get(request_id)
+    if recorded is None:
+        raise HTTPException(status_code=404, detail="No trace recorded for this request id")
+    return recorded
+
 @app.get("/")
 def read_root():
     return {"Hello": "World"}
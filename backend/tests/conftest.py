@@ -0,0 +1,4 @@
+import os
+
+# Import the agents without credentials or network access
+os.environ.setdefault("AGENTS_OFFLINE", "1")
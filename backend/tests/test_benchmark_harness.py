@@ -0,0 +1,29 @@
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+
+from backend.benchmark.harness import estimate_request_tokens, summarize
+
+
+def test_estimate_request_tokens_counts_instruction_and_conversation():
+    request = LlmRequest(
+        contents=[
+            types.Content(role="user", parts=[types.Part(text="x" * 40)]),
+            types.Content(
+                role="model",
+                parts=[types.Part(function_call=types.FunctionCall(name="f", args={"q": "y" * 10}))],
+            ),
+        ],
+        config=types.GenerateContentConfig(system_instruction="z" * 20),
+    )
+    # 20 + 40 + len('{"q": "yyyyyyyyyy"}') = 79 characters
+    assert estimate_request_tokens(request) == 20
+
+
+def test_summarize_counts_synthetic_fixtures():
+    reports = [
+        {"id": "a", "fixture_source": "synthetic", "latency_ms": 1.0, "estimated_input_tokens": 5},
+        {"id": "b", "fixture_source": "recorded", "latency_ms": 2.0, "estimated_input_tokens": 7},
+    ]
+    summary = summarize(reports)
+    assert summary["synthetic_fixtures"] == 1
+    assert summary["estimated_input_tokens"] == 12
@@ -0,0 +1,33 @@
+import asyncio
+from types import SimpleNamespace
+
+from google.adk.tools.bigquery.config import BigQueryToolConfig
+
+from backend.agents.root_agent.sub_agents import bigquery_tools
+
+
+class _Client:
+    def list_tables(self, dataset):
+        return [SimpleNamespace(table_id=f"{dataset.dataset_id}_envelopes")]
+
+    def get_table(self, table):
+        raise RuntimeError("table not found")
+
+
+def test_metadata_tools_use_the_shared_client(monkeypatch):
+    requested = []
+
+    def get_bigquery_client(**kwargs):
+        requested.append(kwargs)
+        return _Client()
+
+    monkeypatch.setattr(bigquery_tools, "get_bigquery_client", get_bigquery_client)
+    settings = BigQueryToolConfig(application_name="docusign")
+    assert asyncio.run(bigquery_tools.list_table_ids("p", "d", None, settings)) == ["d_envelopes"]
+    assert requested == [
+        {"project": "p", "credentials": None, "location": None, "user_agent": "docusign"}
+    ]
+    assert asyncio.run(bigquery_tools.get_table_info("p", "d", "t", None, settings)) == {
+        "status": "ERROR",
+        "error_details": "table not found",
+    }
@@ -0,0 +1,80 @@
+import pytest
+
+from backend.agents.root_agent.sub_agents.bigquery_vector_index import (
+    choose_search_mode,
+    ddl_option,
+    index_filters,
+    vector_index_status_sql,
+    vector_search_parameters,
+    vector_search_sql,
+)
+from backend.agents.vector_index_config import ddl_json_option, ddl_stored_columns
+
+ACTIVE = {"index_status": "ACTIVE", "coverage_percentage": 100}
+
+
+def test_vector_search_sql_without_filters_scans_the_table():
+    sql = vector_search_sql(5, 0.1, columns=["content", "envelope_id"], table="p.d.t")
+    assert "TABLE `p.d.t`, 'embedding'" in sql
+    assert "base.content,\n      base.envelope_id,\n      distance" in sql
+    assert "top_k => 5" in sql
+    assert "options => '{\"fraction_lists_to_search\": 0.1}'" in sql
+
+
+def test_vector_search_sql_prefilters_active_filters_only():
+    sql = vector_search_sql(3, None, {"envelope_id": "e1", "document_id": []}, table="p.d.t")
+    assert "(SELECT * FROM `p.d.t` WHERE envelope_id IN UNNEST(@envelope_id))" in sql
+    assert "document_id IN UNNEST" not in sql
+    assert "options =>" not in sql
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"top_k": 0}, {"top_k": 5, "fraction_lists_to_search": 1.5}, {"top_k": 5, "filters": {"x; --": "1"}}],
+)
+def test_vector_search_sql_rejects_bad_arguments(kwargs):
+    with pytest.raises(ValueError):
+        vector_search_sql(**kwargs)
+
+
+def test_vector_search_parameters():
+    parameters = vector_search_parameters([0.1, 0.2], 2, {"envelope_id": ["a", "b"], "document_id": None})
+    assert [parameter.name for parameter in parameters] == ["flat", "dimension", "envelope_id"]
+    assert parameters[2].values == ["a", "b"]
+
+
+def test_vector_index_status_sql_quotes_identifiers():
+    sql = vector_index_status_sql("document_embeddings", "idx", "p", "d")
+    assert "FROM `p.d.INFORMATION_SCHEMA.VECTOR_INDEXES`" in sql
+    assert "table_name = 'document_embeddings' AND index_name = 'idx'" in sql
+    with pytest.raises(ValueError):
+        vector_index_status_sql("x' OR '1'='1", "idx")
+
+
+def test_index_filters_and_ddl_option():
+    assert index_filters({"envelope_id": "e1", "document_id": "", "x": [1, 2]}) == {
+        "envelope_id": ["e1"],
+        "x": ["1", "2"],
+    }
+    assert ddl_option("OPTIONS(index_type = 'tree_ah', distance_type=\"COSINE\")", "index_type") == "TREE_AH"
+    assert ddl_option("", "index_type") is None
+
+
+def test_choose_search_mode():
+    assert choose_search_mode(None) == "brute_force"
+    assert choose_search_mode({**ACTIVE, "index_status": "PENDING DISABLEMENT"}) == "brute_force"
+    assert choose_search_mode({**ACTIVE, "coverage_percentage": 80}, min_coverage=90) == "brute_force"
+    assert choose_search_mode({**ACTIVE, "coverage_percentage": 95}, min_coverage=90) == "vector_search"
+    assert choose_search_mode(ACTIVE, {"envelope_id": "e1"}) == "vector_search"
+    assert choose_search_mode(ACTIVE, {"document_name": "NDA"}) == "brute_force"
+
+
+def test_ddl_json_option_and_stored_columns():
+    ddl = (
+        "CREATE VECTOR INDEX idx ON `p.d.t`(embedding) STORING(`envelope_id`, document_id) "
+        "OPTIONS(index_type='IVF', distance_type='COSINE', ivf_options='{\"num_lists\": 100}')"
+    )
+    assert ddl_json_option(ddl, "ivf_options", "num_lists") == 100
+    assert ddl_json_option(ddl, "tree_ah_options", "leaf_node_embedding_count") is None
+    assert ddl_stored_columns(ddl) == ["envelope_id", "document_id"]
+    assert ddl_stored_columns("OPTIONS(index_type='IVF')") == []
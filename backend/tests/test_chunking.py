@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("fitz")
+
+from backend.agents.embeddings import chunk_text, count_tokens, split_sentences  # noqa: E402
+
+
+def test_split_sentences():
+    assert split_sentences("First one.  Second\none! Third? \"Quoted\" last.") == [
+        "First one.",
+        "Second one!",
+        "Third?",
+        "\"Quoted\" last.",
+    ]
+    # No split inside abbreviations followed by lowercase, or numbers like 3.5
+    assert split_sentences("Pay e.g. the fee of 3.5 percent.") == ["Pay e.g. the fee of 3.5 percent."]
+    assert split_sentences("   ") == []
+
+
+def test_chunk_text_packs_sentences_with_overlap():
+    text = " ".join(f"Sentence number {index} ends here." for index in range(10))
+    chunks = chunk_text(text, max_tokens=12, overlap_tokens=6)
+    assert all(count_tokens(chunk) <= 12 for chunk in chunks)
+    assert chunks[0] == "Sentence number 0 ends here. Sentence number 1 ends here."
+    # Each chunk starts with the last sentence of the previous one
+    assert chunks[1].startswith("Sentence number 1 ends here.")
+    assert chunks[-1].endswith("Sentence number 9 ends here.")
+
+
+def test_chunk_text_cuts_long_sentences_and_skips_blank_text():
+    chunks = chunk_text(" ".join(["word"] * 25), max_tokens=10, overlap_tokens=0)
+    assert [count_tokens(chunk) for chunk in chunks] == [10, 10, 5]
+    assert chunk_text("   \n\t ") == []
+
+
+def test_chunk_text_overlaps_pieces_of_long_sentences():
+    words = [f"w{index}" for index in range(25)]
+    chunks = chunk_text(" ".join(words), max_tokens=10, overlap_tokens=4)
+    assert [count_tokens(chunk) for chunk in chunks] == [6, 10, 10, 10, 5]
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.startswith(" ".join(previous.split()[-4:]))
+    assert chunks[-1].endswith("w24")
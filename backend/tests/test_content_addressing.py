@@ -0,0 +1,27 @@
+import pytest
+
+pytest.importorskip("fitz")
+
+from backend.agents.embeddings import (  # noqa: E402
+    content_needing_text_sql,
+    staging_table_id,
+    text_hash_sql,
+)
+
+
+def test_text_hash_sql():
+    assert text_hash_sql("T.text") == r"TO_HEX(SHA256(REGEXP_REPLACE(TRIM(T.text), r'\s+', ' ')))"
+
+
+def test_staging_table_id_is_per_shard():
+    assert staging_table_id("p.d.t") == "p.d.t_text_staging"
+    assert staging_table_id("p.d.t", (0, 1)) == "p.d.t_text_staging"
+    assert staging_table_id("p.d.t", (1, 4)) == "p.d.t_text_staging_1_of_4"
+
+
+def test_content_needing_text_sql_skips_linked_rows():
+    sql = content_needing_text_sql("p.d.document_contents", "content_base64", blobs_exist=True, staging_exists=False)
+    assert "D.text_sha256 IS NULL" in sql
+    assert "LEFT JOIN `p.d.document_texts` AS T USING (content_sha256)" in sql
+    assert "LEFT JOIN `p.d.document_blobs` AS B USING (content_sha256)" in sql
+    assert "_text_staging" not in sql
@@ -0,0 +1,48 @@
+import datetime
+
+import numpy as np
+
+from backend.agents.root_agent.sub_agents.document_retrieval import _filter_sql
+from backend.agents.root_agent.sub_agents.vector_index import IvfIndex, is_calendar_date, write_index
+
+
+def _seconds(value: str) -> int:
+    return int(datetime.datetime.fromisoformat(value).replace(tzinfo=datetime.timezone.utc).timestamp())
+
+
+def _index(tmp_path, created):
+    vectors = np.eye(len(created), 4, dtype=np.float32)
+    metadata = [{"envelope_id": f"e{row}", "chunk_id": 0, "created": value} for row, value in enumerate(created)]
+    version = write_index(
+        str(tmp_path),
+        np.arange(len(created)),
+        vectors,
+        [f"chunk {row}" for row in range(len(created))],
+        metadata,
+        vectors[:1],
+        {},
+        quantization="none",
+    )
+    return IvfIndex(str(tmp_path / version), {})
+
+
+def test_is_calendar_date():
+    assert is_calendar_date("2025-06-30")
+    assert not is_calendar_date("2025-06-30T12:00:00")
+
+
+def test_date_only_created_before_includes_the_whole_day(tmp_path):
+    created = ["2025-06-30T00:00:00", "2025-06-30T18:30:00", "2025-07-01T00:00:00"]
+    index = _index(tmp_path, [_seconds(value) for value in created])
+    keep = sorted(int(key) for key in index.keys[index.filter_mask({"created_before": "2025-06-30"})])
+    assert keep == [0, 1]
+    keep = sorted(int(key) for key in index.keys[index.filter_mask({"created_before": "2025-06-30T12:00:00"})])
+    assert keep == [0]
+
+
+def test_date_only_created_before_sql():
+    where, parameters = _filter_sql({"created_before": "2025-06-30"})
+    assert "< TIMESTAMP(DATE_ADD(DATE(@created_before), INTERVAL 1 DAY))" in where
+    assert parameters[0].value == "2025-06-30"
+    where, _ = _filter_sql({"created_before": "2025-06-30T12:00:00Z"})
+    assert "<= TIMESTAMP(@created_before)" in where
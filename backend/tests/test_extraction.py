@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+pytest.importorskip("fitz")
+
+from backend.agents.embeddings import extract_document_to_file  # noqa: E402
+
+
+def _open_descriptors():
+    return len(os.listdir("/proc/self/fd"))
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc")
+def test_failed_decode_closes_and_removes_the_spool_file(tmp_path):
+    before = _open_descriptors()
+    for _ in range(5):
+        result = extract_document_to_file("key", object(), str(tmp_path), timeout=5)
+        assert result["path"] is None and result["error"]
+    assert _open_descriptors() == before
+    assert os.listdir(tmp_path) == []
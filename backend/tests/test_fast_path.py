@@ -0,0 +1,68 @@
+import pytest
+
+from backend.fast_path import _mentioned, extract_days, match_fast_path
+
+
+@pytest.mark.parametrize(
+    "question, days",
+    [
+        ("envelopes sent in the last 7 days", 7),
+        ("completed over the past 2 weeks", 14),
+        ("Previous 3 months of activity", 90),
+        ("declines last week", 7),
+        ("what happened this month", 30),
+        ("volume last quarter", 90),
+        ("what was sent today", 1),
+        ("anything signed yesterday?", 1),
+        ("how many envelopes are pending", None),
+    ],
+)
+def test_extract_days(question, days):
+    assert extract_days(question) == days
+
+
+@pytest.mark.parametrize(
+    "question, template_name",
+    [
+        ("Show the envelope status distribution as a pie chart", "status_distribution"),
+        ("What's the average cycle time by document type?", "cycle_time_by_document"),
+        ("Daily sent vs completed envelopes for the last 14 days", "daily_sent_vs_completed"),
+        ("How many envelopes are pending?", "dashboard_kpis"),
+    ],
+)
+def test_match_fast_path_answers_template_questions(question, template_name):
+    matched = match_fast_path(question)
+    assert matched is not None
+    assert matched[0].name == template_name
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        # Filters no template can apply
+        "How many envelopes did Acme complete last month",
+        "How many envelopes were completed for Acme Corp?",
+        "Status breakdown for envelopes from jane@example.com",
+        "Status distribution of envelopes for the Onboarding template",
+        # Windows the template cannot honour
+        "Daily sent vs completed envelopes for the last 6 months",
+        "How many envelopes are pending this quarter?",
+        # Needs the agent's reasoning
+        "Why are so many envelopes pending?",
+    ],
+)
+def test_match_fast_path_falls_through_to_the_agent(question):
+    assert match_fast_path(question) is None
+
+
+def test_match_fast_path_falls_through_for_follow_ups():
+    assert match_fast_path("Show the status distribution", has_history=True) is None
+
+
+def test_match_fast_path_uses_requested_chart_type():
+    _, query = match_fast_path("Status breakdown as a bar chart")
+    assert query.include_charts and query.chart_type == "bar"
+
+
+def test_mentioned_matches_whole_words():
+    assert _mentioned(["sent", "Completed"], "which represent completed ones") == ["Completed"]
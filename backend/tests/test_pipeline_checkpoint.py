@@ -0,0 +1,60 @@
+import datetime
+
+import pytest
+
+pytest.importorskip("fitz")
+
+from backend.agents.embeddings import (  # noqa: E402
+    PIPELINE_LEASE_SECONDS,
+    PipelineCheckpoint,
+    parse_shard,
+    shard_filter_sql,
+)
+
+
+@pytest.fixture
+def checkpoint_path(tmp_path):
+    return str(tmp_path / "checkpoint.sqlite3")
+
+
+def _expire_runs(path):
+    stale = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=PIPELINE_LEASE_SECONDS + 1)
+    checkpoint = PipelineCheckpoint(path)
+    with checkpoint._connection:
+        checkpoint._connection.execute("UPDATE runs SET heartbeat_at = ?", (stale.isoformat(),))
+    checkpoint.close()
+
+
+def test_shard_helpers():
+    assert parse_shard("2/4") == (2, 4)
+    with pytest.raises(ValueError):
+        parse_shard("4/4")
+    assert shard_filter_sql("D.text_sha256", None) == ""
+    assert shard_filter_sql("D.text_sha256", (0, 1)) == ""
+    assert shard_filter_sql("D.text_sha256", (2, 4)).strip() == (
+        "AND MOD(ABS(FARM_FINGERPRINT(D.text_sha256)), 4) = 2"
+    )
+
+
+def test_start_run_allows_sibling_shards(checkpoint_path):
+    PipelineCheckpoint(checkpoint_path).start_run((0, 2))
+    PipelineCheckpoint(checkpoint_path).start_run((1, 2))
+    with pytest.raises(RuntimeError, match="already being processed"):
+        PipelineCheckpoint(checkpoint_path).start_run((1, 2))
+
+
+@pytest.mark.parametrize("running, starting", [((0, 2), None), (None, (0, 2)), ((0, 2), (0, 4))])
+def test_start_run_refuses_overlapping_shard_counts(checkpoint_path, running, starting):
+    PipelineCheckpoint(checkpoint_path).start_run(running)
+    with pytest.raises(RuntimeError, match="overlaps"):
+        PipelineCheckpoint(checkpoint_path).start_run(starting)
+
+
+def test_start_run_takes_over_expired_leases(checkpoint_path):
+    PipelineCheckpoint(checkpoint_path).start_run((0, 2))
+    _expire_runs(checkpoint_path)
+    checkpoint = PipelineCheckpoint(checkpoint_path)
+    run_id = checkpoint.start_run((0, 4))
+    statuses = dict(checkpoint._connection.execute("SELECT run_id, status FROM runs"))
+    assert statuses.pop(run_id) == "running"
+    assert list(statuses.values()) == ["abandoned"]
@@ -0,0 +1,100 @@
+import json
+
+import numpy as np
+import pytest
+
+from backend.agents.root_agent.sub_agents.quantization import (
+    binarize,
+    binary_scores,
+    bytes_per_vector,
+    hamming_distances,
+    int8_scores,
+    quantize_int8,
+)
+from backend.agents.root_agent.sub_agents.vector_index import IvfIndex, write_index
+
+
+def _unit_vectors(count, dimension, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_int8_round_trip_and_scores_track_float_scores():
+    vectors = _unit_vectors(50, 32)
+    codes, scales = quantize_int8(vectors)
+    assert codes.dtype == np.int8 and scales.shape == (50,)
+    assert np.abs(codes.astype(np.float32) * scales[:, None] - vectors).max() <= scales.max() / 2 + 1e-6
+    query = vectors[3]
+    approximate = int8_scores(codes, scales, query)
+    assert np.abs(approximate - vectors @ query).max() < 0.05
+    assert int(np.argmax(approximate)) == 3
+
+
+def test_int8_handles_zero_vectors():
+    codes, scales = quantize_int8(np.zeros((2, 4), dtype=np.float32))
+    assert not codes.any() and not scales.any()
+
+
+def test_binary_codes_and_hamming_distances():
+    vectors = np.array([[1.0, -1.0, 1.0, -1.0, 1.0, 1.0, 1.0, 1.0, -1.0]], dtype=np.float32)
+    codes = binarize(vectors)
+    assert codes.shape == (1, 2)
+    assert codes[0, 0] == 0b10101111 and codes[0, 1] == 0
+    assert hamming_distances(codes, codes[0]).tolist() == [0]
+    assert hamming_distances(binarize(-vectors), codes[0]).tolist() == [9]
+
+
+def test_binary_scores_rank_the_query_first():
+    vectors = _unit_vectors(20, 64, seed=1)
+    scores = binary_scores(binarize(vectors), vectors[7])
+    assert int(np.argmax(scores)) == 7 and scores[7] == 0
+
+
+def test_quantized_rescoring_recovers_the_exact_neighbours():
+    # Scan the codes, then rescore the best candidates at full precision,
+    # as the local index does
+    vectors = _unit_vectors(500, 64, seed=2)
+    query = vectors[42] + 0.05 * _unit_vectors(1, 64, seed=3)[0]
+    exact = set(np.argsort(-(vectors @ query))[:5].tolist())
+    codes, scales = quantize_int8(vectors)
+    for scores in (int8_scores(codes, scales, query), binary_scores(binarize(vectors), query)):
+        candidates = np.argpartition(-scores, 40)[:40]
+        rescored = candidates[np.argsort(-(vectors[candidates] @ query))][:5]
+        assert set(rescored.tolist()) == exact
+
+
+def test_bytes_per_vector():
+    assert bytes_per_vector(768, "none") == 3072
+    assert bytes_per_vector(768, "int8") == 772
+    assert bytes_per_vector(768, "binary") == 96
+    assert bytes_per_vector(10, "binary") == 2
+
+
+@pytest.mark.parametrize("quantization", ["int8", "binary"])
+def test_quantized_index_search_matches_the_float_index(tmp_path, quantization):
+    # A few near-duplicates of row 123 give the query clear nearest neighbours
+    vectors = _unit_vectors(300, 64, seed=4)
+    noise = _unit_vectors(3, 64, seed=5)
+    for offset, (row, scale) in enumerate(zip((10, 200, 280), (0.2, 0.4, 0.6))):
+        vectors[row] = vectors[123] + scale * noise[offset]
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    query = vectors[123] + 0.05 * _unit_vectors(1, 64, seed=6)[0]
+
+    def search(mode):
+        directory = tmp_path / mode
+        write_index(
+            str(directory),
+            np.arange(len(vectors)),
+            vectors,
+            [f"chunk {row}" for row in range(len(vectors))],
+            [{"envelope_id": f"e{row}", "chunk_id": 0} for row in range(len(vectors))],
+            vectors[:4],
+            {},
+            quantization=mode,
+        )
+        meta = json.loads((directory / "current.json").read_text())
+        index = IvfIndex(str(directory / meta["version"]), meta)
+        return [hit["key"] for hit in index.search(query, k=3, nprobe=4)]
+
+    assert search("none") == [123, 10, 200]
+    assert search(quantization) == search("none")
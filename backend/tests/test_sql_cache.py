@@ -0,0 +1,25 @@
+from backend.agents.root_agent.sub_agents.schema_catalog import DATASET_ID, PROJECT_ID
+from backend.agents.root_agent.sub_agents.sql_cache import is_deterministic, normalize_sql
+from backend.agents.root_agent.sub_agents.sql_guard import referenced_table_ids
+
+
+def test_normalize_sql_ignores_formatting_and_in_list_order():
+    assert normalize_sql("select x -- note\nFROM t WHERE y IN (2, 1);") == normalize_sql(
+        "SELECT x FROM t WHERE y in (1,2)"
+    )
+
+
+def test_is_deterministic_flags_clock_and_random_functions():
+    assert is_deterministic("SELECT status FROM envelopes")
+    assert not is_deterministic("SELECT * FROM envelopes WHERE created_timestamp > CURRENT_TIMESTAMP()")
+    assert not is_deterministic("SELECT DATE_SUB(CURRENT_DATE, INTERVAL 7 DAY)")
+    assert not is_deterministic("SELECT RAND()")
+    assert is_deterministic("SELECT 'current_date()' AS label FROM envelopes")
+
+
+def test_referenced_table_ids_include_comma_joined_tables():
+    assert referenced_table_ids("SELECT 1 FROM envelopes e, recipients r") == [
+        f"{PROJECT_ID}.{DATASET_ID}.envelopes",
+        f"{PROJECT_ID}.{DATASET_ID}.recipients",
+    ]
+    assert referenced_table_ids("SELECT 1 FROM envelopes, other.t") is None
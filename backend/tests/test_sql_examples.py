@@ -0,0 +1,39 @@
+import asyncio
+
+from backend.agents.root_agent.sub_agents import sql_examples
+from backend.agents.root_agent.sub_agents.sql_examples import SqlExampleStore
+
+
+def test_similar_sees_examples_written_by_another_worker(tmp_path):
+    path = str(tmp_path / "examples.sqlite3")
+    reader, writer = SqlExampleStore(path, 10), SqlExampleStore(path, 10)
+    reader.add("envelopes completed last month", "SELECT 1", ["n"], 1)
+    assert [e["sql"] for e in reader.similar("completed envelopes")] == ["SELECT 1"]
+
+    writer.add("declined envelopes by sender", "SELECT 2", ["sender", "n"], 4)
+    assert [e["sql"] for e in reader.similar("which senders had declined envelopes")] == ["SELECT 2"]
+
+
+def test_similar_reuses_the_corpus_until_the_store_changes(tmp_path):
+    store = SqlExampleStore(str(tmp_path / "examples.sqlite3"), 10)
+    store.add("envelopes completed last month", "SELECT 1", ["n"], 1)
+    store.similar("completed envelopes")
+    corpus = store._corpus
+    store.similar("envelopes last month")
+    assert store._corpus is corpus
+
+    store.add("pending envelopes", "SELECT 2", ["n"], 1)
+    assert [e["sql"] for e in store.similar("pending envelopes")] == ["SELECT 2"]
+    assert store._corpus is not corpus
+
+
+def test_instruction_provider_is_awaitable(tmp_path, monkeypatch):
+    store = SqlExampleStore(str(tmp_path / "examples.sqlite3"), 10)
+    store.add("envelopes completed last month", "SELECT 1", ["n"], 1)
+    monkeypatch.setattr(sql_examples, "sql_example_store", store)
+    monkeypatch.setattr(sql_examples, "request_text", lambda context: "completed envelopes last month")
+
+    provider = sql_examples.with_sql_examples("Base instruction.")
+    instruction = asyncio.run(provider(None))
+    assert instruction.startswith("Base instruction.")
+    assert "SQL: SELECT 1" in instruction
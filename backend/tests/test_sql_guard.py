@@ -0,0 +1,64 @@
+from backend.agents.root_agent.sub_agents.sql_guard import inject_limit, shape_rows, validate_sql
+
+
+def test_validate_sql_accepts_catalog_selects():
+    assert validate_sql("SELECT status FROM envelopes") is None
+    assert validate_sql("WITH x AS (SELECT status FROM envelopes) SELECT status FROM x") is None
+    assert validate_sql("SELECT e.status FROM envelopes AS e JOIN recipients r USING (envelope_id)") is None
+    assert validate_sql("SELECT EXTRACT(YEAR FROM created_timestamp) FROM envelopes") is None
+
+
+def test_validate_sql_rejects_writes_and_multiple_statements():
+    assert "Only SELECT" in validate_sql("DELETE FROM envelopes")
+    assert "single statement" in validate_sql("SELECT 1; SELECT 2")
+    assert "MERGE" in validate_sql("WITH x AS (SELECT 1) MERGE envelopes USING x ON TRUE")
+    assert validate_sql("   ") == "The query is empty."
+
+
+def test_validate_sql_rejects_unknown_tables_and_columns():
+    assert "Unknown table other.t" in validate_sql("SELECT * FROM other.t")
+    assert "Unknown column e.nope" in validate_sql("SELECT e.nope FROM envelopes e")
+
+
+def test_validate_sql_resolves_comma_joined_tables():
+    query = "SELECT d.content_text FROM envelopes e, envelope_document_texts d WHERE e.envelope_id = d.envelope_id"
+    assert "content_text" in validate_sql(query)
+    assert "Unknown column d.nope" in validate_sql("SELECT d.nope FROM envelopes e, recipients AS d")
+    assert "Unknown table other.t" in validate_sql("SELECT 1 FROM envelopes, other.t")
+    assert validate_sql("SELECT e.status, tag FROM envelopes e, UNNEST(['a', 'b']) AS tag") is None
+    assert validate_sql("SELECT e.status, COUNT(*) FROM envelopes e GROUP BY e.status, 1") is None
+
+
+def test_validate_sql_rejects_table_functions():
+    assert "Table function" in validate_sql("SELECT * FROM envelopes e, EXTERNAL_QUERY('c', 'SELECT 1')")
+    assert "Table function" in validate_sql("SELECT * FROM ML.GENERATE_EMBEDDING(MODEL `p.d.m`, (SELECT 1))")
+
+
+def test_validate_sql_guards_large_text():
+    assert "content_text" in validate_sql("SELECT content_text FROM envelope_document_texts")
+    assert "Selecting *" in validate_sql("SELECT * FROM envelope_document_texts")
+    assert validate_sql("SELECT LENGTH(content_text) FROM envelope_document_texts") is None
+    assert validate_sql("SELECT content_text FROM envelope_document_texts", include_large_text=True) is None
+
+
+def test_inject_limit_only_bounds_the_outer_query():
+    assert inject_limit("SELECT status FROM envelopes;", 10) == "SELECT status FROM envelopes\nLIMIT 10"
+    assert inject_limit("SELECT * FROM (SELECT 1 LIMIT 5)", 10).endswith("\nLIMIT 10")
+    assert inject_limit("SELECT 1 LIMIT 3", 10) == "SELECT 1 LIMIT 3"
+    assert inject_limit("SELECT 1", None) == "SELECT 1"
+
+
+def test_shape_rows_passes_small_results_through():
+    rows = [{"a": 1, "b": "x"}]
+    assert shape_rows(["a", "b"], rows) == {"rows": rows}
+
+
+def test_shape_rows_truncates_cells_and_summarizes_omitted_rows():
+    rows = [{"a": index, "b": "xxxxx", "c": None} for index in range(4)]
+    shaped = shape_rows(["a", "b", "c"], rows, preview_rows=2, max_cell_chars=3)
+    assert shaped["rows"] == [{"a": 0, "b": "xxx…", "c": None}, {"a": 1, "b": "xxx…", "c": None}]
+    assert shaped["truncated_cells"] == 2
+    assert shaped["rows_omitted"] == 2
+    assert shaped["column_summary"]["a"] == {"nulls": 0, "min": 0, "max": 3, "mean": 1.5}
+    assert shaped["column_summary"]["b"] == {"nulls": 0, "distinct": 1, "top_values": ["xxxxx"]}
+    assert shaped["column_summary"]["c"] == {"nulls": 4}
@@ -0,0 +1,48 @@
+import pytest
+
+pytest.importorskip("fitz")
+
+from backend.agents.embeddings import (  # noqa: E402
+    create_vector_index_sql,
+    drop_vector_index_sql,
+    vector_index_needs_rebuild,
+)
+
+
+def test_vector_index_ddl():
+    assert create_vector_index_sql("p.d.t", "idx", "IVF", num_lists=100, stored_columns=["envelope_id"]) == (
+        "CREATE VECTOR INDEX IF NOT EXISTS idx\n"
+        "ON `p.d.t`(embedding)\n"
+        "STORING(envelope_id)\n"
+        "OPTIONS(index_type = 'IVF', distance_type = 'COSINE', ivf_options = '{\"num_lists\": 100}')"
+    )
+    assert "tree_ah_options = '{\"leaf_node_embedding_count\": 500}'" in create_vector_index_sql(
+        "p.d.t", "idx", "TREE_AH", leaf_size=500
+    )
+    with pytest.raises(ValueError):
+        create_vector_index_sql("p.d.t", "idx", "FLAT")
+    assert drop_vector_index_sql("p.d.t", "idx") == "DROP VECTOR INDEX IF EXISTS idx ON `p.d.t`"
+
+
+def test_vector_index_needs_rebuild():
+    ivf = {"index_status": "ACTIVE", "ddl": "OPTIONS(index_type = 'IVF', distance_type = 'COSINE')"}
+    assert not vector_index_needs_rebuild(None)
+    assert not vector_index_needs_rebuild(ivf, "IVF", num_lists=0)
+    assert vector_index_needs_rebuild(ivf, "TREE_AH", leaf_size=0)
+    assert vector_index_needs_rebuild({**ivf, "ddl": "OPTIONS(distance_type = 'EUCLIDEAN')"}, "IVF", num_lists=0)
+    assert vector_index_needs_rebuild({**ivf, "index_status": "PERMANENTLY DISABLED"}, "IVF")
+
+
+def test_vector_index_needs_rebuild_on_size_and_storing_changes():
+    ddl = create_vector_index_sql("p.d.t", "idx", "IVF", num_lists=100, stored_columns=["envelope_id"])
+    ivf = {"index_status": "ACTIVE", "ddl": ddl}
+    assert not vector_index_needs_rebuild(ivf, "IVF", num_lists=100, stored_columns=["envelope_id"])
+    assert vector_index_needs_rebuild(ivf, "IVF", num_lists=200, stored_columns=["envelope_id"])
+    assert vector_index_needs_rebuild(ivf, "IVF", num_lists=0, stored_columns=["envelope_id"])
+    assert vector_index_needs_rebuild(
+        ivf, "IVF", num_lists=100, stored_columns=["envelope_id", "document_id"]
+    )
+
+    tree = {"index_status": "ACTIVE", "ddl": create_vector_index_sql("p.d.t", "idx", "TREE_AH", leaf_size=500)}
+    assert not vector_index_needs_rebuild(tree, "TREE_AH", leaf_size=500, stored_columns=[])
+    assert vector_index_needs_rebuild(tree, "TREE_AH", leaf_size=1000, stored_columns=[])
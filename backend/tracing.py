@@ -0,0 +1,192 @@
+import datetime
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+from google.protobuf.json_format import MessageToDict
+from opentelemetry import trace
+from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    SpanExporter,
+    SpanExportResult,
+)
+
+from .config import APP_NAME
+
+# Attribute placed on the root span of every request; child spans are grouped by trace id
+REQUEST_ID_ATTRIBUTE = "app.request_id"
+
+# Tracing configuration
+TRACE_FILE_PATH = os.getenv("TRACE_FILE_PATH")
+TRACE_MAX_REQUESTS = int(os.getenv("TRACE_MAX_REQUESTS", "200"))
+TRACE_MAX_ATTRIBUTE_CHARS = 500
+
+tracer = trace.get_tracer("docusign.backend")
+
+class OtlpJsonFileSpanExporter(SpanExporter):
+    """Append spans to a file as OTLP/JSON, one export batch per line.
+
+    The format matches the OpenTelemetry collector's `otlpjsonfile` receiver.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        try:
+            line = json.dumps(MessageToDict(encode_spans(spans)))
+            with self._lock, open(self.path, "a", encoding="utf-8") as handle:
+                handle.write(line + "\n")
+            return SpanExportResult.SUCCESS
+        except Exception as exc:  # pragma: no cover - logging path
+            print(f"[tracing] Failed to write spans to {self.path}: {exc}")
+            return SpanExportResult.FAILURE
+
+    def shutdown(self) -> None:
+        return None
+
+class RequestTraceStore(SpanProcessor):
+    """Keep the finished spans of recent requests in memory, keyed by request id."""
+
+    def __init__(self, max_requests: int = 200, max_spans_per_request: int = 2000):
+        self.max_requests = max_requests
+        self.max_spans_per_request = max_spans_per_request
+        self._lock = threading.Lock()
+        self._request_by_trace: Dict[int, str] = {}
+        self._spans: "OrderedDict[str, List[ReadableSpan]]" = OrderedDict()
+
+    def on_start(self, span: Any, parent_context: Any = None) -> None:
+        request_id = (span.attributes or {}).get(REQUEST_ID_ATTRIBUTE)
+        if not request_id:
+            return
+        with self._lock:
+            self._request_by_trace[span.context.trace_id] = str(request_id)
+            self._spans.setdefault(str(request_id), [])
+            self._spans.move_to_end(str(request_id))
+            while len(self._spans) > self.max_requests:
+                evicted, _ = self._spans.popitem(last=False)
+                self._request_by_trace = {
+                    trace_id: request for trace_id, request in self._request_by_trace.items()
+                    if request != evicted
+                }
+
+    def on_end(self, span: ReadableSpan) -> None:
+        with self._lock:
+            request_id = self._request_by_trace.get(span.context.trace_id)
+            if request_id is None or request_id not in self._spans:
+                return
+            spans = self._spans[request_id]
+            if len(spans) < self.max_spans_per_request:
+                spans.append(span)
+
+    def shutdown(self) -> None:
+        return None
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+    def request_ids(self) -> List[str]:
+        with self._lock:
+            return list(reversed(self._spans.keys()))
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """Return the span tree and aggregate totals recorded for a request."""
+        with self._lock:
+            spans = list(self._spans.get(request_id, []))
+            known = request_id in self._spans
+        if not known:
+            return None
+        spans.sort(key=lambda item: item.start_time or 0)
+        return {
+            "request_id": request_id,
+            "totals": summarize_spans(spans),
+            "spans": [_span_to_dict(span) for span in spans],
+        }
+
+def _format_attribute(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > TRACE_MAX_ATTRIBUTE_CHARS:
+        return value[:TRACE_MAX_ATTRIBUTE_CHARS] + "…"
+    if isinstance(value, tuple):
+        return list(value)
+    return value
+
+def _span_to_dict(span: ReadableSpan) -> Dict[str, Any]:
+    start = span.start_time or 0
+    end = span.end_time or start
+    return {
+        "name": span.name,
+        "span_id": format(span.context.span_id, "016x"),
+        "parent_span_id": format(span.parent.span_id, "016x") if span.parent else None,
+        "start": datetime.datetime.fromtimestamp(start / 1e9, tz=datetime.timezone.utc).isoformat(),
+        "duration_ms": round((end - start) / 1e6, 2),
+        "status": span.status.status_code.name,
+        "attributes": {
+            key: _format_attribute(value) for key, value in (span.attributes or {}).items()
+        },
+    }
+
+def summarize_spans(spans: Sequence[ReadableSpan]) -> Dict[str, Any]:
+    """Aggregate LLM hops, tool calls, tokens and BigQuery volume over spans."""
+    totals: Dict[str, Any] = {
+        "duration_ms": 0.0,
+        "llm_calls": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "agent_invocations": 0,
+        "tool_calls": 0,
+        "bigquery_jobs": 0,
+        "bigquery_rows": 0,
+        "bigquery_bytes_processed": 0,
+    }
+    for span in spans:
+        attributes = span.attributes or {}
+        if span.parent is None and span.start_time and span.end_time:
+            totals["duration_ms"] = max(
+                totals["duration_ms"], round((span.end_time - span.start_time) / 1e6, 2)
+            )
+        if span.name == "call_llm":
+            totals["llm_calls"] += 1
+            totals["input_tokens"] += int(attributes.get("gen_ai.usage.input_tokens") or 0)
+            totals["output_tokens"] += int(attributes.get("gen_ai.usage.output_tokens") or 0)
+        elif span.name.startswith("invoke_agent"):
+            totals["agent_invocations"] += 1
+        elif span.name.startswith("execute_tool"):
+            totals["tool_calls"] += 1
+        elif span.name.startswith("bigquery."):
+            totals["bigquery_jobs"] += 1
+            totals["bigquery_rows"] += int(attributes.get("bigquery.row_count") or 0)
+            totals["bigquery_bytes_processed"] += int(attributes.get("bigquery.bytes_processed") or 0)
+    return totals
+
+# Global in-memory trace store backing the /traces endpoints
+request_trace_store = RequestTraceStore(max_requests=TRACE_MAX_REQUESTS)
+
+def configure_tracing() -> None:
+    """Install the tracer provider and exporters for this process.
+
+    Spans always go to the in-memory request store. They are also exported as
+    OTLP/HTTP when `OTEL_EXPORTER_OTLP_ENDPOINT` (or the traces-specific
+    variant) is set, and as OTLP/JSON lines when `TRACE_FILE_PATH` is set.
+    """
+    provider = trace.get_tracer_provider()
+    if not isinstance(provider, TracerProvider):
+        provider = TracerProvider(resource=Resource.create({"service.name": APP_NAME}))
+        trace.set_tracer_provider(provider)
+
+    provider.add_span_processor(request_trace_store)
+
+    if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") or os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT"):
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        print("[tracing] Exporting spans to the OTLP collector")
+
+    if TRACE_FILE_PATH:
+        provider.add_span_processor(BatchSpanProcessor(OtlpJsonFileSpanExporter(TRACE_FILE_PATH)))
+        print(f"[tracing] Writing spans to {TRACE_FILE_PATH}")
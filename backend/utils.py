@@ -75,6 +75,130 @@ def extract_json_candidate(raw: str) -> Optional[str]:
     trimmed = raw.strip()
     return trimmed or None
 
+class ChartStreamParser:
+    """Incrementally scan streamed model output and emit charts as they complete.
+
+    Feed partial text with `feed`; each call returns the chart objects whose
+    closing brace arrived in that chunk. Charts are recognised inside the
+    fenced `{"text": ..., "charts": [...]}` contract (or a bare JSON object)
+    and are only emitted when they pass `is_chart_payload`.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self._done = False
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_key: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._charts_array_depth: Optional[int] = None
+        self._chart_depth: Optional[int] = None
+        self._chart_start = -1
+        self.emitted = 0
+
+    @property
+    def received(self) -> bool:
+        """Whether any text has been fed to the parser."""
+        return bool(self._buffer)
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume a chunk of model output and return newly completed charts."""
+        if not chunk or self._done:
+            return []
+        self._buffer += chunk
+        if not self._started and not self._locate_start():
+            return []
+        return self._scan()
+
+    def _locate_start(self) -> bool:
+        fence_index = self._buffer.find("```json")
+        if fence_index >= 0:
+            self._pos = fence_index + len("```json")
+            self._started = True
+            return True
+        stripped = self._buffer.lstrip()
+        if stripped.startswith("{"):
+            self._pos = len(self._buffer) - len(stripped)
+            self._started = True
+            return True
+        return False
+
+    def _scan(self) -> List[Dict[str, Any]]:
+        charts: List[Dict[str, Any]] = []
+        buffer = self._buffer
+        index = self._pos
+        while index < len(buffer):
+            char = buffer[index]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        try:
+                            self._last_key = json.loads(buffer[self._string_start:index + 1])
+                        except json.JSONDecodeError:
+                            self._last_key = None
+            elif char == '"':
+                if self._stack:
+                    self._in_string = True
+                    self._string_start = index
+            elif char == ":" and len(self._stack) == 1:
+                self._current_key = self._last_key
+            elif char == "," and len(self._stack) == 1:
+                self._current_key = None
+            elif char in "{[":
+                self._open(char, index)
+            elif char in "}]" and self._stack:
+                chart = self._close(index)
+                if chart is not None:
+                    charts.append(chart)
+                if not self._stack:
+                    self._done = True
+                    index += 1
+                    break
+            index += 1
+        self._pos = index
+        return charts
+
+    def _open(self, char: str, index: int) -> None:
+        depth = len(self._stack)
+        if char == "[" and depth == 1 and self._current_key == "charts":
+            self._charts_array_depth = depth + 1
+        elif char == "{" and self._chart_depth is None:
+            if depth == 1 and self._current_key == "chart":
+                self._chart_depth = depth
+                self._chart_start = index
+            elif self._charts_array_depth is not None and depth == self._charts_array_depth:
+                self._chart_depth = depth
+                self._chart_start = index
+        self._stack.append(char)
+
+    def _close(self, index: int) -> Optional[Dict[str, Any]]:
+        self._stack.pop()
+        depth = len(self._stack)
+        if self._charts_array_depth is not None and depth < self._charts_array_depth:
+            self._charts_array_depth = None
+        if self._chart_depth is None or depth != self._chart_depth:
+            return None
+        candidate_text = self._buffer[self._chart_start:index + 1]
+        self._chart_depth = None
+        self._chart_start = -1
+        try:
+            candidate = json.loads(candidate_text)
+        except json.JSONDecodeError:
+            return None
+        if not is_chart_payload(candidate):
+            return None
+        self.emitted += 1
+        return candidate
+
 def merge_content(base: Dict[str, Any], addition: Dict[str, Any]) -> Dict[str, Any]:
     """Merge content dictionaries, handling special cases for charts and text."""
     merged = dict(base)
@@ -19,12 +19,16 @@ from datetime import datetime, timezone, timedelta
 from typing import Dict, List, Any, Optional
 import time
 import base64
+import hashlib
 import os
 import jwt
 
 REQUIRED_AUTH_CONFIG_KEYS = ("integration_key", "user_id", "oauth_base_url")
 PRIVATE_KEY_CONFIG_KEY = "private_key"
 DEFAULT_PRIVATE_KEY_FILENAME = "private_key"
+# Most recently seen document_blobs hashes kept in the connector state. A
+# file whose hash has aged out is upserted again, which is idempotent.
+MAX_TRACKED_BLOB_HASHES = 5000
 
 SCHEMA_DEFINITION: List[Dict[str, Any]] = [
     {
@@ -79,8 +83,16 @@ SCHEMA_DEFINITION: List[Dict[str, Any]] = [
         "table": "document_contents",
         "primary_key": ["envelope_id", "document_id"],
         "description": (
-            "Base64-encoded source payload for every document, enabling downstream legal"
-            " archiving or content classification pipelines in BigQuery."
+            "Per-envelope document entries pointing at their source file through"
+            " content_sha256, for legal archiving or content classification pipelines."
+        ),
+    },
+    {
+        "table": "document_blobs",
+        "primary_key": ["content_sha256"],
+        "description": (
+            "Base64-encoded source payload stored once per unique file, shared by every"
+            " envelope created from the same template."
         ),
     },
 
@@ -519,6 +531,10 @@ def update(configuration: dict, state: Dict[str, Any]):
         }
     
     current_time = datetime.now(timezone.utc).isoformat()
+
+    # Hashes of files already written to document_blobs by earlier syncs,
+    # least recently seen first
+    known_blobs = dict.fromkeys(state.get("document_blob_hashes", []))
     
     # --- Process Envelopes and Related Data ---
     logger.info("Fetching envelopes data..."+ current_time)
@@ -632,12 +648,22 @@ def update(configuration: dict, state: Dict[str, Any]):
                 logger.info(f"Fetching content for document {document_id} in envelope {envelope_id}")
                 content = fetch_document_content(configuration, envelope_id, document_id)
                 if content:
-                    # Content is stored as a Base64 encoded string to handle binary data safely.
-                    encoded_content = base64.b64encode(content).decode('utf-8')
+                    # Identical files (same template) are stored once, keyed by their hash.
+                    content_sha256 = hashlib.sha256(content).hexdigest()
+                    if content_sha256 in known_blobs:
+                        known_blobs.pop(content_sha256)
+                    else:
+                        # Content is stored as a Base64 encoded string to handle binary data safely.
+                        op.upsert("document_blobs", {
+                            "content_sha256": content_sha256,
+                            "content_base64": base64.b64encode(content).decode('utf-8'),
+                            "size_bytes": len(content)
+                        })
+                    known_blobs[content_sha256] = None
                     op.upsert("document_contents", {
                         "envelope_id": str(envelope_id),
                         "document_id": str(document_id),
-                        "content_base64": encoded_content
+                        "content_sha256": content_sha256
                     })
        
         # Custom Fields
@@ -671,7 +697,8 @@ def update(configuration: dict, state: Dict[str, Any]):
     ## FIX: Moved checkpoint before the return statement to ensure state is saved.
     new_state = {
         "last_envelope_sync": str(current_time),
-        "last_template_sync": str(current_time)
+        "last_template_sync": str(current_time),
+        "document_blob_hashes": list(known_blobs)[-MAX_TRACKED_BLOB_HASHES:]
     }
     op.checkpoint(state=new_state)
     logger.info("DocuSign connector update completed successfully")
@@ -23,8 +23,8 @@ import ReactMarkdown from 'react-markdown';
 import remarkGfm from 'remark-gfm';
 
 import { ChatChartRenderer } from './ChatChartRenderer';
-import type { AgentMessageContent } from '@/lib/agent-types';
-import { normalizeStructuredPayload } from '@/lib/agent-response';
+import type { AgentChart, AgentMessageContent } from '@/lib/agent-types';
+import { isAgentChart, normalizeStructuredPayload } from '@/lib/agent-response';
 import pdfToText from 'react-pdftotext';
 
 // Extract text from a PDF attachment (FileUIPart) using react-pdftotext
@@ -76,6 +76,8 @@ const PromptInputComponent = ({ layout = 'page', prefillText }: PromptInputCompo
   const textareaRef = useRef<HTMLTextAreaElement>(null);
   const lastPrefillRef = useRef<string | undefined>(undefined);
   const [messages, setMessages] = useState<ChatMessage[]>([]);
+  // Identifies this conversation so a new question supersedes the previous run
+  const chatIdRef = useRef<string>(crypto.randomUUID());
 
   useEffect(() => {
     if (prefillText !== undefined && prefillText !== lastPrefillRef.current) {
@@ -171,6 +173,7 @@ const PromptInputComponent = ({ layout = 'page', prefillText }: PromptInputCompo
         body: JSON.stringify({
           message: outgoingText,
           history: historyPayload,
+          chatId: chatIdRef.current,
         }),
       });
 
@@ -183,6 +186,7 @@ const PromptInputComponent = ({ layout = 'page', prefillText }: PromptInputCompo
       const decoder = new TextDecoder();
       let responseText = '';
       let structuredFromStream: AgentMessageContent | null = null;
+      const streamedCharts: AgentChart[] = [];
 
       setMessages((prev) => [
         ...prev,
@@ -207,6 +211,27 @@ const PromptInputComponent = ({ layout = 'page', prefillText }: PromptInputCompo
                 responseText += data;
               } else if (data && typeof data === 'object') {
                 const payload = data as Record<string, unknown>;
+
+                // Charts arrive one by one while the model is still writing the answer
+                const chartCandidate = payload['chart'];
+                if (isAgentChart(chartCandidate)) {
+                  streamedCharts.push(chartCandidate);
+                  const chartsSnapshot = [...streamedCharts];
+                  setMessages((prev) => {
+                    const newMessages = [...prev];
+                    const lastIndex = newMessages.length - 1;
+                    if (lastIndex >= 0) {
+                      const lastMessage = newMessages[lastIndex];
+                      newMessages[lastIndex] = {
+                        ...lastMessage,
+                        content: { ...lastMessage.content, charts: chartsSnapshot },
+                      };
+                    }
+                    return newMessages;
+                  });
+                  continue;
+                }
+
                 const rawCandidate = payload['raw'];
                 if (typeof rawCandidate === 'string' && rawCandidate.length > 0) {
                   responseText = rawCandidate;
@@ -266,6 +291,10 @@ const PromptInputComponent = ({ layout = 'page', prefillText }: PromptInputCompo
         console.debug('Failed to parse assistant payload as JSON.', parseError);
       }
 
+      if (!messageContent.charts && streamedCharts.length > 0) {
+        messageContent.charts = streamedCharts;
+      }
+
       if (!messageContent.text) {
         messageContent.text = "";
       }